@@ -1,14 +1,19 @@
 import os
+import json
 import httpx
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, List, Optional
 
 from app.core.config import settings
 from app.core.auth import get_current_user
 from app.models.iam import User
 from app.core.response import success_response
 from app.core.exceptions import AtlasException
+from app.services.gemini import gemini_client
+from app.services.ai_cache import ai_response_cache, make_cache_key
+from app.utils.json_stream import JSONArrayStreamParser
 
 router = APIRouter(prefix="/ai", tags=["AI"])
 
@@ -36,59 +41,97 @@ class ChatRequest(BaseModel):
         "dev_product": "产品规划用时估算(纯数字)"
     }
     """
+    cache: Optional[str] = None  # "bypass" skips the response cache lookup
+
+
+DEFAULT_MODEL = "gemini-3.1-pro-preview"
+
+
+def _get_api_key() -> str:
+    api_key = settings.GEMINI_API_KEY if hasattr(settings, 'GEMINI_API_KEY') else os.getenv("GEMINI_API_KEY")
+    if not api_key:
+        raise AtlasException("Gemini API key is not configured in environment variables.", code=500)
+    return api_key
+
+
+def _build_payload(request: ChatRequest) -> dict:
+    """Build the Gemini request body from the chat history"""
+    gemini_contents = []
+    for msg in request.messages:
+        gemini_contents.append({
+            "role": msg.role, 
+            "parts": [{"text": part} for part in msg.parts]
+        })
+
+    return {
+        "contents": gemini_contents,
+        "systemInstruction": {
+            "role": "user",
+            "parts": [{"text": request.system_instruction}]
+        },
+        "generationConfig": {
+            "responseMimeType": "application/json"
+        }
+    }
+
+
+def _request_cache_key(request: ChatRequest, model: str) -> str:
+    return make_cache_key(
+        model,
+        request.system_instruction,
+        [msg.model_dump() for msg in request.messages],
+    )
+
+
+async def _lookup_cache(request: ChatRequest, cache_key: str) -> Optional[str]:
+    """Return cached text, honouring `cache: bypass`"""
+    if not ai_response_cache.enabled:
+        return None
+    if request.cache == "bypass":
+        ai_response_cache.record_bypass()
+        return None
+    return await ai_response_cache.get(cache_key)
+
 
 @router.post("/chat", response_model=dict)
 async def ai_chat(
     request: ChatRequest,
     current_user: User = Depends(get_current_user)
 ):
-    """Chat with Gemini AI to generate feature lists in JSON format using httpx for robust proxy support"""
+    """Chat with Gemini AI to generate feature lists in JSON format using the shared pooled httpx client"""
     try:
-        api_key = settings.GEMINI_API_KEY if hasattr(settings, 'GEMINI_API_KEY') else os.getenv("GEMINI_API_KEY")
-        if not api_key:
-            raise AtlasException("Gemini API key is not configured in environment variables.", code=500)
+        api_key = _get_api_key()
 
         # Use dynamically passed model_name or fallback to default
-        model = request.model_name or "gemini-3.1-pro-preview"
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
-        
-        # Build contents array
-        gemini_contents = []
-        for msg in request.messages:
-            gemini_contents.append({
-                "role": msg.role, 
-                "parts": [{"text": part} for part in msg.parts]
-            })
+        model = request.model_name or DEFAULT_MODEL
 
-        payload = {
-            "contents": gemini_contents,
-            "systemInstruction": {
-                "role": "user",
-                "parts": [{"text": request.system_instruction}]
-            },
-            "generationConfig": {
-                "responseMimeType": "application/json"
-            }
-        }
-
-        # Setup httpx client (disabling SSL verification to avoid common local proxy cert issues)
-        async with httpx.AsyncClient(verify=False, timeout=60.0) as client:
-            response = await client.post(url, json=payload)
-            response.raise_for_status()
-            
-            data = response.json()
-            
-            # Extract text
-            candidates = data.get("candidates", [])
-            if not candidates:
-                raise Exception("No response candidates returned from Gemini.")
-                
-            ai_text = candidates[0].get("content", {}).get("parts", [])[0].get("text", "")
-            
+        cache_key = _request_cache_key(request, model)
+        cached_text = await _lookup_cache(request, cache_key)
+        if cached_text is not None:
             return success_response({
-                "text": ai_text
+                "text": cached_text,
+                "cached": True
             })
-            
+
+        data = await gemini_client.generate_content(model, _build_payload(request), api_key)
+
+        # Extract text
+        candidates = data.get("candidates", [])
+        if not candidates:
+            raise Exception("No response candidates returned from Gemini.")
+
+        ai_text = candidates[0].get("content", {}).get("parts", [])[0].get("text", "")
+
+        if ai_response_cache.enabled and ai_text:
+            await ai_response_cache.set(cache_key, ai_text)
+
+        return success_response({
+            "text": ai_text,
+            "cached": False
+        })
+
+    except AtlasException:
+        raise
     except httpx.HTTPError as he:
         import traceback
         traceback.print_exc()
@@ -97,3 +140,64 @@ async def ai_chat(
         import traceback
         traceback.print_exc()
         raise AtlasException(f"AI Service Error: {str(e)}", code=500)
+
+
+def _sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@router.post("/chat/stream")
+async def ai_chat_stream(
+    request: ChatRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Stream the feature list as server-sent events.
+    Events: `row` (one completed feature object), `done` ({text, cached}), `error` ({message}).
+    """
+    api_key = _get_api_key()
+    model = request.model_name or DEFAULT_MODEL
+    cache_key = _request_cache_key(request, model)
+    cached_text = await _lookup_cache(request, cache_key)
+
+    async def event_stream():
+        parser = JSONArrayStreamParser()
+        if cached_text is not None:
+            for row in parser.feed(cached_text):
+                yield _sse_event("row", row)
+            yield _sse_event("done", {"text": cached_text, "cached": True})
+            return
+
+        parts = []
+        try:
+            async for text in gemini_client.stream_generate_content(model, _build_payload(request), api_key):
+                parts.append(text)
+                for row in parser.feed(text):
+                    yield _sse_event("row", row)
+        except httpx.HTTPError as he:
+            yield _sse_event("error", {"message": f"AI Network Error: Failed to reach Gemini API. Details: {str(he)}"})
+            return
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            yield _sse_event("error", {"message": f"AI Service Error: {str(e)}"})
+            return
+
+        ai_text = "".join(parts)
+        if ai_response_cache.enabled and ai_text:
+            await ai_response_cache.set(cache_key, ai_text)
+        yield _sse_event("done", {"text": ai_text, "cached": False})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/cache/stats", response_model=dict)
+async def ai_cache_stats(
+    current_user: User = Depends(get_current_user)
+):
+    """AI response cache statistics (hit ratio, tier sizes)"""
+    return success_response(ai_response_cache.stats())
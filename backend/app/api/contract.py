@@ -16,6 +16,7 @@ from app.models.contract import (
     ContractType, ContractStatus, CounterpartyType,
     PaymentDirection, PaymentPlanStatus
 )
+from app.services.facets import contract_facets
 from app.schemas.contract import (
     CounterpartyCreate, CounterpartyResponse,
     ContractCreate, ContractUpdate, ContractResponse,
@@ -171,6 +172,15 @@ async def list_contracts(
         raise
 
 
+@router.get("/contracts/facets", response_model=dict)
+async def get_contract_facets(
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Contract counts by status and type for the list tabs (briefly cached)"""
+    return success_response(contract_facets(session))
+
+
 @router.get("/contracts/{contract_id}", response_model=dict)
 async def get_contract(
     contract_id: UUID,
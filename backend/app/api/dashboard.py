@@ -0,0 +1,18 @@
+"""
+Dashboard API endpoints
+"""
+from fastapi import APIRouter, Depends
+from app.core.auth import get_current_user
+from app.core.response import success_response
+from app.models.iam import User
+from app.services.dashboard import dashboard_cache
+
+router = APIRouter(prefix="/dashboard", tags=["Dashboard"])
+
+
+@router.get("/summary", response_model=dict)
+async def get_dashboard_summary(
+    current_user: User = Depends(get_current_user)
+):
+    """All workbench widgets in one round trip (my todos, team todos, my projects, finance accounts)"""
+    return success_response(await dashboard_cache.get(current_user.id))
@@ -0,0 +1,148 @@
+"""
+Bulk export API endpoints
+"""
+from datetime import date
+from typing import Any, Dict, Optional
+from uuid import UUID
+from fastapi import APIRouter, BackgroundTasks, Depends, Query
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import BaseModel, ValidationError
+import tempfile
+
+from app.core.auth import get_current_user
+from app.core.config import settings
+from app.core.exceptions import ValidationException
+from app.core.response import success_response
+from app.models.iam import User
+from app.services.export import (
+    EXPORT_FORMATS, ExportDataset, check_format, get_dataset, iter_rows,
+    csv_chunks, ndjson_chunks, write_xlsx, export_jobs
+)
+from app.utils.files import attachment_headers, iter_file
+
+router = APIRouter(prefix="/export", tags=["Export"])
+
+
+class ExportFilters(BaseModel):
+    """Background export filters, typed like the query parameters of GET /export/{dataset}"""
+    status: Optional[str] = None
+    contract_type: Optional[str] = None
+    source_type: Optional[str] = None
+    invoice_kind: Optional[str] = None
+    txn_direction: Optional[str] = None
+    our_entity_id: Optional[UUID] = None
+    account_id: Optional[UUID] = None
+    contract_id: Optional[UUID] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+
+
+class ExportJobCreate(BaseModel):
+    """Background export job request"""
+    dataset: str  # transactions, invoices, contracts, todos
+    format: str = "csv"  # csv, ndjson, xlsx
+    filters: Dict[str, Any] = {}  # Keys supported by the dataset, see ExportFilters
+
+
+def parse_filters(dataset: ExportDataset, raw: Dict[str, Any]) -> Dict[str, Any]:
+    """Validate and convert JSON filters of a background export (400 on unknown keys or bad values)"""
+    unknown = sorted(set(raw) - set(dataset.filter_names))
+    if unknown:
+        raise ValidationException(f"{dataset.name} 不支持的筛选条件: {', '.join(unknown)}")
+    try:
+        return ExportFilters.model_validate(raw).model_dump(exclude_none=True)
+    except ValidationError as e:
+        fields = sorted({str(error["loc"][0]) for error in e.errors()})
+        raise ValidationException(f"筛选条件格式错误: {', '.join(fields)}")
+
+
+@router.post("/jobs", response_model=dict)
+async def create_export_job(
+    data: ExportJobCreate,
+    background_tasks: BackgroundTasks,
+    current_user: User = Depends(get_current_user)
+):
+    """Start a background export; poll the job and download the file when done"""
+    dataset = get_dataset(data.dataset)
+    check_format(data.format)
+    filters = parse_filters(dataset, data.filters)
+    job = export_jobs.create(data.dataset, data.format, filters, current_user.id)
+    background_tasks.add_task(export_jobs.run, job)
+    return success_response(job.to_dict())
+
+
+@router.get("/jobs/{job_id}", response_model=dict)
+async def get_export_job(
+    job_id: UUID,
+    current_user: User = Depends(get_current_user)
+):
+    """Get background export job status"""
+    job = export_jobs.get(job_id, current_user.id)
+    return success_response(job.to_dict())
+
+
+@router.get("/jobs/{job_id}/download")
+async def download_export_job(
+    job_id: UUID,
+    current_user: User = Depends(get_current_user)
+):
+    """Download the file produced by a finished export job"""
+    job = export_jobs.get(job_id, current_user.id)
+    if job.status != "done" or not job.file_path:
+        raise ValidationException(f"导出任务尚未完成: {job.status}")
+    return FileResponse(
+        job.file_path,
+        media_type=EXPORT_FORMATS[job.format][0],
+        headers=attachment_headers(job.filename),
+    )
+
+
+@router.get("/{dataset}")
+async def stream_export(
+    dataset: str,
+    format: str = Query("csv"),
+    status: Optional[str] = Query(None),
+    contract_type: Optional[str] = Query(None),
+    source_type: Optional[str] = Query(None),
+    invoice_kind: Optional[str] = Query(None),
+    txn_direction: Optional[str] = Query(None),
+    our_entity_id: Optional[UUID] = Query(None),
+    account_id: Optional[UUID] = Query(None),
+    contract_id: Optional[UUID] = Query(None),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
+    current_user: User = Depends(get_current_user)
+):
+    """Stream a dataset export directly (CSV / NDJSON are encoded as rows are read)"""
+    export_dataset = get_dataset(dataset)
+    check_format(format)
+    filters = {
+        "status": status,
+        "contract_type": contract_type,
+        "source_type": source_type,
+        "invoice_kind": invoice_kind,
+        "txn_direction": txn_direction,
+        "our_entity_id": our_entity_id,
+        "account_id": account_id,
+        "contract_id": contract_id,
+        "date_from": date_from,
+        "date_to": date_to,
+    }
+    media_type, extension = EXPORT_FORMATS[format]
+    headers = attachment_headers(f"{dataset}.{extension}")
+    rows = iter_rows(export_dataset, filters, current_user.id)
+
+    if format == "xlsx":
+        # The xlsx container is only complete on save, so build it in a worker thread first
+        out = tempfile.SpooledTemporaryFile(max_size=settings.EXPORT_SPOOL_MAX_MEMORY)
+        try:
+            await run_in_threadpool(write_xlsx, export_dataset.columns, rows, out, dataset)
+        except Exception:
+            out.close()
+            raise
+        return StreamingResponse(iter_file(out), media_type=media_type, headers=headers)
+
+    encoder = csv_chunks if format == "csv" else ndjson_chunks
+    # Sync generator: Starlette iterates it in a worker thread, off the event loop
+    return StreamingResponse(encoder(export_dataset.columns, rows), media_type=media_type, headers=headers)
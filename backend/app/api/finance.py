@@ -3,13 +3,17 @@ Finance API endpoints
 """
 from typing import Optional
 from uuid import UUID
-from datetime import datetime
-from fastapi import APIRouter, Depends, Query
+from datetime import date, datetime
+from fastapi import APIRouter, Depends, Query, UploadFile, File, Form
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session, select
+from app.core.config import settings
 from app.core.database import get_session
 from app.core.auth import get_current_user
-from app.core.exceptions import NotFoundException
+from app.core.exceptions import NotFoundException, ValidationException
 from app.core.response import success_response
+from app.core.archive import archives, history
+from app.core.sharding import count_of, shards
 from app.models.iam import User
 from app.models.finance import (
     FinanceAccount, FinanceTransaction, FinanceInvoice, Reimbursement,
@@ -19,10 +23,17 @@ from app.models.finance import (
 )
 from app.schemas.finance import (
     FinanceAccountCreate, FinanceAccountUpdate, FinanceAccountResponse,
-    TransactionCreate, TransactionResponse,
+    TransactionCreate, TransactionResponse, PaymentPlanReallocate,
     InvoiceCreate, InvoiceResponse,
     ReimbursementCreate, ReimbursementResponse
 )
+from app.services.aging import compute_aging, snapshot_aging, take_snapshot, aging_totals
+from app.services.bank_import import read_statement, import_bank_statement
+from app.services.finance_reports import (
+    REPORT_DIMENSIONS, account_balances, parse_group_by, check_month, cash_flow_report, rebuild_rollup,
+    record_transactions
+)
+from app.services.settlement import settle_transaction, reallocate_contracts
 
 router = APIRouter(prefix="/finance", tags=["Finance"])
 
@@ -63,24 +74,12 @@ async def list_accounts(
     """List finance accounts"""
     accounts = session.exec(select(FinanceAccount).where(FinanceAccount.status == AccountStatus.ACTIVE)).all()
     
+    balances = account_balances(session, accounts)
+    
     results = []
     for account in accounts:
-        # Calculate balance: initial_balance + sum(transactions)
-        # In: +amount, Out: -amount
-        
-        # This is N+1, optimize later if needed
-        txns = session.exec(select(FinanceTransaction).where(FinanceTransaction.account_id == account.id)).all()
-        
-        current_balance = account.initial_balance
-        for txn in txns:
-            if txn.txn_direction == TransactionDirection.IN:
-                current_balance += txn.amount
-            else:
-                current_balance -= txn.amount
-                
-        # Create response object and set computed balance
         acc_resp = FinanceAccountResponse.model_validate(account)
-        acc_resp.balance = current_balance
+        acc_resp.balance = balances[account.id]
         results.append(acc_resp)
         
     return success_response(results)
@@ -155,68 +154,82 @@ async def create_transaction(
     )
     
     session.add(transaction)
-    session.commit()
-    session.refresh(transaction)
     
-    # Update contract pending_amount if transaction is linked to a contract
+    # Settle contract pending_amount and installments in the same database transaction as the insert
     if data.contract_id:
-        from app.models.contract import Contract, ContractType
-        contract = session.get(Contract, data.contract_id)
-        if contract:
-            # Calculate pending amount change based on contract type and transaction direction
-            # Sales contract: income decreases pending (customer payment), expense increases pending (refund)
-            # Purchase contract: expense decreases pending (our payment), income increases pending (supplier refund)
-            
-            if contract.contract_type == ContractType.SALES:
-                if data.txn_direction == 'in':
-                    # Customer payment - decrease pending amount
-                    contract.pending_amount -= data.amount
-                else:  # 'out'
-                    # Refund to customer - increase pending amount
-                    contract.pending_amount += data.amount
-            elif contract.contract_type == ContractType.PURCHASE:
-                if data.txn_direction == 'out':
-                    # Our payment - decrease pending amount
-                    contract.pending_amount -= data.amount
-                else:  # 'in'
-                    # Supplier refund - increase pending amount
-                    contract.pending_amount += data.amount
-            # For THIRD_PARTY contracts, we don't update pending_amount for now
-            
-            session.add(contract)
-            session.commit()
+        settle_transaction(session, data.contract_id, transaction.txn_direction, data.amount, data.txn_date)
+    record_transactions(session, [transaction])
+    
+    session.commit()
+    session.refresh(transaction)
     
     return success_response(TransactionResponse.model_validate(transaction))
 
 
+@router.post("/transactions/import", response_model=dict)
+async def import_transactions(
+    file: UploadFile = File(...),
+    account_id: UUID = Form(...),
+    our_entity_id: UUID = Form(...),
+    date_window_days: int = Form(3, ge=0, le=31),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Import a bank statement (CSV/XLSX): reconcile against existing transactions, insert the rest"""
+    account = session.get(FinanceAccount, account_id)
+    if not account:
+        raise NotFoundException("未找到账户")
+
+    content = await file.read()
+    if len(content) > settings.MAX_UPLOAD_SIZE:
+        raise ValidationException("对账单文件过大")
+
+    def run_import():
+        df = read_statement(content, file.filename)
+        result = import_bank_statement(
+            session, df, account_id, our_entity_id, current_user.id,
+            default_currency=account.currency, window_days=date_window_days
+        )
+        session.commit()
+        return result
+
+    # Parsing and matching are CPU bound, keep them off the event loop
+    result = await run_in_threadpool(run_import)
+    return success_response(result)
+
+
 @router.get("/transactions", response_model=dict)
 async def list_transactions(
     account_id: Optional[UUID] = Query(None),
     txn_direction: Optional[str] = Query(None),
+    date_from: Optional[date] = Query(None),
+    date_to: Optional[date] = Query(None),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    """List transactions"""
-    query = select(FinanceTransaction)
+    """
+    List transactions.
+
+    Without date_from only the hot table is read: with archiving enabled,
+    transactions older than the hot window need an explicit date_from.
+    """
+    Txn = history(session, FinanceTransaction, since=date_from) if date_from else FinanceTransaction
+    query = select(Txn)
     
     if account_id:
-        query = query.where(FinanceTransaction.account_id == account_id)
+        query = query.where(Txn.account_id == account_id)
     if txn_direction:
-        query = query.where(FinanceTransaction.txn_direction == txn_direction)
-    
-    query = query.order_by(FinanceTransaction.txn_date.desc())
+        query = query.where(Txn.txn_direction == txn_direction)
+    if date_from:
+        query = query.where(Txn.txn_date >= date_from)
+    if date_to:
+        query = query.where(Txn.txn_date <= date_to)
     
     offset = (page - 1) * page_size
-    transactions = session.exec(query.offset(offset).limit(page_size)).all()
-    
-    count_query = select(FinanceTransaction)
-    if account_id:
-        count_query = count_query.where(FinanceTransaction.account_id == account_id)
-    if txn_direction:
-        count_query = count_query.where(FinanceTransaction.txn_direction == txn_direction)
-    total = len(session.exec(count_query).all())
+    transactions = session.exec(query.order_by(Txn.txn_date.desc()).offset(offset).limit(page_size)).all()
+    total = count_of(session, query, Txn)
     
     return success_response({
         "items": [TransactionResponse.model_validate(t) for t in transactions],
@@ -234,13 +247,119 @@ async def get_transaction(
     current_user: User = Depends(get_current_user)
 ):
     """Get transaction"""
-    transaction = session.get(FinanceTransaction, txn_id)
+    transaction = archives.get(session, FinanceTransaction, txn_id)
     if not transaction:
         raise NotFoundException("未找到交易")
     
     return success_response(TransactionResponse.model_validate(transaction))
 
 
+# Payment plan endpoints
+
+@router.post("/payment-plans/reallocate", response_model=dict)
+async def reallocate_payment_plans(
+    data: PaymentPlanReallocate,
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Rebuild installment paid amounts and status from linked transactions (e.g. after an import)"""
+    updated = reallocate_contracts(session, data.contract_ids)
+    session.commit()
+    return success_response({"updated": updated})
+
+
+# Report endpoints
+
+@router.get("/reports/cash-flow", response_model=dict)
+async def get_cash_flow_report(
+    group_by: str = Query("month", description=f"Comma separated: {', '.join(REPORT_DIMENSIONS)}"),
+    month_from: Optional[str] = Query(None, description="YYYY-MM"),
+    month_to: Optional[str] = Query(None, description="YYYY-MM"),
+    our_entity_id: Optional[UUID] = Query(None),
+    account_id: Optional[UUID] = Query(None),
+    counterparty_id: Optional[UUID] = Query(None),
+    contract_id: Optional[UUID] = Query(None),
+    currency: Optional[str] = Query(None),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Cash flow in/out/net totals grouped by month, entity, account, counterparty or contract"""
+    dimensions = parse_group_by(group_by)
+    rows = cash_flow_report(
+        session, dimensions, check_month(month_from), check_month(month_to),
+        filters={
+            "our_entity_id": our_entity_id,
+            "account_id": account_id,
+            "counterparty_id": counterparty_id,
+            "contract_id": contract_id,
+            "currency": currency,
+        }
+    )
+    return success_response({"group_by": dimensions, "rows": rows})
+
+
+@router.post("/reports/cash-flow/rebuild", response_model=dict)
+async def rebuild_cash_flow_rollup(
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Recompute the monthly cash flow rollup from all transactions"""
+    buckets = rebuild_rollup(session)
+    session.commit()
+    return success_response({"buckets": buckets})
+
+
+@router.get("/reports/aging", response_model=dict)
+async def get_aging_report(
+    as_of: Optional[date] = Query(None, description="Defaults to today; past dates read the daily snapshot"),
+    our_entity_id: Optional[UUID] = Query(None),
+    counterparty_id: Optional[UUID] = Query(None),
+    group_by: Optional[str] = Query(None, description="counterparty, entity or both (comma separated)"),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """AR/AP aging of open installments: not yet due, 0-30, 31-60, 61-90, 90+ days past due"""
+    dimensions = [d.strip() for d in (group_by or "").split(",") if d.strip()]
+    invalid = [d for d in dimensions if d not in ("counterparty", "entity")]
+    if invalid:
+        raise ValidationException(f"不支持的分组维度: {', '.join(invalid)}")
+    options = {
+        "our_entity_id": our_entity_id,
+        "counterparty_id": counterparty_id,
+        "by_counterparty": "counterparty" in dimensions,
+        "by_entity": "entity" in dimensions,
+    }
+
+    today = date.today()
+    if as_of and as_of < today:
+        rows = snapshot_aging(session, as_of, **options)
+        if rows is None:
+            raise NotFoundException(f"{as_of} 没有账龄快照")
+        source = "snapshot"
+    else:
+        as_of = today
+        rows = compute_aging(session, as_of, **options)
+        source = "live"
+
+    return success_response({
+        "as_of": as_of,
+        "source": source,
+        "rows": rows,
+        "totals": aging_totals(rows),
+    })
+
+
+@router.post("/reports/aging/snapshot", response_model=dict)
+async def take_aging_snapshot(
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Store (or refresh) today's aging snapshot"""
+    rows = take_snapshot(session)
+    session.commit()
+    return success_response({"snapshot_date": date.today(), "rows": rows})
+
+
 # Invoice endpoints
 
 @router.post("/invoices", response_model=dict)
@@ -263,36 +382,40 @@ async def create_invoice(
         related_payment_plan_id=data.related_payment_plan_id
     )
     
-    session.add(invoice)
-    session.commit()
-    session.refresh(invoice)
-    
-    return success_response(InvoiceResponse.model_validate(invoice))
+    with shards.session(data.our_entity_id, session) as entity_session:
+        entity_session.add(invoice)
+        entity_session.commit()
+        entity_session.refresh(invoice)
+        
+        return success_response(InvoiceResponse.model_validate(invoice))
 
 
 @router.get("/invoices", response_model=dict)
 async def list_invoices(
     invoice_kind: Optional[str] = Query(None),
+    our_entity_id: Optional[UUID] = Query(None),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    """List invoices"""
+    """List invoices (of every entity unless our_entity_id is given)"""
     query = select(FinanceInvoice)
     
+    if our_entity_id:
+        query = query.where(FinanceInvoice.our_entity_id == our_entity_id)
     if invoice_kind:
         query = query.where(FinanceInvoice.invoice_kind == invoice_kind)
     
-    query = query.order_by(FinanceInvoice.created_at.desc())
-    
-    offset = (page - 1) * page_size
-    invoices = session.exec(query.offset(offset).limit(page_size)).all()
-    
-    count_query = select(FinanceInvoice)
-    if invoice_kind:
-        count_query = count_query.where(FinanceInvoice.invoice_kind == invoice_kind)
-    total = len(session.exec(count_query).all())
+    if our_entity_id is None and shards.enabled:
+        invoices, total = await shards.paginate(query, FinanceInvoice, page, page_size)
+    else:
+        with shards.session(our_entity_id, session) as entity_session:
+            offset = (page - 1) * page_size
+            invoices = entity_session.exec(
+                query.order_by(FinanceInvoice.created_at.desc()).offset(offset).limit(page_size)
+            ).all()
+            total = count_of(entity_session, query, FinanceInvoice)
     
     return success_response({
         "items": [InvoiceResponse.model_validate(i) for i in invoices],
@@ -322,36 +445,40 @@ async def create_reimbursement(
         status=ReimbursementStatus.DRAFT
     )
     
-    session.add(reimbursement)
-    session.commit()
-    session.refresh(reimbursement)
-    
-    return success_response(ReimbursementResponse.model_validate(reimbursement))
+    with shards.session(data.our_entity_id, session) as entity_session:
+        entity_session.add(reimbursement)
+        entity_session.commit()
+        entity_session.refresh(reimbursement)
+        
+        return success_response(ReimbursementResponse.model_validate(reimbursement))
 
 
 @router.get("/reimbursements", response_model=dict)
 async def list_reimbursements(
     status: Optional[str] = Query(None),
+    our_entity_id: Optional[UUID] = Query(None),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    """List reimbursements"""
+    """List my reimbursements (of every entity unless our_entity_id is given)"""
     query = select(Reimbursement).where(Reimbursement.requester_user_id == current_user.id)
     
+    if our_entity_id:
+        query = query.where(Reimbursement.our_entity_id == our_entity_id)
     if status:
         query = query.where(Reimbursement.status == status)
     
-    query = query.order_by(Reimbursement.created_at.desc())
-    
-    offset = (page - 1) * page_size
-    reimbursements = session.exec(query.offset(offset).limit(page_size)).all()
-    
-    count_query = select(Reimbursement).where(Reimbursement.requester_user_id == current_user.id)
-    if status:
-        count_query = count_query.where(Reimbursement.status == status)
-    total = len(session.exec(count_query).all())
+    if our_entity_id is None and shards.enabled:
+        reimbursements, total = await shards.paginate(query, Reimbursement, page, page_size)
+    else:
+        with shards.session(our_entity_id, session) as entity_session:
+            offset = (page - 1) * page_size
+            reimbursements = entity_session.exec(
+                query.order_by(Reimbursement.created_at.desc()).offset(offset).limit(page_size)
+            ).all()
+            total = count_of(entity_session, query, Reimbursement)
     
     return success_response({
         "items": [ReimbursementResponse.model_validate(r) for r in reimbursements],
@@ -1,13 +1,15 @@
 """
 IAM API endpoints (Users, Roles, Entities, Departments, Job Titles, Org Chart)
 """
+from datetime import datetime
 from typing import List, Optional
 from uuid import UUID
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
 from sqlmodel import Session, select
 from app.core.database import get_session
 from app.core.auth import get_current_user
 from app.core.security import get_password_hash
+from app.core.etag import etag_matches, make_etag, not_modified, table_version, with_etag
 from app.core.exceptions import NotFoundException
 from app.core.response import success_response
 from app.models.iam import User, OurEntity, Role, UserStatus, JobTitle, OrgUnit
@@ -163,6 +165,7 @@ async def update_job_title(
         jt.name = data.name
     if data.description is not None:
         jt.description = data.description
+    jt.updated_at = datetime.utcnow()
     session.add(jt)
     session.commit()
     session.refresh(jt)
@@ -258,6 +261,7 @@ async def update_department(
         dept.description = data.description
     if data.parent_org_unit_id is not None:
         dept.parent_org_unit_id = data.parent_org_unit_id
+    dept.updated_at = datetime.utcnow()
     session.add(dept)
     session.commit()
     session.refresh(dept)
@@ -314,10 +318,19 @@ async def list_entities(
 
 @router.get("/org-chart", response_model=dict)
 async def get_org_chart(
+    request: Request,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    """Get organization chart as a tree"""
+    """Get organization chart as a tree. Supports If-None-Match."""
+    etag = make_etag(
+        table_version(session, User, User.status == UserStatus.ACTIVE),
+        table_version(session, JobTitle),
+        table_version(session, OrgUnit),
+    )
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
     all_users = session.exec(select(User).where(User.status == "active")).all()
     all_job_titles = session.exec(select(JobTitle)).all()
     all_depts = session.exec(select(OrgUnit)).all()
@@ -336,7 +349,7 @@ async def get_org_chart(
             unique_roots.append(u)
 
     tree = [_build_org_chart(u, list(all_users), job_title_map, dept_map) for u in unique_roots]
-    return success_response(tree)
+    return with_etag(success_response(tree), etag)
 
 
 # ─── User endpoints ──────────────────────────────────────────────────────────
@@ -445,6 +458,7 @@ async def update_user(
         user.job_title_id = user_data.job_title_id
     if user_data.department_id is not None:
         user.department_id = user_data.department_id
+    user.updated_at = datetime.utcnow()
     
     session.add(user)
     session.commit()
@@ -0,0 +1,107 @@
+"""
+Realtime push endpoints (WebSocket with SSE fallback)
+"""
+import asyncio
+import json
+from typing import Optional
+from uuid import UUID
+from fastapi import APIRouter, Depends, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from sqlmodel import Session
+from app.core.auth import get_current_user
+from app.core.config import settings
+from app.core.database import engine
+from app.core.pubsub import broker
+from app.core.security import decode_access_token
+from app.models.iam import User, UserStatus
+from app.services.realtime import user_channel
+
+router = APIRouter(prefix="/realtime", tags=["Realtime"])
+
+HELLO_MESSAGE = {"type": "hello"}
+
+
+def _user_from_token(token: Optional[str]) -> Optional[User]:
+    """Same checks as get_current_user, for the WebSocket handshake"""
+    if not token:
+        return None
+    try:
+        user_id = decode_access_token(token).get("sub")
+        if not user_id:
+            return None
+        with Session(engine) as session:
+            user = session.get(User, UUID(user_id))
+    except Exception:
+        return None
+    if user is None or user.status != UserStatus.ACTIVE:
+        return None
+    return user
+
+
+@router.websocket("/ws")
+async def push_websocket(websocket: WebSocket, token: Optional[str] = Query(None)):
+    """
+    Push channel. Authenticates with the access_token cookie or ?token=.
+
+    Server messages are JSON events ({"type", "data", "at"}); "hello" on
+    connect and "resync" after an overflow mean the client should refetch.
+    Clients may send "ping" and receive "pong".
+    """
+    user = _user_from_token(websocket.cookies.get("access_token") or token)
+    if user is None:
+        await websocket.close(code=4401)
+        return
+
+    await websocket.accept()
+    subscription = broker.subscribe(user_channel(user.id))
+
+    async def send_events():
+        await websocket.send_json(HELLO_MESSAGE)
+        while True:
+            message = await subscription.get(settings.PUSH_HEARTBEAT_INTERVAL)
+            await websocket.send_json(message if message is not None else {"type": "ping"})
+
+    async def receive_pings():
+        while True:
+            if await websocket.receive_text() == "ping":
+                await websocket.send_json({"type": "pong"})
+
+    tasks = [asyncio.create_task(send_events()), asyncio.create_task(receive_pings())]
+    try:
+        # Either side ending (disconnect, send failure) closes the connection
+        done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if not task.cancelled() and task.exception() and not isinstance(task.exception(), WebSocketDisconnect):
+                print(f"❌ Push websocket failed: {type(task.exception()).__name__}: {task.exception()}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        broker.unsubscribe(subscription)
+
+
+@router.get("/events")
+async def push_event_stream(
+    request: Request,
+    current_user: User = Depends(get_current_user)
+):
+    """Server-sent events fallback of /realtime/ws, same events (EventSource sends the auth cookie)"""
+    subscription = broker.subscribe(user_channel(current_user.id))
+
+    async def stream():
+        try:
+            yield _sse(HELLO_MESSAGE)
+            while not await request.is_disconnected():
+                message = await subscription.get(settings.PUSH_HEARTBEAT_INTERVAL)
+                # Comment frames keep proxies from closing an idle stream
+                yield _sse(message) if message is not None else ": ping\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",  # Disable nginx response buffering
+    })
+
+
+def _sse(message: dict) -> str:
+    return f"event: {message['type']}\ndata: {json.dumps(message, ensure_ascii=False)}\n\n"
@@ -0,0 +1,65 @@
+"""
+Search API endpoints
+"""
+from typing import Optional
+from fastapi import APIRouter, Depends, Query
+from sqlmodel import Session, select
+from app.core.database import get_session
+from app.core.auth import get_current_user
+from app.core.response import success_response
+from app.models.iam import User
+from app.services.search import parse_kinds, search_documents, rebuild_search_index
+from app.services.suggest import suggest_indexes, SUGGEST_LIMIT, SUGGEST_MAX_LIMIT
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+
+@router.get("", response_model=dict)
+async def search(
+    q: str = Query(..., min_length=1, description="关键词, 空格分隔的词需全部命中"),
+    kinds: Optional[str] = Query(None, description="逗号分隔: contract,project,counterparty,todo"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Full-text search across contracts, projects, counterparties and todos, best matches first"""
+    # Todos follow the usual visibility: own, created by me, or assigned to my direct reports
+    subordinate_ids = session.exec(select(User.id).where(User.manager_user_id == current_user.id)).all()
+    items, total = search_documents(
+        session, q,
+        kinds=parse_kinds(kinds),
+        user_id=current_user.id,
+        visible_assignee_ids=[current_user.id, *subordinate_ids],
+        page=page,
+        page_size=page_size,
+    )
+    return success_response({
+        "items": items,
+        "total": total,
+        "page": page,
+        "page_size": page_size,
+        "pages": (total + page_size - 1) // page_size
+    })
+
+
+@router.get("/suggest/{kind}", response_model=dict)
+async def suggest(
+    kind: str,
+    q: str = Query("", description="前缀: 名称 / 用户名 / 编号 / 税号 / 拼音或拼音首字母"),
+    limit: int = Query(SUGGEST_LIMIT, ge=1, le=SUGGEST_MAX_LIMIT),
+    current_user: User = Depends(get_current_user)
+):
+    """Typeahead for pickers (kind: users, counterparties, projects), served from memory"""
+    return success_response(suggest_indexes.suggest(kind, q, limit))
+
+
+@router.post("/rebuild", response_model=dict)
+async def rebuild_index(
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Re-index every record (after bulk imports that bypass the write hooks)"""
+    documents = rebuild_search_index(session)
+    session.commit()
+    return success_response({"documents": documents})
@@ -4,19 +4,23 @@ Todo API endpoints
 from typing import Optional
 from uuid import UUID
 from datetime import datetime
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request
 from sqlmodel import Session, select
 from app.core.database import get_session
 from app.core.auth import get_current_user
+from app.core.etag import etag_matches, make_etag, not_modified, table_version, version_of, with_etag
 from app.core.exceptions import NotFoundException
-from app.core.response import success_response
+from app.core.response import PaginatedResponse, ResponseModel, success_response
 from app.models.iam import User
 from app.models.todo import (
-    TodoItem, TodoStatus, TodoSourceType, TodoActionType,
+    TodoItem, TodoTag, TodoStatus, TodoSourceType, TodoActionType,
     NotificationLog, NotificationChannel, NotificationStatus
 )
 from app.schemas.todo import TodoCreate, TodoUpdate, TodoReviewAction, TodoResponse
 from app.api.project import sync_project_progress
+from app.services.facets import todo_facets
+from app.services.realtime import push_after_commit
+from app.services.todo_tags import parse_tags, tag_filter
 
 router = APIRouter(prefix="/todo", tags=["Todo"])
 
@@ -33,6 +37,17 @@ def _enrich_todo(todo: TodoItem, session: Session) -> TodoResponse:
     return data
 
 
+def _notification_data(log: NotificationLog, todo: TodoItem) -> dict:
+    """Payload of the realtime "notification" event"""
+    return {
+        "notification_id": log.id,
+        "todo_id": todo.id,
+        "title": todo.title,
+        "status": todo.status,
+        "assignee_user_id": todo.assignee_user_id,
+    }
+
+
 def _notify_manager(user_id: UUID, todo: TodoItem, session: Session):
     """Create an in-app notification for the user's manager (if they have one)."""
     user = session.get(User, user_id)
@@ -45,6 +60,7 @@ def _notify_manager(user_id: UUID, todo: TodoItem, session: Session):
         sent_at=datetime.utcnow(),
     )
     session.add(log)
+    push_after_commit(session, user.manager_user_id, "notification", _notification_data(log, todo))
 
 
 def _notify_user(user_id: UUID, todo: TodoItem, session: Session):
@@ -69,6 +85,7 @@ def _notify_user(user_id: UUID, todo: TodoItem, session: Session):
     # It has `todo_id`.
     # Maybe the frontend queries NotificationLog joined with Todo?
     session.add(log)
+    push_after_commit(session, user_id, "notification", _notification_data(log, todo))
 
 
 def _is_direct_manager(manager: User, subordinate: User) -> bool:
@@ -118,16 +135,18 @@ async def create_todo(
 
 # ─── My todos ────────────────────────────────────────────────────────────────
 
-@router.get("/my", response_model=dict)
+@router.get("/my", response_model=ResponseModel[PaginatedResponse[TodoResponse]])
 async def get_my_todos(
+    request: Request,
     status: Optional[str] = Query(None),
     source_type: Optional[str] = Query(None),
+    tags: Optional[str] = Query(None, description="逗号分隔, 需同时包含所有标签"),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    """Get current user's todos (assigned to me)."""
+    """Get current user's todos (assigned to me). Supports If-None-Match."""
     query = select(TodoItem).where(TodoItem.assignee_user_id == current_user.id)
 
     if status:
@@ -143,22 +162,25 @@ async def get_my_todos(
             query = query.where(TodoItem.status == status)
     if source_type:
         query = query.where(TodoItem.source_type == source_type)
+    query = tag_filter(query, parse_tags(tags))
 
-    query = query.order_by(TodoItem.due_at)
-
-    count_query = query
-    total = len(session.exec(count_query).all())
+    # Names come from User rows, so their writes change the ETag too
+    total, latest = version_of(session, query, TodoItem)
+    etag = make_etag(current_user.id, request.url.query, total, latest, table_version(session, User))
+    if etag_matches(request, etag):
+        return not_modified(etag)
 
+    query = query.order_by(TodoItem.due_at)
     offset = (page - 1) * page_size
     todos = session.exec(query.offset(offset).limit(page_size)).all()
 
-    return success_response({
+    return with_etag(success_response({
         "items": [_enrich_todo(t, session) for t in todos],
         "total": total,
         "page": page,
         "page_size": page_size,
         "pages": (total + page_size - 1) // page_size
-    })
+    }), etag)
 
 
 # ─── Team todos (manager view) ───────────────────────────────────────────────
@@ -166,6 +188,7 @@ async def get_my_todos(
 @router.get("/team", response_model=dict)
 async def get_team_todos(
     status: Optional[str] = Query(None),
+    tags: Optional[str] = Query(None, description="逗号分隔, 需同时包含所有标签"),
     page: int = Query(1, ge=1),
     page_size: int = Query(20, ge=1, le=100),
     session: Session = Depends(get_session),
@@ -186,6 +209,7 @@ async def get_team_todos(
 
     if status:
         query = query.where(TodoItem.status == status)
+    query = tag_filter(query, parse_tags(tags))
 
     query = query.order_by(TodoItem.due_at)
 
@@ -203,15 +227,57 @@ async def get_team_todos(
     })
 
 
+# ─── Counts ──────────────────────────────────────────────────────────────────
+
+@router.get("/facets", response_model=dict)
+async def get_todo_facets(
+    scope: str = Query("my", pattern="^(my|team)$"),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Todo counts by status, priority and source type for the board tabs (briefly cached)"""
+    return success_response(todo_facets(session, current_user.id, scope))
+
+
+@router.get("/tags/facets", response_model=dict)
+async def get_tag_facets(
+    scope: str = Query("my", pattern="^(my|team)$"),
+    status: Optional[str] = Query(None),
+    session: Session = Depends(get_session),
+    current_user: User = Depends(get_current_user)
+):
+    """Tag counts over my todos or my direct subordinates' todos, most used first"""
+    from sqlmodel import col, func
+    if scope == "team":
+        assignee_ids = session.exec(select(User.id).where(User.manager_user_id == current_user.id)).all()
+    else:
+        assignee_ids = [current_user.id]
+    if not assignee_ids:
+        return success_response([])
+
+    todo_count = func.count(TodoTag.todo_id)
+    query = (
+        select(TodoTag.tag, todo_count)
+        .join(TodoItem, TodoItem.id == TodoTag.todo_id)
+        .where(col(TodoItem.assignee_user_id).in_(assignee_ids))
+    )
+    if status:
+        query = query.where(TodoItem.status == status)
+    query = query.group_by(TodoTag.tag).order_by(todo_count.desc(), TodoTag.tag)
+
+    return success_response([{"tag": tag, "count": count} for tag, count in session.exec(query).all()])
+
+
 # ─── Single todo ─────────────────────────────────────────────────────────────
 
-@router.get("/{todo_id}", response_model=dict)
+@router.get("/{todo_id}", response_model=ResponseModel[TodoResponse])
 async def get_todo(
     todo_id: UUID,
+    request: Request,
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
-    """Get todo by ID."""
+    """Get todo by ID. Supports If-None-Match."""
     todo = session.get(TodoItem, todo_id)
     if not todo:
         raise NotFoundException("未找到待办事项")
@@ -224,7 +290,11 @@ async def get_todo(
             and not is_manager):
         raise NotFoundException("未找到待办事项")
 
-    return success_response(_enrich_todo(todo, session))
+    etag = make_etag(todo.id, todo.updated_at, table_version(session, User))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    return with_etag(success_response(_enrich_todo(todo, session)), etag)
 
 
 # ─── Update ──────────────────────────────────────────────────────────────────
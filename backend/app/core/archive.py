@@ -0,0 +1,317 @@
+"""
+Time-based archival of append-only tables
+
+finance_transaction, notification_log and audit_log only grow, and most reads touch the
+recent rows. With ARCHIVE_ENABLED each registered table keeps a hot window
+(the last N days of its date column) and older rows leave it, so the hot
+table and its indexes stay small enough to live in memory:
+
+- MySQL (ARCHIVE_MYSQL_PARTITIONS): the table is converted once to monthly
+  RANGE COLUMNS partitions on the date column, and the archive job keeps
+  partitions ahead of the calendar. Old rows stay in their own partitions
+  (whose index pages simply age out of the buffer pool), and date filters
+  prune partitions, so queries need no rewriting. InnoDB does not allow
+  foreign keys on or to partitioned tables, and the primary key must contain
+  the partition column: the conversion drops those foreign keys and extends
+  the primary key to (id, date).
+- Everywhere else: rows older than the hot window are moved in batches to a
+  `<table>_archive` copy (same columns and indexes, no foreign keys), one
+  transaction per batch. Rows another table still references by foreign key
+  (a transaction paying a reimbursement) stay in the hot table.
+
+Readers use `history()` / `with_history()` to see both ranges. They return the
+hot table untouched when the requested range starts after everything archived,
+and a UNION ALL of hot and archived rows otherwise:
+
+    Txn = history(session, FinanceTransaction, since=date_from)
+    rows = session.exec(select(Txn).where(Txn.account_id == account_id)).all()
+
+    totals = session.exec(with_history(session, select(FinanceTransaction.account_id,
+                                                         func.sum(FinanceTransaction.amount)), FinanceTransaction)).all()
+
+Lists that default to recent rows (GET /finance/transactions) only read the
+hot table unless the client asks for an older date_from; aggregates such as
+balances always use the union. Objects loaded through the union are read-only; `update_history()` applies a
+column update to rows wherever they live. Turning ARCHIVE_ENABLED off again hides archived rows until
+they are copied back.
+"""
+import re
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import Column, Index, MetaData, Table, delete, func, insert, text, union_all, update
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql.util import ClauseAdapter
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models.finance import FinanceTransaction
+from app.models.shared import AuditLog
+from app.models.todo import NotificationLog
+
+PARTITION_MONTHS_AHEAD = 3
+_PARTITION_NAME = re.compile(r"^p(\d{4})(\d{2})$")
+
+archive_metadata = MetaData()
+
+
+def _archive_table(source: Table) -> Table:
+    """`<source>_archive` with the same columns and indexes but no foreign keys"""
+    name = f"{source.name}_archive"
+    table = Table(name, archive_metadata, *(
+        Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+        for column in source.columns
+    ))
+    for index in source.indexes:
+        index_name = index.name.replace(source.name, name) if source.name in index.name else f"{name}_{index.name}"
+        Index(index_name, *(table.c[column.name] for column in index.columns), unique=index.unique)
+    return table
+
+
+def _as_date(value: Any) -> date:
+    if isinstance(value, str):
+        value = date.fromisoformat(value[:10])
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _month_start(value: date) -> date:
+    return date(value.year, value.month, 1)
+
+
+def _next_month(month: date) -> date:
+    return date(month.year + month.month // 12, month.month % 12 + 1, 1)
+
+
+def _partitions_from(month: date) -> List[str]:
+    """Monthly partitions from `month` through PARTITION_MONTHS_AHEAD months after the current one"""
+    last = _month_start(date.today())
+    for _ in range(PARTITION_MONTHS_AHEAD):
+        last = _next_month(last)
+    partitions = []
+    while month <= last:
+        partitions.append(f"PARTITION p{month:%Y%m} VALUES LESS THAN ('{_next_month(month).isoformat()}')")
+        month = _next_month(month)
+    return partitions
+
+
+class ArchivedTable:
+    """One table with a hot window on `date_column`"""
+
+    def __init__(self, model, date_column: str, hot_days: int):
+        self.model = model
+        self.table: Table = model.__table__
+        self.date_column = self.table.c[date_column]
+        self.hot_days = hot_days
+        try:
+            self._is_date = self.date_column.type.python_type is date
+        except NotImplementedError:
+            self._is_date = False
+        self.archive = _archive_table(self.table)
+        # Columns of other tables referencing this one (e.g. reimbursement.paid_txn_id)
+        self.referenced_by = [
+            fk.parent for table in self.table.metadata.sorted_tables for fk in table.foreign_keys
+            if fk.column.table is self.table and table is not self.table
+        ]
+        self.partitioned = False
+        self._history = union_all(select(*self.table.c), select(*self.archive.c)).subquery(f"{self.table.name}_history")
+        self._entity = aliased(model, self._history)
+
+    def cutoff(self):
+        """Rows dated before this leave the hot table"""
+        cutoff = datetime.utcnow() - timedelta(days=self.hot_days)
+        return cutoff.date() if self._is_date else cutoff
+
+    def reaches_archive(self, session: Session, since: Any = None) -> bool:
+        """Whether rows dated from `since` (None: all of them) may be in the archive table"""
+        if self.partitioned:
+            return False
+        newest = session.exec(select(func.max(self.archive.c[self.date_column.name]))).one()
+        if newest is None:
+            return False
+        if since is None:
+            return True
+        since = _as_date(since)
+        return since <= _as_date(newest) or since < _as_date(self.cutoff())
+
+    def entity(self, session: Session, since: Any = None):
+        return self._entity if self.reaches_archive(session, since) else self.model
+
+    def adapt(self, session: Session, statement, since: Any = None):
+        return ClauseAdapter(self._history).traverse(statement) if self.reaches_archive(session, since) else statement
+
+    def find(self, session: Session, ident):
+        """Row `ident` looked up in hot + archived rows"""
+        return session.exec(select(self._entity).where(self._entity.id == ident)).first()
+
+    # ─── Archive table (generic) ─────────────────────────────────────────────
+
+    def move_batch(self, session: Session, cutoff) -> int:
+        """
+        Move up to ARCHIVE_BATCH_SIZE rows older than `cutoff` to the archive
+        table, without committing. Rows still referenced by a foreign key stay
+        hot, so the delete neither fails nor leaves dangling references.
+        """
+        query = select(self.table.c.id).where(self.date_column < cutoff)
+        for column in self.referenced_by:
+            query = query.where(self.table.c.id.not_in(select(column).where(column.is_not(None))))
+        ids = session.exec(query.order_by(self.date_column).limit(settings.ARCHIVE_BATCH_SIZE)).all()
+        if not ids:
+            return 0
+        session.execute(insert(self.archive).from_select(
+            [column.name for column in self.table.columns], select(*self.table.c).where(self.table.c.id.in_(ids))
+        ))
+        session.execute(delete(self.table).where(self.table.c.id.in_(ids)))
+        return len(ids)
+
+    def move(self) -> int:
+        cutoff = self.cutoff()
+        moved = 0
+        while True:
+            with Session(engine) as session:
+                batch = self.move_batch(session, cutoff)
+                session.commit()
+            moved += batch
+            if batch < settings.ARCHIVE_BATCH_SIZE:
+                return moved
+
+    # ─── MySQL partitions ────────────────────────────────────────────────────
+
+    def _partition_names(self, conn) -> List[str]:
+        return list(conn.execute(text(
+            "SELECT PARTITION_NAME FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL"
+        ), {"table": self.table.name}).scalars())
+
+    def partition(self, conn):
+        """Convert the table to monthly RANGE COLUMNS partitions (no-op when it already is)"""
+        if self._partition_names(conn):
+            self.partitioned = True
+            return
+        foreign_keys = conn.execute(text(
+            "SELECT TABLE_NAME, CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+            "WHERE CONSTRAINT_SCHEMA = DATABASE() AND (TABLE_NAME = :table OR REFERENCED_TABLE_NAME = :table)"
+        ), {"table": self.table.name}).all()
+        for table_name, constraint in foreign_keys:
+            conn.exec_driver_sql(f"ALTER TABLE `{table_name}` DROP FOREIGN KEY `{constraint}`")
+            print(f"⚠️  Dropped foreign key {table_name}.{constraint} to partition {self.table.name}")
+
+        oldest = conn.execute(select(func.min(self.date_column))).scalar()
+        partitions = _partitions_from(_month_start(_as_date(oldest) if oldest is not None else date.today()))
+        partitions.append("PARTITION pmax VALUES LESS THAN (MAXVALUE)")
+
+        column = self.date_column.name
+        conn.exec_driver_sql(
+            f"ALTER TABLE `{self.table.name}` DROP PRIMARY KEY, ADD PRIMARY KEY (`id`, `{column}`) "
+            f"PARTITION BY RANGE COLUMNS(`{column}`) ({', '.join(partitions)})"
+        )
+        self.partitioned = True
+        print(f"🗄️  {self.table.name} partitioned by month on {column} ({len(partitions)} partitions)")
+
+    def extend_partitions(self, conn) -> int:
+        """Split pmax so that monthly partitions exist PARTITION_MONTHS_AHEAD months ahead"""
+        months = [date(int(m.group(1)), int(m.group(2)), 1)
+                  for m in map(_PARTITION_NAME.match, self._partition_names(conn)) if m]
+        partitions = _partitions_from(_next_month(max(months)) if months else _month_start(date.today()))
+        if partitions:
+            conn.exec_driver_sql(
+                f"ALTER TABLE `{self.table.name}` REORGANIZE PARTITION pmax INTO "
+                f"({', '.join(partitions)}, PARTITION pmax VALUES LESS THAN (MAXVALUE))"
+            )
+        return len(partitions)
+
+
+class ArchiveRegistry:
+    """Registered tables, their setup and the periodic archive job"""
+
+    def __init__(self):
+        self.tables: Dict[type, ArchivedTable] = {}
+
+    def register(self, model, date_column: str, hot_days: int):
+        self.tables[model] = ArchivedTable(model, date_column, hot_days)
+
+    @property
+    def enabled(self) -> bool:
+        return settings.ARCHIVE_ENABLED
+
+    def _uses_partitions(self) -> bool:
+        return engine.dialect.name == "mysql" and settings.ARCHIVE_MYSQL_PARTITIONS
+
+    def setup(self):
+        """Create archive tables or partition the registered tables (application startup)"""
+        if not self.enabled:
+            return
+        if not self._uses_partitions():
+            archive_metadata.create_all(engine)
+            return
+        for archived in self.tables.values():
+            try:
+                with engine.begin() as conn:
+                    archived.partition(conn)
+            except Exception as e:
+                # Fall back to the archive table for this one
+                print(f"⚠️  Could not partition {archived.table.name}, using {archived.archive.name}: "
+                      f"{type(e).__name__}: {str(e)}")
+                archived.archive.create(engine, checkfirst=True)
+
+    def run(self):
+        """Scheduled job: move rows out of the hot window / keep partitions ahead"""
+        for archived in self.tables.values():
+            if archived.partitioned:
+                with engine.begin() as conn:
+                    added = archived.extend_partitions(conn)
+                if added:
+                    print(f"🗄️  {archived.table.name}: {added} partition(s) added")
+                continue
+            moved = archived.move()
+            if moved:
+                print(f"🗄️  {archived.table.name}: {moved} row(s) archived")
+
+    def _get(self, model) -> Optional[ArchivedTable]:
+        return self.tables.get(model) if self.enabled else None
+
+    def history(self, session: Session, model, since: Any = None):
+        archived = self._get(model)
+        return archived.entity(session, since) if archived else model
+
+    def with_history(self, session: Session, statement, model, since: Any = None):
+        archived = self._get(model)
+        return archived.adapt(session, statement, since) if archived else statement
+
+    def get(self, session: Session, model, ident):
+        """session.get() that also looks in the archive"""
+        obj = session.get(model, ident)
+        archived = self._get(model)
+        if obj is None and archived and archived.reaches_archive(session):
+            obj = archived.find(session, ident)
+        return obj
+
+    def update(self, session: Session, model, ids: Sequence, values: dict) -> int:
+        """Set `values` on rows `ids`, hot or archived; returns the number of rows updated"""
+        updated = session.execute(update(model).where(model.id.in_(ids)).values(**values)).rowcount
+        archived = self._get(model)
+        if archived and updated < len(ids) and archived.reaches_archive(session):
+            archive = archived.archive
+            updated += session.execute(update(archive).where(archive.c.id.in_(ids)).values(**values)).rowcount
+        return updated
+
+
+archives = ArchiveRegistry()
+archives.register(FinanceTransaction, "txn_date", settings.ARCHIVE_FINANCE_TRANSACTION_DAYS)
+archives.register(NotificationLog, "created_at", settings.ARCHIVE_NOTIFICATION_LOG_DAYS)
+archives.register(AuditLog, "created_at", settings.ARCHIVE_AUDIT_LOG_DAYS)
+
+
+def history(session: Session, model, since: Any = None):
+    """`model`, or an alias of it over hot + archived rows when rows from `since` may be archived"""
+    return archives.history(session, model, since)
+
+
+def with_history(session: Session, statement, model, since: Any = None):
+    """`statement` with `model`'s table replaced by hot + archived rows when needed (column/aggregate selects)"""
+    return archives.with_history(session, statement, model, since)
+
+
+def update_history(session: Session, model, ids: Sequence, **values) -> int:
+    """UPDATE `model` rows `ids` in the hot table and, when some may be archived, the archive table"""
+    return archives.update(session, model, ids, values)
@@ -0,0 +1,334 @@
+"""
+Audit trail
+
+Every ORM create / update / delete committed on behalf of a signed-in user is
+recorded in audit_log, without a database write on the request path:
+
+1. `after_flush` collects the changed rows with their column diff (from the
+   attribute history SQLAlchemy keeps anyway) into the session;
+2. `after_commit` puts them on a bounded in-memory queue (a rollback drops
+   them), so a request only pays for a few appends;
+3. a background task drains the queue every AUDIT_FLUSH_INTERVAL seconds and
+   bulk-inserts batches of AUDIT_BATCH_SIZE rows from a worker thread.
+
+When the queue is full (database down or too slow) or a batch insert fails,
+entries are appended to the AUDIT_SPILL_PATH JSONL file instead and replayed
+once the queue has been drained; entries still queued at shutdown are
+written (or spilled) before the process exits. Workers share the spill file:
+only the one holding a `flock` on `<AUDIT_SPILL_PATH>.lock` replays it, and
+lines that cannot be parsed (torn by a crash while spilling) are skipped with
+a warning. Replay is at least once: a crash in the middle of a replay may
+write some entries twice.
+
+Audited columns get active history (`load_previous_values`): a column
+assigned on an instance expired by an earlier commit loads its stored value
+first, so updates record the real old value rather than null.
+
+The actor is set by `get_current_user` through `set_audit_actor`. Changes
+made without one (scheduler jobs, startup backfills) are not audited, since
+audit_log.user_id is required. An update setting `status` to approved /
+rejected is recorded with action "approve" / "reject".
+"""
+import asyncio
+import json
+import os
+import queue
+import threading
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+from uuid import UUID, uuid4
+
+from fastapi import Request
+from pydantic_core import to_jsonable_python
+from sqlalchemy import event, insert, inspect
+from sqlalchemy.orm import Mapper, Session
+
+from app.core.config import settings
+from app.core.database import engine
+from app.core.events import load_previous_values
+from app.core.scheduler import FileLeaderLock
+from app.models.contract import ContractAgingSnapshot
+from app.models.finance import FinanceMonthlyRollup
+from app.models.shared import AuditLog
+from app.models.todo import NotificationLog, TodoTag
+
+_PENDING_KEY = "audit_entries"
+
+# Logs and tables derived from other rows
+UNAUDITED_MODELS = (AuditLog, NotificationLog, TodoTag, FinanceMonthlyRollup, ContractAgingSnapshot)
+SKIPPED_FIELDS = ("created_at", "updated_at")
+REDACTED_FIELDS = ("hashed_password",)
+STATUS_ACTIONS = {"approved": "approve", "rejected": "reject"}
+ACTIONS = (("create", "new"), ("update", "dirty"), ("delete", "deleted"))
+
+
+class AuditActor(NamedTuple):
+    user_id: UUID
+    method: Optional[str] = None
+    path: Optional[str] = None
+
+
+_actor: ContextVar[Optional[AuditActor]] = ContextVar("audit_actor", default=None)
+
+
+def set_audit_actor(user_id: UUID, request: Optional[Request] = None):
+    """Attribute the changes committed by the current request to `user_id`"""
+    _actor.set(AuditActor(user_id, request.method if request else None, request.url.path if request else None))
+
+
+# ─── Capture ─────────────────────────────────────────────────────────────────
+
+def _track_columns(mapper: Mapper):
+    if not settings.AUDIT_ENABLED or issubclass(mapper.class_, UNAUDITED_MODELS):
+        return
+    load_previous_values(mapper.class_, [attr.key for attr in mapper.column_attrs if attr.key not in SKIPPED_FIELDS])
+
+
+@event.listens_for(Mapper, "mapper_configured")
+def _track_configured_mapper(mapper, cls):
+    _track_columns(mapper)
+
+
+# Models mapped before this module was imported
+for _mapper in inspect(AuditLog).registry.mappers:
+    _track_columns(_mapper)
+
+
+def _changes(obj, action: str) -> Optional[dict]:
+    state = inspect(obj)
+    columns = state.mapper.column_attrs
+    changes = {}
+    if action != "update":
+        for attr in columns:
+            if attr.key not in SKIPPED_FIELDS:
+                changes[attr.key] = state.dict.get(attr.key)
+    else:
+        # Only attributes modified since load have an entry in committed_state
+        for key in state.committed_state:
+            if key in SKIPPED_FIELDS or key not in columns:
+                continue
+            history = state.attrs[key].history
+            old = history.deleted[0] if history.deleted else None
+            new = history.added[0] if history.added else None
+            if old != new:
+                changes[key] = [old, new]
+    for key in REDACTED_FIELDS:
+        if key in changes:
+            changes[key] = "***"
+    return changes or None
+
+
+def _status_action(changes: dict, action: str) -> str:
+    status = changes.get("status")
+    if action != "update" or not status:
+        return action
+    new = status[1]
+    return STATUS_ACTIONS.get(getattr(new, "value", new), action)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_entries(session, flush_context):
+    actor = _actor.get()
+    if actor is None or not settings.AUDIT_ENABLED:
+        return
+    now = datetime.utcnow()
+    for action, collection in ACTIONS:
+        for obj in getattr(session, collection):
+            if isinstance(obj, UNAUDITED_MODELS) or not isinstance(getattr(obj, "id", None), UUID):
+                continue
+            changes = _changes(obj, action)
+            if changes is None:
+                continue
+            session.info.setdefault(_PENDING_KEY, []).append({
+                "user_id": actor.user_id,
+                "object_type": obj.__tablename__,
+                "object_id": obj.id,
+                "action": _status_action(changes, action),
+                "changes": changes,
+                "extra_metadata": {"method": actor.method, "path": actor.path},
+                "created_at": now,
+            })
+
+
+@event.listens_for(Session, "after_commit")
+def _enqueue_entries(session):
+    for entry in session.info.pop(_PENDING_KEY, None) or ():
+        audit_writer.offer(entry)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_entries(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+# ─── Writer ──────────────────────────────────────────────────────────────────
+
+def _row(entry: dict) -> dict:
+    """audit_log row from a queued (python values) or spilled (JSON) entry"""
+    created_at = entry["created_at"]
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    return {
+        "id": uuid4(),
+        "user_id": UUID(str(entry["user_id"])),
+        "object_type": entry["object_type"],
+        "object_id": UUID(str(entry["object_id"])),
+        "action": entry["action"],
+        "changes": to_jsonable_python(entry["changes"]),
+        "extra_metadata": entry["extra_metadata"],
+        "created_at": created_at,
+        "updated_at": created_at,
+    }
+
+
+class AuditWriter:
+    """Bounded queue of audit entries, flushed in batches by a background task"""
+
+    def __init__(self, queue_size: int, batch_size: int, interval: float, spill_path: str):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.spill_path = spill_path
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._spill_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._replay_lock = FileLeaderLock(f"{spill_path}.lock")
+        self._task: Optional[asyncio.Task] = None
+
+    def offer(self, entry: dict):
+        """Queue an entry (thread safe, never blocks); spills it to disk when the queue is full"""
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            self._spill([entry])
+
+    def _spill(self, entries: Iterable[dict]):
+        with self._spill_lock:
+            directory = os.path.dirname(self.spill_path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            lines = "".join(json.dumps(to_jsonable_python(entry), ensure_ascii=False) + "\n" for entry in entries)
+            # One write per batch, so appends from other workers don't interleave with it
+            with open(self.spill_path, "a", encoding="utf-8") as fp:
+                fp.write(lines)
+
+    def _insert(self, entries: List[dict]) -> bool:
+        try:
+            with Session(engine) as session:
+                session.execute(insert(AuditLog), [_row(entry) for entry in entries])
+                session.commit()
+            return True
+        except Exception as e:
+            print(f"❌ Audit log write failed ({len(entries)} entries): {type(e).__name__}: {str(e)}")
+            return False
+
+    def _take(self) -> List[dict]:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _take_all(self) -> List[dict]:
+        entries = []
+        while True:
+            try:
+                entries.append(self._queue.get_nowait())
+            except queue.Empty:
+                return entries
+
+    def _entries(self, fp) -> Iterator[dict]:
+        for number, line in enumerate(fp, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f"⚠️  Skipping malformed audit spill line {number}: {line[:80]!r}")
+
+    def _replay(self) -> int:
+        """Insert the spilled entries; whatever cannot be written goes back to the spill file"""
+        if not self._replay_lock.acquire():
+            # Another worker is replaying
+            return 0
+        try:
+            return self._replay_locked()
+        finally:
+            self._replay_lock.release()
+
+    def _replay_locked(self) -> int:
+        replay_path = f"{self.spill_path}.replay"
+        with self._spill_lock:
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spill_path):
+                    return 0
+                os.replace(self.spill_path, replay_path)
+        written = 0
+        with open(replay_path, encoding="utf-8") as fp:
+            entries = self._entries(fp)
+            batch = []
+            for entry in entries:
+                batch.append(entry)
+                if len(batch) < self.batch_size:
+                    continue
+                if not self._insert(batch):
+                    self._spill(batch + list(entries))
+                    batch = []
+                    break
+                written += len(batch)
+                batch = []
+            if batch:
+                if self._insert(batch):
+                    written += len(batch)
+                else:
+                    self._spill(batch)
+        os.remove(replay_path)
+        return written
+
+    def flush(self) -> int:
+        """Write queued entries, then spilled ones once the queue is empty; returns rows written"""
+        with self._flush_lock:
+            written = 0
+            while True:
+                batch = self._take()
+                if not batch:
+                    break
+                if self._insert(batch):
+                    written += len(batch)
+                else:
+                    self._spill(batch)
+                    break
+            if self._queue.empty():
+                written += self._replay()
+            return written
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.flush)
+            except Exception as e:
+                # Keep the writer alive; queued entries are retried (or spilled) on the next round
+                print(f"❌ Audit flush failed: {type(e).__name__}: {str(e)}")
+            await asyncio.sleep(self.interval)
+
+    async def start(self):
+        """Start the background flush task (called from the application lifespan)"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="audit-writer")
+
+    async def stop(self):
+        """Stop the flush task and write what is still queued"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await asyncio.to_thread(self.flush)
+        if not self._queue.empty():
+            self._spill(self._take_all())
+
+
+audit_writer = AuditWriter(
+    settings.AUDIT_QUEUE_SIZE, settings.AUDIT_BATCH_SIZE, settings.AUDIT_FLUSH_INTERVAL, settings.AUDIT_SPILL_PATH
+)
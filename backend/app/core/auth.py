@@ -6,6 +6,7 @@ from uuid import UUID
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlmodel import Session, select
+from app.core.audit import set_audit_actor
 from app.core.database import get_session
 from app.core.security import decode_access_token
 from app.core.exceptions import UnauthorizedException, ForbiddenException
@@ -54,6 +55,7 @@ async def get_current_user(
         raise UnauthorizedException("User is inactive")
     
     print(f"   ✅ Authentication successful: {user.username}")
+    set_audit_actor(user.id, request)
     return user
 
 
@@ -0,0 +1,209 @@
+"""
+Response compression middleware (brotli / gzip)
+
+Pure ASGI middleware, so streaming responses are compressed chunk by chunk as
+they are produced instead of being buffered:
+
+- Only content types matching COMPRESSION_CONTENT_TYPES are compressed.
+  Server-sent events are never compressed, since the compressor would hold
+  events back until its buffer fills.
+- A response sent in one body message is compressed only from
+  COMPRESSION_MINIMUM_SIZE bytes. The size of a streamed response is unknown
+  up front, so eligible streams are always compressed.
+- br is preferred when the client accepts it and the brotli package is
+  installed; otherwise gzip is used.
+"""
+import zlib
+from typing import Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+NO_BODY_STATUSES = (204, 304)
+NEVER_COMPRESSED = ("text/event-stream",)
+
+
+def _accepted_encodings(header: str) -> List[str]:
+    """Codings of an Accept-Encoding header, dropping the ones with q=0"""
+    accepted = []
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        quality = params.strip()
+        if quality.startswith("q="):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.append(coding.strip().lower())
+    return accepted
+
+
+class _GzipEncoder:
+    def __init__(self, level: int):
+        # wbits 31: gzip container
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _BrotliEncoder:
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """Compress eligible HTTP responses with the best coding the client accepts"""
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        content_types: Iterable[str] = ("text/", "application/json"),
+        gzip_level: int = 6,
+        brotli_quality: Optional[int] = 4,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.content_types = tuple(content_types)
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality if brotli is not None else None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self._negotiate(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressedResponder(self, encoding, send).run(scope, receive)
+
+    def _negotiate(self, scope) -> Optional[str]:
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accepted = _accepted_encodings(value.decode("latin-1"))
+                if self.brotli_quality is not None and "br" in accepted:
+                    return "br"
+                if "gzip" in accepted:
+                    return "gzip"
+                return None
+        return None
+
+    def encoder(self, encoding: str):
+        if encoding == "br":
+            return _BrotliEncoder(self.brotli_quality)
+        return _GzipEncoder(self.gzip_level)
+
+    def compressible(self, status: int, headers: List[Tuple[bytes, bytes]]) -> bool:
+        if status in NO_BODY_STATUSES:
+            return False
+        content_type = ""
+        for name, value in headers:
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value.decode("latin-1").split(";", 1)[0].strip().lower()
+        if not content_type or content_type.startswith(NEVER_COMPRESSED):
+            return False
+        return content_type.startswith(self.content_types)
+
+
+class _CompressedResponder:
+    """send() wrapper of one response: holds the start message until the first body chunk"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.send = send
+        self.start = None
+        self.encoder = None
+        self.passthrough = False
+
+    async def run(self, scope, receive):
+        await self.middleware.app(scope, receive, self.send_compressed)
+
+    def _headers(self, body_length: Optional[int]) -> List[Tuple[bytes, bytes]]:
+        headers = [(name, value) for name, value in self.start["headers"] if name != b"content-length"]
+        headers.append((b"content-encoding", self.encoding.encode()))
+        if body_length is not None:
+            headers.append((b"content-length", str(body_length).encode()))
+        return _add_vary(headers)
+
+    async def send_compressed(self, message):
+        if message["type"] == "http.response.start":
+            self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.encoder is None:
+            headers = list(self.start.get("headers", []))
+            if not self.middleware.compressible(self.start["status"], headers):
+                self.passthrough = True
+                await self.send(self.start)
+                await self.send(message)
+                return
+            if not more_body:
+                # Complete body: compress only when it is worth it
+                if len(body) < self.middleware.minimum_size:
+                    self.passthrough = True
+                    await self.send({**self.start, "headers": _add_vary(headers)})
+                    await self.send(message)
+                    return
+                encoder = self.middleware.encoder(self.encoding)
+                compressed = encoder.compress(body) + encoder.finish()
+                await self.send({**self.start, "headers": self._headers(len(compressed))})
+                await self.send({"type": "http.response.body", "body": compressed})
+                return
+            # Streaming: length unknown, send chunked
+            self.encoder = self.middleware.encoder(self.encoding)
+            await self.send({**self.start, "headers": self._headers(None)})
+
+        chunk = self.encoder.compress(body)
+        if not more_body:
+            chunk += self.encoder.finish()
+        if chunk or not more_body:
+            await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+
+def _add_vary(headers: List[Tuple[bytes, bytes]]) -> List[Tuple[bytes, bytes]]:
+    for index, (name, value) in enumerate(headers):
+        if name == b"vary":
+            if b"accept-encoding" not in value.lower():
+                headers[index] = (name, value + b", Accept-Encoding")
+            return headers
+    headers.append((b"vary", b"Accept-Encoding"))
+    return headers
+
+
+def compression_options() -> dict:
+    """CompressionMiddleware arguments from settings"""
+    brotli_quality = settings.COMPRESSION_BROTLI_QUALITY if settings.COMPRESSION_BROTLI else None
+    if brotli_quality is not None and brotli is None:
+        print("⚠️  COMPRESSION_BROTLI is enabled but the 'brotli' package is missing, using gzip only")
+    return {
+        "minimum_size": settings.COMPRESSION_MINIMUM_SIZE,
+        "content_types": settings.COMPRESSION_CONTENT_TYPES,
+        "gzip_level": settings.COMPRESSION_GZIP_LEVEL,
+        "brotli_quality": brotli_quality,
+    }
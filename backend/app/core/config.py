@@ -23,20 +23,101 @@ class Settings(BaseSettings):
     DB_PASSWORD: str = ""
     SQLITE_DB_PATH: str = "./atlas.db"  # SQLite database file path
     
+    # Database tuning (applied per backend by app.core.database)
+    DB_POOL_SIZE: int = 10  # MySQL: connections kept open per worker
+    DB_MAX_OVERFLOW: int = 20  # MySQL: extra connections allowed during bursts
+    DB_POOL_TIMEOUT: int = 30  # MySQL: seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 3600  # MySQL: seconds before a connection is replaced (keep below wait_timeout)
+    DB_REPLICA_URLS: list = []  # Read replica URLs (JSON list in env); GET requests are spread over them
+    DB_REPLICA_EJECT_SECONDS: int = 30  # A replica that fails to connect is skipped this long
+    DB_READ_AFTER_WRITE_SECONDS: int = 5  # Reads stay on the primary this long after a client's write (replication lag)
+    DB_SHARDS: dict = {}  # Shard name -> URL (JSON in env) for subsidiaries moved off the main database
+    DB_ENTITY_SHARDS: dict = {}  # our_entity_id -> shard name; unmapped entities stay on the main database
+    SQLITE_JOURNAL_MODE: str = "WAL"  # WAL lets readers run while a writer commits
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # Durable across app crashes in WAL mode, fsyncs only at checkpoints
+    SQLITE_BUSY_TIMEOUT: int = 5000  # ms a connection waits for a lock before "database is locked"
+    SQLITE_CACHE_SIZE: int = -65536  # Page cache per connection; negative = KiB (64 MB)
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # bytes of the file read through mmap, 0 disables
+    
     # Security
     SECRET_KEY: str = "your-secret-key-change-in-production"
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24  # 24 hours
     
     # AI 
-    GEMINI_API_KEY: Optional[str] = None 
-    
+    GEMINI_API_KEY: Optional[str] = None
+    GEMINI_API_BASE: str = "https://generativelanguage.googleapis.com/v1beta"
+    AI_HTTP2: bool = True
+    AI_HTTP_MAX_CONNECTIONS: int = 20
+    AI_HTTP_MAX_KEEPALIVE: int = 10
+    AI_HTTP_KEEPALIVE_EXPIRY: float = 120.0  # seconds
+    AI_HTTP_TIMEOUT: float = 60.0  # seconds
+    AI_HTTP_CONNECT_TIMEOUT: float = 10.0  # seconds
+    AI_HTTP_POOL_TIMEOUT: float = 30.0  # seconds to wait for a free connection
+    AI_MAX_CONCURRENCY: int = 8  # Concurrent upstream AI requests
+    AI_CACHE_ENABLED: bool = True
+    AI_CACHE_TTL: int = 7 * 24 * 3600  # seconds
+    AI_CACHE_MAX_ENTRIES: int = 256  # In-memory tier
+    AI_CACHE_SQLITE_PATH: Optional[str] = None  # e.g. ./data/ai_cache.db, None disables the disk tier
+    AI_CACHE_DISK_MAX_ENTRIES: int = 5000
+
     # CORS
     BACKEND_CORS_ORIGINS: list = ["http://localhost:5173", "http://localhost:3000"]
     
+    # Response compression
+    COMPRESSION_ENABLED: bool = True
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # bytes; smaller responses are sent as-is
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI: bool = True  # Prefer br when the client accepts it (needs the brotli package)
+    COMPRESSION_BROTLI_QUALITY: int = 4  # 0-11; 4 is about as fast as gzip -6 with smaller output
+    COMPRESSION_CONTENT_TYPES: list = [  # Prefixes; binary formats (xlsx, images) are already compressed
+        "text/", "application/json", "application/x-ndjson", "application/javascript", "image/svg+xml",
+    ]
+    
     # File storage
     UPLOAD_DIR: str = "./data/files"
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
+    EXPORT_SPOOL_MAX_MEMORY: int = 8 * 1024 * 1024  # Exports larger than this spill to a temp file
+    EXPORT_DIR: str = "./data/exports"  # Files produced by background export jobs
+    EXPORT_BATCH_SIZE: int = 1000  # Rows fetched per server-side cursor batch
+    EXPORT_JOB_TTL: int = 24 * 3600  # seconds before a finished job file is removed
+    
+    # Scheduler
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_LOCK_PATH: str = "./data/scheduler.lock"  # Leader lock file (SQLite deployments)
+    PAYMENT_SWEEP_INTERVAL: int = 300  # seconds between payment plan due/overdue sweeps
+    PAYMENT_DUE_WINDOW_DAYS: int = 30  # Installments become DUE (and get a reminder) this many days ahead
+    
+    # Audit log (see app/core/audit.py)
+    AUDIT_ENABLED: bool = True
+    AUDIT_QUEUE_SIZE: int = 10000  # Entries held in memory before spilling to AUDIT_SPILL_PATH
+    AUDIT_BATCH_SIZE: int = 500  # Rows per bulk insert
+    AUDIT_FLUSH_INTERVAL: float = 1.0  # seconds between queue flushes
+    AUDIT_SPILL_PATH: str = "./data/audit_spill.jsonl"
+    
+    # Archival of append-only tables (see app/core/archive.py)
+    ARCHIVE_ENABLED: bool = False
+    ARCHIVE_INTERVAL: int = 3600  # seconds between archive job runs
+    ARCHIVE_BATCH_SIZE: int = 1000  # Rows moved per transaction
+    ARCHIVE_FINANCE_TRANSACTION_DAYS: int = 730  # Hot window on txn_date
+    ARCHIVE_NOTIFICATION_LOG_DAYS: int = 90  # Hot window on created_at
+    ARCHIVE_AUDIT_LOG_DAYS: int = 365  # Hot window on created_at
+    ARCHIVE_MYSQL_PARTITIONS: bool = True  # MySQL: monthly partitions instead of archive tables (drops their FKs)
+    
+    # Facets
+    FACET_CACHE_TTL: int = 10  # seconds board / list counts are cached
+    FACET_CACHE_MAX_ENTRIES: int = 2048
+    
+    # Dashboard
+    DASHBOARD_CACHE_TTL: int = 5  # seconds a per-user summary is reused
+    DASHBOARD_CACHE_MAX_ENTRIES: int = 1024
+    DASHBOARD_MAX_CONCURRENCY: int = 3  # Summaries computed at once (each uses one connection per widget)
+    
+    # Realtime push (WebSocket / SSE)
+    PUBSUB_BACKEND: str = "memory"  # memory (single worker) or redis (multi-worker)
+    REDIS_URL: Optional[str] = None  # e.g. redis://localhost:6379/0
+    PUSH_QUEUE_SIZE: int = 100  # Buffered events per connection before the client is told to resync
+    PUSH_HEARTBEAT_INTERVAL: int = 25  # seconds between keep-alive frames
     
     # Pagination
     DEFAULT_PAGE_SIZE: int = 20
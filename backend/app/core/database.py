@@ -1,24 +1,169 @@
 """
 Database connection and session management
+
+Engines are created through `create_db_engine`, which applies the tuning
+profile of the backend:
+
+- SQLite: PRAGMAs on every new connection. WAL lets readers keep running
+  while a writer commits (the default rollback journal locks the whole file),
+  busy_timeout makes a blocked writer wait instead of failing, and the page
+  cache / mmap keep hot pages out of read() calls.
+- MySQL: pool size, overflow, checkout timeout and recycling from Settings,
+  with pre-ping to survive server-side disconnects.
+
+With DB_REPLICA_URLS set, `get_session` serves GET/HEAD requests from the read
+replicas (round robin, a failing replica is ejected for a while) and
+everything else from the primary. After a successful write, the client carries
+a short-lived cookie that keeps its reads on the primary, so it sees its own
+writes despite replication lag.
 """
+import itertools
+import time
+from typing import List, Optional
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Connection, Engine, make_url
 from sqlmodel import create_engine, Session, SQLModel
 from app.core.config import settings
 
+
+def _sqlite_profile() -> dict:
+    return {
+        # Seconds the driver waits for a lock; busy_timeout below covers raw statements too
+        "connect_args": {"timeout": settings.SQLITE_BUSY_TIMEOUT / 1000},
+    }
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={settings.SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT)}")
+        cursor.execute(f"PRAGMA cache_size={int(settings.SQLITE_CACHE_SIZE)}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+    finally:
+        cursor.close()
+
+
+def _mysql_profile() -> dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,  # Enable connection health checks
+    }
+
+
+def create_db_engine(url: Optional[str] = None) -> Engine:
+    """Create an engine for `url` (default: settings.DATABASE_URL) with its backend profile"""
+    url = url or settings.DATABASE_URL
+    backend = make_url(url).get_backend_name()
+    if backend == "sqlite":
+        db_engine = create_engine(url, echo=settings.DEBUG, **_sqlite_profile())
+        event.listen(db_engine, "connect", _apply_sqlite_pragmas)
+        return db_engine
+    if backend == "mysql":
+        return create_engine(url, echo=settings.DEBUG, **_mysql_profile())
+    return create_engine(url, echo=settings.DEBUG, pool_pre_ping=True)
+
+
 # Create engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    echo=settings.DEBUG,
-    pool_pre_ping=True,  # Enable connection health checks
-    pool_recycle=3600,  # Recycle connections after 1 hour
-)
+engine = create_db_engine()
 
 
 def create_db_and_tables():
     """Create database tables"""
     SQLModel.metadata.create_all(engine)
+    # create_all skips existing tables entirely, so add indexes introduced since a table was created
+    for table in SQLModel.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
+
+# ─── Read replicas ───────────────────────────────────────────────────────────
+
+READ_METHODS = ("GET", "HEAD")
+PRIMARY_COOKIE = "atlas_read_primary"
+
+
+class ReplicaPool:
+    """Round robin over replica engines, skipping ejected ones"""
+
+    def __init__(self, urls: List[str], eject_seconds: float):
+        self.urls = list(urls)
+        self.engines = [create_db_engine(url) for url in self.urls]
+        self.eject_seconds = eject_seconds
+        self._ejected_until = [0.0] * len(self.engines)
+        self._next = itertools.count()
+        for index, replica in enumerate(self.engines):
+            event.listen(replica, "handle_error", self._error_handler(index))
+
+    def _error_handler(self, index: int):
+        def handle_error(context):
+            if context.is_disconnect:
+                self.eject(index, context.original_exception)
+        return handle_error
+
+    def eject(self, index: int, error: Exception):
+        self._ejected_until[index] = time.monotonic() + self.eject_seconds
+        print(f"⚠️  Read replica #{index} ejected for {self.eject_seconds}s: {type(error).__name__}: {error}")
+
+    def connect(self) -> Optional[Connection]:
+        """Connection to the next healthy replica, None when all are down"""
+        for _ in range(len(self.engines)):
+            index = next(self._next) % len(self.engines)
+            if self._ejected_until[index] > time.monotonic():
+                continue
+            try:
+                return self.engines[index].connect()
+            except Exception as exc:
+                self.eject(index, exc)
+        return None
+
+
+replicas = ReplicaPool(settings.DB_REPLICA_URLS, settings.DB_REPLICA_EJECT_SECONDS) if settings.DB_REPLICA_URLS else None
+
+
+def _reads_from_primary(request: Request) -> bool:
+    try:
+        return float(request.cookies.get(PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+class ReadAfterWriteMiddleware:
+    """Pins the client's reads to the primary for a while after each successful write request"""
+
+    def __init__(self, app, seconds: int):
+        self.app = app
+        self.seconds = seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] in READ_METHODS:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_cookie(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                cookie = (f"{PRIMARY_COOKIE}={time.time() + self.seconds:.0f}; Max-Age={self.seconds}; "
+                          f"Path=/; HttpOnly; SameSite=Lax")
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_cookie)
 
 
-def get_session():
-    """Get database session"""
-    with Session(engine) as session:
-        yield session
+def get_session(request: Request):
+    """Get database session (a read replica for GET/HEAD requests when replicas are configured)"""
+    connection = None
+    if replicas is not None and request.method in READ_METHODS and not _reads_from_primary(request):
+        connection = replicas.connect()
+    try:
+        with Session(connection if connection is not None else engine) as session:
+            yield session
+    finally:
+        if connection is not None:
+            connection.close()
@@ -0,0 +1,70 @@
+"""
+Conditional GET with weak ETags
+
+An ETag is a hash of the versions of everything a response is built from. A
+version is `(count, max(updated_at))` of the rows in scope: inserts and updates
+raise the max, deletes lower the count. Handlers therefore have to bump
+`updated_at` on every write (Core updates included).
+
+Handlers compute the ETag first and return 304 Not Modified before running
+their queries and enrichment, so an unchanged poll costs a few aggregate
+queries:
+
+    etag = make_etag(current_user.id, request.url.query, version_of(session, query, TodoItem))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    ...
+    return with_etag(success_response(data), etag)
+"""
+import hashlib
+from typing import Any, Optional, Tuple
+
+from fastapi import Request, Response
+from sqlmodel import Session, func, select
+
+# Browsers keep the copy but revalidate it on every request
+CACHE_CONTROL = "private, no-cache"
+
+
+def version_of(session: Session, query: Any, model: type) -> Tuple[int, Optional[Any]]:
+    """(count, max(updated_at)) of the rows matched by a `select(model)` query"""
+    stmt = select(func.count(), func.max(model.updated_at)).select_from(model)
+    if query.whereclause is not None:
+        stmt = stmt.where(query.whereclause)
+    count, latest = session.exec(stmt).one()
+    return count, latest
+
+
+def table_version(session: Session, model: type, *conditions) -> Tuple[int, Optional[Any]]:
+    """(count, max(updated_at)) of a table, optionally filtered"""
+    return version_of(session, select(model).where(*conditions), model)
+
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.blake2b(repr(parts).encode(), digest_size=12).hexdigest()
+    return f'W/"{digest}"'
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison against If-None-Match"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    target = _opaque(etag)
+    return any(_opaque(candidate.strip()) == target for candidate in header.split(","))
+
+
+def _opaque(etag: str) -> str:
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def with_etag(response: Response, etag: str) -> Response:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return response
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
@@ -0,0 +1,134 @@
+"""
+Post-commit change hooks
+
+In-memory structures (indexes, caches) and push notifications must only see
+committed data. The ORM rows inserted, updated or deleted during a session's
+flushes are collected in `session.info` and handed to the handlers registered
+for their model once the transaction commits; a rollback drops them. One-off
+callbacks can be queued on a session with `call_after_commit`.
+"""
+import traceback
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Sequence, Set, Tuple
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+_PENDING_KEY = "pending_changes"
+_CALLBACKS_KEY = "after_commit_callbacks"
+
+# model class -> [(handler, columns whose previous value it receives), ...]
+_handlers: Dict[type, List[Tuple[Callable[[list], None], Tuple[str, ...]]]] = defaultdict(list)
+# model class -> columns whose pre-update value handlers receive
+_previous_columns: Dict[type, Set[str]] = defaultdict(set)
+# (model class, column) pairs with active history
+_active_history: Set[Tuple[type, str]] = set()
+
+
+def load_previous_values(model: type, names: Iterable[str]):
+    """
+    Give columns active history: assigning one loads its current value first,
+    so the attribute history has the old value even when the instance was
+    expired by an earlier commit (at the cost of that load).
+    """
+    for name in names:
+        if (model, name) not in _active_history:
+            event.listen(getattr(model, name), "set", _load_old_value, active_history=True)
+            _active_history.add((model, name))
+
+
+def on_commit(model: type, handler: Callable[[list], None], previous: Sequence[str] = ()):
+    """
+    Call `handler(changes)` after every commit that wrote rows of `model`.
+
+    `changes` is a list of (action, values) in flush order, action being
+    "insert", "update" or "delete" and values a column snapshot taken at flush
+    time (the instances themselves are expired by then). Handlers run on the
+    committing thread and must be quick; exceptions are logged, not raised.
+
+    With `previous` column names, changes are (action, values, previous)
+    instead, `previous` holding the value each of those columns had before an
+    update that changed it (empty for inserts and deletes). These columns get
+    active history, so the old value is loaded before an assignment even when
+    the instance was expired by an earlier commit.
+    """
+    load_previous_values(model, previous)
+    _previous_columns[model].update(previous)
+    _handlers[model].append((handler, tuple(previous)))
+
+
+def _load_old_value(target, value, oldvalue, initiator):
+    """No-op `set` listener; registering it with active_history makes SQLAlchemy load the old value"""
+
+
+def call_after_commit(session: Session, callback: Callable[[], None]):
+    """Run `callback()` once the session's current transaction commits (dropped on rollback)"""
+    session.info.setdefault(_CALLBACKS_KEY, []).append(callback)
+
+
+def _snapshot(obj) -> dict:
+    state = inspect(obj)
+    return {attr.key: state.dict.get(attr.key) for attr in state.mapper.column_attrs}
+
+
+def _previous(obj) -> dict:
+    """Pre-update values of the tracked columns changed in this flush"""
+    state = inspect(obj)
+    previous = {}
+    for name in _previous_columns.get(type(obj), ()):
+        deleted = state.attrs[name].history.deleted
+        if deleted:
+            previous[name] = deleted[0]
+    return previous
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session, flush_context):
+    if not _handlers:
+        return
+    pending = None
+    for action, objects in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for obj in objects:
+            if type(obj) not in _handlers:
+                continue
+            if action == "update" and not session.is_modified(obj, include_collections=False):
+                continue
+            if pending is None:
+                pending = session.info.setdefault(_PENDING_KEY, [])
+            pending.append((type(obj), action, _snapshot(obj), _previous(obj) if action == "update" else {}))
+
+
+def _run(callback: Callable, *args, label: str = ""):
+    try:
+        callback(*args)
+    except Exception:
+        print(f"❌ Commit hook {getattr(callback, '__name__', callback)} failed{label}:")
+        traceback.print_exc()
+
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_changes(session):
+    for callback in session.info.pop(_CALLBACKS_KEY, None) or ():
+        _run(callback)
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    by_model: Dict[type, List[Tuple[str, dict, dict]]] = defaultdict(list)
+    for model, action, values, previous in pending:
+        by_model[model].append((action, values, previous))
+    for model, changes in by_model.items():
+        plain = [(action, values) for action, values, _ in changes]
+        for handler, names in _handlers[model]:
+            if names:
+                _run(handler, [
+                    (action, values, {name: previous[name] for name in names if name in previous})
+                    for action, values, previous in changes
+                ], label=f" for {model.__name__}")
+            else:
+                _run(handler, plain, label=f" for {model.__name__}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_CALLBACKS_KEY, None)
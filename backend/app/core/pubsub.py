@@ -0,0 +1,185 @@
+"""
+In-process publish / subscribe broker for push channels
+
+Subscribers are asyncio queues per channel (one per open WebSocket / SSE
+connection). `publish` is synchronous and thread safe, so request handlers,
+commit hooks and scheduler jobs can all call it; delivery is handed to the
+event loop.
+
+Backends:
+- memory (default): delivers to subscribers of this process only, which is
+  enough for a single worker.
+- redis: every publish goes through a Redis channel and each worker relays
+  what it receives to its local subscribers, so a user connected to worker A
+  gets events published on worker B. Requires the `redis` package.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+from typing import Dict, Optional, Set
+
+from app.core.config import settings
+
+RESYNC_MESSAGE = {"type": "resync"}
+
+
+class Subscription:
+    """Bounded message queue of one connection"""
+
+    def __init__(self, channel: str, maxsize: int):
+        self.channel = channel
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+
+    def _offer(self, message: dict):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            # Slow consumer: drop the backlog and tell the client to refetch
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_MESSAGE)
+
+    async def get(self, timeout: Optional[float] = None) -> Optional[dict]:
+        """Next message, or None after `timeout` seconds without one"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class MemoryBroker:
+    """Fan-out to the subscribers of this process"""
+
+    def __init__(self, queue_size: int = 100):
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[Subscription]] = defaultdict(set)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+
+    async def stop(self):
+        pass
+
+    def subscribe(self, channel: str) -> Subscription:
+        """Must be called on the event loop"""
+        self._loop = self._loop or asyncio.get_running_loop()
+        subscription = Subscription(channel, self.queue_size)
+        with self._lock:
+            self._subscribers[channel].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.channel]
+
+    def has_subscribers(self, channel: str) -> bool:
+        return channel in self._subscribers
+
+    def _deliver(self, channel: str, message: dict):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscription in subscribers:
+            subscription._offer(message)
+
+    def _on_loop(self, callback, *args):
+        """Run callback on the event loop, directly when already on it"""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            callback(*args)
+        else:
+            loop.call_soon_threadsafe(callback, *args)
+
+    def publish(self, channel: str, message: dict):
+        """Thread safe; `message` must be JSON serializable"""
+        if self.has_subscribers(channel):
+            self._on_loop(self._deliver, channel, message)
+
+
+class RedisBroker(MemoryBroker):
+    """Relays publishes through Redis so every worker's local subscribers receive them"""
+
+    PREFIX = "atlas:push:"
+
+    def __init__(self, url: str, queue_size: int = 100):
+        super().__init__(queue_size)
+        self.url = url
+        self._redis = None
+        self._reader: Optional[asyncio.Task] = None
+
+    async def start(self):
+        import redis.asyncio as aioredis
+
+        await super().start()
+        self._redis = aioredis.from_url(self.url)
+        self._reader = asyncio.create_task(self._relay())
+
+    async def stop(self):
+        if self._reader:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except asyncio.CancelledError:
+                pass
+        if self._redis is not None:
+            await self._redis.aclose()
+
+    async def _relay(self):
+        """Receive from Redis and deliver locally, reconnecting after errors"""
+        while True:
+            pubsub = self._redis.pubsub()
+            try:
+                await pubsub.psubscribe(f"{self.PREFIX}*")
+                async for item in pubsub.listen():
+                    if item.get("type") != "pmessage":
+                        continue
+                    channel = item["channel"].decode()[len(self.PREFIX):]
+                    self._deliver(channel, json.loads(item["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                print(f"❌ Push relay lost Redis: {type(exc).__name__}: {exc}, retrying")
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
+    def _send(self, channel: str, payload: str):
+        task = asyncio.ensure_future(self._redis.publish(f"{self.PREFIX}{channel}", payload))
+        task.add_done_callback(_log_publish_failure)
+
+    def publish(self, channel: str, message: dict):
+        # Other workers may hold subscribers, so always go through Redis
+        if self._redis is not None:
+            self._on_loop(self._send, channel, json.dumps(message))
+
+
+def _log_publish_failure(task: asyncio.Future):
+    if not task.cancelled() and task.exception() is not None:
+        print(f"❌ Push publish failed: {type(task.exception()).__name__}: {task.exception()}")
+
+
+def create_broker() -> MemoryBroker:
+    if settings.PUBSUB_BACKEND == "redis":
+        try:
+            import redis.asyncio  # noqa: F401
+            if not settings.REDIS_URL:
+                raise ValueError("REDIS_URL is not set")
+            return RedisBroker(settings.REDIS_URL, settings.PUSH_QUEUE_SIZE)
+        except (ImportError, ValueError) as exc:
+            print(f"⚠️  PUBSUB_BACKEND=redis unavailable ({exc}), pushing within this worker only")
+    return MemoryBroker(settings.PUSH_QUEUE_SIZE)
+
+
+broker = create_broker()
@@ -1,8 +1,12 @@
 """
 Unified response format
 """
+from decimal import Decimal
 from typing import Any, Optional, TypeVar, Generic
+from fastapi.encoders import decimal_encoder
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
+from pydantic_core import to_json
 
 T = TypeVar('T')
 
@@ -30,13 +34,44 @@ class PaginatedResponse(BaseModel, Generic[T]):
     pages: int
 
 
-def success_response(data: Any = None, message: str = "success") -> dict:
-    """Create success response"""
-    return {
+def _plain_decimals(value: Any) -> Any:
+    """Bare Decimals in dicts / lists as numbers, like jsonable_encoder (pydantic-core would emit strings)"""
+    if isinstance(value, Decimal):
+        return decimal_encoder(value)
+    if isinstance(value, dict):
+        return {key: _plain_decimals(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain_decimals(item) for item in value]
+    return value
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response encoded by pydantic-core in one pass
+
+    Pydantic / SQLModel models, UUID, datetime and enums are encoded natively,
+    with the same output as FastAPI's jsonable_encoder. Decimal fields of
+    models stay strings, while bare Decimals in dicts (report rows, totals) are
+    JSON numbers, as jsonable_encoder encodes them.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return to_json(_plain_decimals(content))
+
+
+def success_response(data: Any = None, message: str = "success") -> FastJSONResponse:
+    """
+    Create success response
+
+    Returned as a ready Response, so FastAPI skips validating the payload
+    against the route's response_model and re-encoding it through
+    jsonable_encoder; response_model only documents the envelope.
+    """
+    return FastJSONResponse({
         "code": 0,
         "message": message,
         "data": data
-    }
+    })
 
 
 def error_response(code: int, message: str, errors: list = None) -> dict:
@@ -0,0 +1,179 @@
+"""
+In-process periodic job scheduler
+
+Jobs run on the application's event loop as asyncio tasks; the (synchronous,
+database bound) job functions themselves execute in a worker thread. When the
+API runs with several uvicorn workers, only the process holding the leader lock
+runs jobs, the others keep trying to take over on every tick so a crashed
+leader is replaced within one interval.
+
+- SQLite: an exclusive `flock` on SCHEDULER_LOCK_PATH (all workers share a host)
+- MySQL: a named `GET_LOCK` held on a dedicated connection
+"""
+import asyncio
+import os
+import traceback
+from typing import Callable, List
+
+from sqlalchemy import text
+
+from app.core.config import settings
+from app.core.database import engine
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+
+# ─── Leader locks ────────────────────────────────────────────────────────────
+
+class FileLeaderLock:
+    """Leader election through an exclusive, non-blocking file lock"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fp = None
+
+    def acquire(self) -> bool:
+        if self._fp is not None:
+            return True
+        if fcntl is None:
+            # No flock available: assume a single worker
+            self._fp = True
+            return True
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        fp = open(self.path, "a")
+        try:
+            fcntl.flock(fp.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            fp.close()
+            return False
+        self._fp = fp
+        return True
+
+    def release(self):
+        if self._fp is not None and self._fp is not True:
+            fcntl.flock(self._fp.fileno(), fcntl.LOCK_UN)
+            self._fp.close()
+        self._fp = None
+
+
+class MySQLLeaderLock:
+    """Leader election through MySQL GET_LOCK, held for the life of one connection"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._conn = None
+
+    def acquire(self) -> bool:
+        try:
+            if self._conn is not None:
+                # Still leader as long as our connection owns the lock
+                owner = self._conn.execute(
+                    text("SELECT IS_USED_LOCK(:name) = CONNECTION_ID()"), {"name": self.name}
+                ).scalar()
+                # Don't keep a transaction (and its read view) open between ticks
+                self._conn.commit()
+                if owner:
+                    return True
+                self.release()
+
+            conn = engine.connect()
+            acquired = conn.execute(text("SELECT GET_LOCK(:name, 0)"), {"name": self.name}).scalar()
+            conn.commit()
+            if acquired == 1:
+                self._conn = conn
+                return True
+            conn.close()
+            return False
+        except Exception as e:
+            print(f"⚠️  Scheduler leader lock check failed: {type(e).__name__}: {str(e)}")
+            self.release()
+            return False
+
+    def release(self):
+        if self._conn is None:
+            return
+        try:
+            self._conn.execute(text("SELECT RELEASE_LOCK(:name)"), {"name": self.name})
+        except Exception:
+            pass
+        try:
+            # Closing the connection also drops the lock if the server still holds it
+            self._conn.invalidate()
+            self._conn.close()
+        except Exception:
+            pass
+        self._conn = None
+
+
+def create_leader_lock():
+    if settings.DB_TYPE.lower() == "mysql":
+        return MySQLLeaderLock(f"{settings.DB_NAME}:scheduler")
+    return FileLeaderLock(settings.SCHEDULER_LOCK_PATH)
+
+
+# ─── Scheduler ───────────────────────────────────────────────────────────────
+
+class ScheduledJob:
+    def __init__(self, name: str, interval: float, func: Callable[[], None]):
+        self.name = name
+        self.interval = interval
+        self.func = func
+
+
+class Scheduler:
+    """Runs registered jobs periodically while this process is the leader"""
+
+    def __init__(self):
+        self._jobs: List[ScheduledJob] = []
+        self._tasks: List[asyncio.Task] = []
+        self._lock = None
+        self._is_leader = False
+
+    def add_job(self, name: str, interval: float, func: Callable[[], None]):
+        """Register a synchronous job to run every `interval` seconds (re-registering replaces it)"""
+        self._jobs = [job for job in self._jobs if job.name != name]
+        self._jobs.append(ScheduledJob(name, interval, func))
+
+    async def _check_leader(self) -> bool:
+        was_leader = self._is_leader
+        self._is_leader = await asyncio.to_thread(self._lock.acquire)
+        if self._is_leader and not was_leader:
+            print(f"⏰ Scheduler leader (pid {os.getpid()}), running {len(self._jobs)} job(s)")
+        return self._is_leader
+
+    async def _run(self, job: ScheduledJob):
+        while True:
+            try:
+                if await self._check_leader():
+                    await asyncio.to_thread(job.func)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                print(f"❌ Scheduled job '{job.name}' failed:")
+                traceback.print_exc()
+            await asyncio.sleep(job.interval)
+
+    async def start(self):
+        """Start all registered jobs (called from the application lifespan)"""
+        if self._tasks:
+            return
+        self._lock = self._lock or create_leader_lock()
+        self._tasks = [asyncio.create_task(self._run(job), name=f"scheduler:{job.name}") for job in self._jobs]
+
+    async def stop(self):
+        """Cancel running jobs and give up leadership"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._lock is not None:
+            await asyncio.to_thread(self._lock.release)
+        self._is_leader = False
+
+
+scheduler = Scheduler()
@@ -0,0 +1,152 @@
+"""
+Entity sharding
+
+Subsidiaries (OurEntity) can be moved to their own database: DB_SHARDS names
+the shard databases and DB_ENTITY_SHARDS maps entity ids to them. Entities
+that are not mapped stay on the main database ("default" shard).
+
+Only entity documents are sharded (SHARDED_MODELS): tables whose rows belong
+to one entity and are written on their own, so a large subsidiary's writes no
+longer contend for the same tables and locks as everybody else's. Global data
+(users, entities, counterparties, contracts) and flows that update it in the
+same transaction stay on the main database. Shard tables are created without
+foreign keys since the rows they reference live on the main database.
+
+Handlers route by the entity of the request:
+
+    with shards.session(data.our_entity_id, session) as entity_session:
+        ...
+
+and cross-entity lists query every shard in parallel and merge the pages:
+
+    items, total = await shards.paginate(query, FinanceInvoice, page, page_size)
+
+Every reader of a sharded model goes through the router; exports stream
+with `shards.iter_rows`.
+"""
+import asyncio
+import heapq
+import itertools
+from contextlib import ExitStack, contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+from uuid import UUID
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import Column, Index, MetaData, Table
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, func, select
+
+from app.core.config import settings
+from app.core.database import create_db_engine, engine
+from app.models.finance import FinanceInvoice, Reimbursement
+
+DEFAULT_SHARD = "default"
+
+SHARDED_MODELS = (FinanceInvoice, Reimbursement)
+
+T = TypeVar("T")
+
+
+def count_of(session: Session, query, model: type) -> int:
+    """Number of rows matched by a `select(model)` query"""
+    count = select(func.count()).select_from(model)
+    if query.whereclause is not None:
+        count = count.where(query.whereclause)
+    return session.exec(count).one()
+
+
+def _shard_metadata() -> MetaData:
+    """Sharded tables without their foreign keys"""
+    metadata = MetaData()
+    for model in SHARDED_MODELS:
+        source = model.__table__
+        table = Table(source.name, metadata, *(
+            Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable)
+            for column in source.columns
+        ))
+        for index in source.indexes:
+            Index(index.name, *(table.c[column.name] for column in index.columns), unique=index.unique)
+    return metadata
+
+
+class ShardRouter:
+    """Maps entities to shard engines"""
+
+    def __init__(self, shard_urls: Dict[str, str], entity_shards: Dict[str, str]):
+        self.engines: Dict[str, Engine] = {DEFAULT_SHARD: engine}
+        for name, url in shard_urls.items():
+            self.engines[name] = create_db_engine(url)
+        self.entity_shards: Dict[UUID, str] = {}
+        for entity_id, name in entity_shards.items():
+            if name not in self.engines:
+                print(f"⚠️  Entity {entity_id} is mapped to unknown shard '{name}', kept on the main database")
+                continue
+            self.entity_shards[UUID(str(entity_id))] = name
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.engines) > 1
+
+    def shard_of(self, entity_id: Optional[UUID]) -> str:
+        return self.entity_shards.get(entity_id, DEFAULT_SHARD) if entity_id else DEFAULT_SHARD
+
+    @contextmanager
+    def session(self, entity_id: Optional[UUID], default: Session):
+        """Session holding `entity_id`'s documents: `default` (the request's) for the main database"""
+        name = self.shard_of(entity_id)
+        if name == DEFAULT_SHARD:
+            yield default
+            return
+        with Session(self.engines[name]) as session:
+            yield session
+
+    def create_tables(self):
+        """Create the sharded tables on every shard database"""
+        if not self.enabled:
+            return
+        metadata = _shard_metadata()
+        for name, shard_engine in self.engines.items():
+            if name != DEFAULT_SHARD:
+                metadata.create_all(shard_engine)
+
+    async def fan_out(self, fn: Callable[[Session], T]) -> List[T]:
+        """Run `fn(session)` on every shard concurrently, each in its own session"""
+        def run(shard_engine: Engine) -> T:
+            with Session(shard_engine) as session:
+                return fn(session)
+
+        return await asyncio.gather(*(run_in_threadpool(run, shard_engine) for shard_engine in self.engines.values()))
+
+    async def paginate(self, query, model: type, page: int, page_size: int) -> Tuple[list, int]:
+        """
+        Page of `query` newest first (created_at, id) across all shards, and the total.
+
+        Each shard returns its first page * page_size rows; merging those sorted
+        runs yields the global order, so deep pages cost more than early ones.
+        """
+        limit = page * page_size
+        ordered = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit)
+
+        def fetch(session: Session):
+            return count_of(session, query, model), session.exec(ordered).all()
+
+        results = await self.fan_out(fetch)
+        merged = heapq.merge(*(rows for _, rows in results), key=lambda row: (row.created_at, row.id), reverse=True)
+        items = list(itertools.islice(merged, limit - page_size, limit))
+        return items, sum(total for total, _ in results)
+
+    def iter_rows(self, query, entity_id: Any, key: Callable) -> Iterator:
+        """
+        Stream `query` from the shard of `entity_id`, or from every shard when
+        it is None, merging the shards' results on `key` (newest first).
+        """
+        if entity_id or not self.enabled:
+            shard_engines = [self.engines[self.shard_of(UUID(str(entity_id)) if entity_id else None)]]
+        else:
+            shard_engines = list(self.engines.values())
+        with ExitStack() as stack:
+            sessions = [stack.enter_context(Session(shard_engine)) for shard_engine in shard_engines]
+            yield from heapq.merge(*(session.exec(query) for session in sessions), key=key, reverse=True)
+
+
+shards = ShardRouter(settings.DB_SHARDS, settings.DB_ENTITY_SHARDS)
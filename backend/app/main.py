@@ -1,20 +1,63 @@
 """
 Main FastAPI application
 """
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from app.core.config import settings
-from app.core.database import create_db_and_tables
+from app.core.database import ReadAfterWriteMiddleware, create_db_and_tables, replicas
 from app.core.exceptions import AtlasException
 from app.core.response import error_response
-from app.api import auth, iam, todo, contract, project, finance, ai
+from app.api import auth, iam, todo, contract, project, finance, ai, export, search, dashboard, realtime
+from app.core.archive import archives
+from app.core.audit import audit_writer
+from app.core.compression import CompressionMiddleware, compression_options
+from app.core.pubsub import broker
+from app.core.sharding import shards
+from app.core.scheduler import scheduler
+from app.services.aging import run_daily_aging_snapshot
+from app.services.finance_reports import backfill_rollup
+from app.services.gemini import gemini_client
+from app.services.payment_reminders import run_payment_plan_sweep
+from app.services.search import init_search_index
+from app.services.suggest import suggest_indexes
+from app.services.todo_tags import backfill_todo_tags
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup / shutdown"""
+    # Initialize database on startup
+    create_db_and_tables()
+    shards.create_tables()
+    archives.setup()
+    backfill_rollup()
+    backfill_todo_tags()
+    init_search_index()
+    suggest_indexes.load()
+    await gemini_client.start()
+    await broker.start()
+    await audit_writer.start()
+    if settings.SCHEDULER_ENABLED:
+        scheduler.add_job("payment_plan_sweep", settings.PAYMENT_SWEEP_INTERVAL, run_payment_plan_sweep)
+        scheduler.add_job("aging_snapshot", 3600, run_daily_aging_snapshot)
+        if archives.enabled:
+            scheduler.add_job("archive", settings.ARCHIVE_INTERVAL, archives.run)
+        await scheduler.start()
+    yield
+    await scheduler.stop()
+    await audit_writer.stop()
+    await broker.stop()
+    await gemini_client.close()
+
 
 # Create FastAPI app
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
-    debug=settings.DEBUG
+    debug=settings.DEBUG,
+    lifespan=lifespan
 )
 
 # Include routers
@@ -25,6 +68,10 @@ app.include_router(contract.router, prefix="/api/v1")
 app.include_router(project.router, prefix="/api/v1")
 app.include_router(finance.router, prefix="/api/v1")
 app.include_router(ai.router, prefix="/api/v1")
+app.include_router(export.router, prefix="/api/v1")
+app.include_router(search.router, prefix="/api/v1")
+app.include_router(dashboard.router, prefix="/api/v1")
+app.include_router(realtime.router, prefix="/api/v1")
 
 # CORS middleware
 app.add_middleware(
@@ -35,6 +82,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Read-after-write consistency when GET requests go to read replicas
+if replicas is not None:
+    app.add_middleware(ReadAfterWriteMiddleware, seconds=settings.DB_READ_AFTER_WRITE_SECONDS)
+
+# Response compression (br / gzip)
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware, **compression_options())
+
 # Request logging middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
@@ -72,13 +127,6 @@ async def general_exception_handler(request: Request, exc: Exception):
     )
 
 
-# Startup event
-@app.on_event("startup")
-def on_startup():
-    """Initialize database on startup"""
-    create_db_and_tables()
-
-
 # Health check
 @app.get("/health")
 async def health_check():
@@ -13,12 +13,12 @@ from app.models.approval import (
     ApprovalObjectType, ApprovalStatus, ApprovalStepStatus
 )
 from app.models.todo import (
-    TodoItem, NotificationLog,
+    TodoItem, TodoTag, NotificationLog,
     TodoSourceType, TodoActionType, TodoPriority, TodoStatus,
     NotificationChannel, NotificationStatus
 )
 from app.models.contract import (
-    Counterparty, Contract, ContractPaymentPlan,
+    Counterparty, Contract, ContractPaymentPlan, ContractAgingSnapshot,
     ContractType, ContractStatus, CounterpartyType,
     PaymentDirection, PaymentPlanStatus
 )
@@ -28,14 +28,14 @@ from app.models.project import (
 )
 from app.models.finance import (
     FinanceAccount, FinanceTransaction, FinanceInvoice,
-    InvoiceRequest, Reimbursement,
+    InvoiceRequest, Reimbursement, FinanceMonthlyRollup,
     AccountCategory, AccountStatus, TransactionDirection,
     ReconcileStatus, InvoiceKind, InvoiceMedium, OCRStatus,
     InvoiceRequestStatus, ReimbursementStatus
 )
 from app.models.shared import (
     AuditLog, FileMetadata, WeChatUserBinding, WeChatMessageTemplate,
-    SubscribeStatus
+    SearchDocument, SubscribeStatus
 )
 
 __all__ = [
@@ -52,12 +52,12 @@ __all__ = [
     "ApprovalObjectType", "ApprovalStatus", "ApprovalStepStatus",
     
     # Todo
-    "TodoItem", "NotificationLog",
+    "TodoItem", "TodoTag", "NotificationLog",
     "TodoSourceType", "TodoActionType", "TodoPriority", "TodoStatus",
     "NotificationChannel", "NotificationStatus",
     
     # Contract
-    "Counterparty", "Contract", "ContractPaymentPlan",
+    "Counterparty", "Contract", "ContractPaymentPlan", "ContractAgingSnapshot",
     "ContractType", "ContractStatus", "CounterpartyType",
     "PaymentDirection", "PaymentPlanStatus",
     
@@ -67,12 +67,12 @@ __all__ = [
     
     # Finance
     "FinanceAccount", "FinanceTransaction", "FinanceInvoice",
-    "InvoiceRequest", "Reimbursement",
+    "InvoiceRequest", "Reimbursement", "FinanceMonthlyRollup",
     "AccountCategory", "AccountStatus", "TransactionDirection",
     "ReconcileStatus", "InvoiceKind", "InvoiceMedium", "OCRStatus",
     "InvoiceRequestStatus", "ReimbursementStatus",
     
     # Shared
     "AuditLog", "FileMetadata", "WeChatUserBinding", "WeChatMessageTemplate",
-    "SubscribeStatus"
+    "SearchDocument", "SubscribeStatus"
 ]
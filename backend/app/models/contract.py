@@ -7,7 +7,7 @@ from typing import Optional
 from uuid import UUID
 from enum import Enum
 from sqlmodel import Field, Column, JSON, SQLModel
-from sqlalchemy import DECIMAL
+from sqlalchemy import DECIMAL, Index
 from app.models.base import BaseDBModel
 
 
@@ -100,6 +100,10 @@ class Contract(BaseDBModel, table=True):
 class ContractPaymentPlan(BaseDBModel, table=True):
     """Contract payment plan (installment)"""
     __tablename__ = "contract_payment_plan"
+    __table_args__ = (
+        # Due/overdue sweeps range-scan open installments by due date
+        Index("ix_contract_payment_plan_status_due_at", "status", "due_at"),
+    )
     
     contract_id: UUID = Field(foreign_key="contract.id", nullable=False, index=True)
     sequence_no: int = Field(nullable=False)
@@ -112,3 +116,24 @@ class ContractPaymentPlan(BaseDBModel, table=True):
     paid_amount: Decimal = Field(default=0, sa_column=Column(DECIMAL(18, 2), nullable=False, default=0))
     paid_at: Optional[datetime] = None
     status: PaymentPlanStatus = Field(default=PaymentPlanStatus.PENDING, nullable=False)
+
+
+class ContractAgingSnapshot(BaseDBModel, table=True):
+    """Daily AR/AP aging snapshot per direction, entity and counterparty (reporting)"""
+    __tablename__ = "contract_aging_snapshot"
+    __table_args__ = (
+        Index("ix_contract_aging_snapshot_date_direction", "snapshot_date", "direction"),
+    )
+    
+    snapshot_date: date = Field(nullable=False)
+    direction: PaymentDirection = Field(nullable=False)
+    our_entity_id: Optional[UUID] = None
+    counterparty_id: Optional[UUID] = None
+    
+    current_amount: Decimal = Field(default=0, sa_column=Column(DECIMAL(18, 2), nullable=False, default=0))  # Not yet due
+    days_0_30: Decimal = Field(default=0, sa_column=Column(DECIMAL(18, 2), nullable=False, default=0))
+    days_31_60: Decimal = Field(default=0, sa_column=Column(DECIMAL(18, 2), nullable=False, default=0))
+    days_61_90: Decimal = Field(default=0, sa_column=Column(DECIMAL(18, 2), nullable=False, default=0))
+    days_90_plus: Decimal = Field(default=0, sa_column=Column(DECIMAL(18, 2), nullable=False, default=0))
+    total_amount: Decimal = Field(default=0, sa_column=Column(DECIMAL(18, 2), nullable=False, default=0))
+    installment_count: int = Field(default=0, nullable=False)
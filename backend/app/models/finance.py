@@ -7,7 +7,7 @@ from typing import Optional
 from uuid import UUID
 from enum import Enum
 from sqlmodel import Field, Column, JSON, SQLModel
-from sqlalchemy import DECIMAL
+from sqlalchemy import DECIMAL, Index
 from app.models.base import BaseDBModel
 
 
@@ -124,6 +124,27 @@ class FinanceTransaction(BaseDBModel, table=True):
     created_by_user_id: UUID = Field(foreign_key="user.id", nullable=False)
 
 
+class FinanceMonthlyRollup(BaseDBModel, table=True):
+    """Pre-aggregated monthly cash flow per entity/account/counterparty/contract (reporting)"""
+    __tablename__ = "finance_monthly_rollup"
+    __table_args__ = (
+        Index("ix_finance_monthly_rollup_month_entity", "month", "our_entity_id"),
+    )
+    
+    bucket_key: str = Field(nullable=False, unique=True)  # month|entity|account|counterparty|contract|currency
+    month: str = Field(nullable=False, index=True)  # YYYY-MM
+    
+    our_entity_id: UUID = Field(nullable=False)
+    account_id: UUID = Field(nullable=False)
+    counterparty_id: Optional[UUID] = None
+    contract_id: Optional[UUID] = None
+    currency: str = Field(default="CNY", nullable=False)
+    
+    in_amount: Decimal = Field(default=0, sa_column=Column(DECIMAL(18, 2), nullable=False, default=0))
+    out_amount: Decimal = Field(default=0, sa_column=Column(DECIMAL(18, 2), nullable=False, default=0))
+    txn_count: int = Field(default=0, nullable=False)
+
+
 class FinanceInvoice(BaseDBModel, table=True):
     """Finance invoice"""
     __tablename__ = "finance_invoice"
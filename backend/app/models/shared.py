@@ -1,12 +1,13 @@
 """
-Shared Models (Audit Log, File Metadata, WeChat)
+Shared Models (Audit Log, File Metadata, WeChat, Search)
 """
 from datetime import datetime
 from typing import Optional
 from uuid import UUID
 from enum import Enum
 from sqlmodel import Field, Column, JSON, SQLModel
-from app.models.base import BaseDBModel
+from sqlalchemy import Index, Text, UniqueConstraint
+from app.models.base import BaseDBModel, TimestampModel
 
 
 class AuditLog(BaseDBModel, table=True):
@@ -63,3 +64,24 @@ class WeChatMessageTemplate(BaseDBModel, table=True):
     wx_template_id: str = Field(nullable=False)
     name: str = Field(nullable=False)
     is_active: bool = Field(default=True, nullable=False)
+
+
+class SearchDocument(TimestampModel, table=True):
+    """Full-text search document, one per indexed record (integer id doubles as the FTS rowid)"""
+    __tablename__ = "search_document"
+    __table_args__ = (
+        UniqueConstraint("kind", "ref_id", name="uq_search_document_ref"),
+        Index("ix_search_document_kind", "kind"),
+    )
+    
+    id: Optional[int] = Field(default=None, primary_key=True)
+    kind: str = Field(nullable=False)  # contract, project, counterparty, todo
+    ref_id: UUID = Field(nullable=False)
+    our_entity_id: Optional[UUID] = None
+    
+    # Todo visibility (assignee / creator), empty for other kinds
+    assignee_user_id: Optional[UUID] = None
+    creator_user_id: Optional[UUID] = None
+    
+    title: str = Field(nullable=False)
+    body: Optional[str] = Field(default=None, sa_column=Column(Text))
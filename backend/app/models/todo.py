@@ -6,6 +6,7 @@ from typing import Optional
 from uuid import UUID
 from enum import Enum
 from sqlmodel import Field, Column, JSON, SQLModel
+from sqlalchemy import Index
 from app.models.base import BaseDBModel
 
 
@@ -47,6 +48,9 @@ class TodoStatus(str, Enum):
 class TodoItem(BaseDBModel, table=True):
     """Todo item model"""
     __tablename__ = "todo_item"
+    __table_args__ = (
+        Index("ix_todo_item_source", "source_type", "source_id"),
+    )
     
     our_entity_id: UUID = Field(foreign_key="our_entity.id", nullable=False)
     assignee_user_id: UUID = Field(foreign_key="user.id", nullable=False, index=True)
@@ -76,6 +80,18 @@ class TodoItem(BaseDBModel, table=True):
     reviewed_by_user_id: Optional[UUID] = Field(default=None, foreign_key="user.id")
 
 
+class TodoTag(BaseDBModel, table=True):
+    """Normalized copy of TodoItem.tags, one row per (todo, tag), for indexed tag filters and counts"""
+    __tablename__ = "todo_tag"
+    __table_args__ = (
+        Index("ix_todo_tag_tag_todo", "tag", "todo_id"),
+        Index("uq_todo_tag_todo_tag", "todo_id", "tag", unique=True),
+    )
+    
+    todo_id: UUID = Field(foreign_key="todo_item.id", nullable=False)
+    tag: str = Field(nullable=False)
+
+
 class NotificationChannel(str, Enum):
     """Notification channel"""
     IN_APP = "in_app"
@@ -3,7 +3,7 @@ Finance module Pydantic schemas
 """
 from datetime import date, datetime
 from decimal import Decimal
-from typing import Optional
+from typing import List, Optional
 from uuid import UUID
 from pydantic import BaseModel
 
@@ -89,6 +89,11 @@ class TransactionResponse(BaseModel):
         from_attributes = True
 
 
+class PaymentPlanReallocate(BaseModel):
+    """Payment plan re-allocation schema"""
+    contract_ids: Optional[List[UUID]] = None  # None = every contract with payment plans
+
+
 class InvoiceCreate(BaseModel):
     """Invoice creation schema"""
     our_entity_id: UUID
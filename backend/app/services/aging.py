@@ -0,0 +1,206 @@
+"""
+Contract receivables / payables aging
+
+Outstanding installment amounts (amount - paid_amount of open installments)
+are bucketed by how many days they are past due as of a given date. The buckets
+are computed in a single GROUP BY pass with CASE expressions on `due_at`, so
+the database does the work over the (status, due_at) index instead of the
+application loading contracts.
+
+Because live aging always reflects today's paid amounts, a daily snapshot is
+stored in `contract_aging_snapshot` to compare aging over time. Every snapshot
+also stores one all-zero marker row per direction (no entity, no counterparty,
+installment_count 0), so a day without open installments is still recorded as
+taken; reads skip the markers.
+
+Contracts carry no entity of their own: the entity comes from the project
+linked to the contract. The counterparty is the customer (party A) for sales
+contracts and the supplier (party B) for purchase contracts.
+"""
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import case, delete, insert
+from sqlmodel import Session, select, func
+
+from app.core.database import engine
+from app.models.contract import (
+    Contract, ContractType, ContractPaymentPlan, ContractAgingSnapshot, PaymentDirection, PaymentPlanStatus
+)
+from app.models.project import Project
+
+AGING_BUCKETS = ("current_amount", "days_0_30", "days_31_60", "days_61_90", "days_90_plus")
+
+CENT = Decimal("0.01")
+
+OPEN_PLAN_STATUSES = (PaymentPlanStatus.PENDING, PaymentPlanStatus.DUE, PaymentPlanStatus.OVERDUE)
+
+
+def _counterparty_expression():
+    return case(
+        (Contract.contract_type == ContractType.PURCHASE, Contract.party_b_id),
+        else_=Contract.party_a_id,
+    )
+
+
+def _entity_by_contract():
+    """contract_id -> our_entity_id through the linked project (one row per contract)"""
+    return (
+        select(Project.contract_id.label("contract_id"), func.min(Project.our_entity_id).label("our_entity_id"))
+        .where(Project.contract_id.is_not(None))
+        .group_by(Project.contract_id)
+        .subquery()
+    )
+
+
+def _bucket_columns(as_of: date):
+    """SUM(CASE ...) per aging bucket, boundaries at the start of the relevant days"""
+    day_start = datetime.combine(as_of, time.min)
+    outstanding = ContractPaymentPlan.amount - ContractPaymentPlan.paid_amount
+    due_at = ContractPaymentPlan.due_at
+    bucket = case(
+        (due_at.is_(None), "current_amount"),
+        (due_at >= day_start + timedelta(days=1), "current_amount"),
+        (due_at >= day_start - timedelta(days=30), "days_0_30"),
+        (due_at >= day_start - timedelta(days=60), "days_31_60"),
+        (due_at >= day_start - timedelta(days=90), "days_61_90"),
+        else_="days_90_plus",
+    )
+    return [
+        func.sum(case((bucket == name, outstanding), else_=0)).label(name)
+        for name in AGING_BUCKETS
+    ] + [func.sum(outstanding).label("total_amount"), func.count().label("installment_count")]
+
+
+def compute_aging(
+    session: Session,
+    as_of: Optional[date] = None,
+    our_entity_id: Optional[UUID] = None,
+    counterparty_id: Optional[UUID] = None,
+    by_counterparty: bool = False,
+    by_entity: bool = False
+) -> List[dict]:
+    """Live aging of open installments, one row per direction (and counterparty / entity)"""
+    as_of = as_of or date.today()
+    entities = _entity_by_contract()
+    counterparty = _counterparty_expression().label("counterparty_id")
+    entity = entities.c.our_entity_id.label("our_entity_id")
+
+    dimensions = [ContractPaymentPlan.direction]
+    if by_entity:
+        dimensions.append(entity)
+    if by_counterparty:
+        dimensions.append(counterparty)
+
+    query = (
+        select(*dimensions, *_bucket_columns(as_of))
+        .join(Contract, Contract.id == ContractPaymentPlan.contract_id)
+        .outerjoin(entities, entities.c.contract_id == Contract.id)
+        .where(ContractPaymentPlan.status.in_(OPEN_PLAN_STATUSES))
+    )
+    if our_entity_id:
+        query = query.where(entities.c.our_entity_id == our_entity_id)
+    if counterparty_id:
+        query = query.where(counterparty == counterparty_id)
+    query = query.group_by(*dimensions).order_by(*dimensions)
+
+    names = ["direction"] + (["our_entity_id"] if by_entity else []) + (["counterparty_id"] if by_counterparty else [])
+    return [_row(names, row) for row in session.exec(query).all()]
+
+
+def _row(names: List[str], row) -> dict:
+    values = list(row)
+    item = dict(zip(names, values[:len(names)]))
+    amounts = values[len(names):]
+    for name, value in zip(AGING_BUCKETS + ("total_amount",), amounts):
+        item[name] = (Decimal(value) if value is not None else Decimal("0")).quantize(CENT)
+    item["installment_count"] = int(amounts[-1] or 0)
+    return item
+
+
+# ─── Snapshots ───────────────────────────────────────────────────────────────
+
+def take_snapshot(session: Session, snapshot_date: Optional[date] = None) -> int:
+    """Store today's aging per direction, entity and counterparty (replaces that day), without committing"""
+    snapshot_date = snapshot_date or date.today()
+    rows = compute_aging(session, snapshot_date, by_counterparty=True, by_entity=True)
+
+    markers = [
+        {"direction": direction, **{name: Decimal("0") for name in AGING_BUCKETS + ("total_amount",)}, "installment_count": 0}
+        for direction in PaymentDirection
+    ]
+
+    session.execute(delete(ContractAgingSnapshot).where(ContractAgingSnapshot.snapshot_date == snapshot_date))
+    now = datetime.utcnow()
+    session.execute(insert(ContractAgingSnapshot), [
+        {"id": uuid4(), "created_at": now, "updated_at": now, "snapshot_date": snapshot_date, **row}
+        for row in markers + rows
+    ])
+    return len(rows)
+
+
+def snapshot_aging(
+    session: Session,
+    snapshot_date: date,
+    our_entity_id: Optional[UUID] = None,
+    counterparty_id: Optional[UUID] = None,
+    by_counterparty: bool = False,
+    by_entity: bool = False
+) -> Optional[List[dict]]:
+    """Aging as recorded on a past day, same shape as `compute_aging`; None if no snapshot was taken"""
+    exists = session.exec(
+        select(ContractAgingSnapshot.id).where(ContractAgingSnapshot.snapshot_date == snapshot_date).limit(1)
+    ).first()
+    if not exists:
+        return None
+
+    dimensions = [ContractAgingSnapshot.direction]
+    if by_entity:
+        dimensions.append(ContractAgingSnapshot.our_entity_id)
+    if by_counterparty:
+        dimensions.append(ContractAgingSnapshot.counterparty_id)
+    sums = [func.sum(getattr(ContractAgingSnapshot, name)) for name in AGING_BUCKETS + ("total_amount", "installment_count")]
+
+    query = (
+        select(*dimensions, *sums)
+        .where(ContractAgingSnapshot.snapshot_date == snapshot_date)
+        .where(ContractAgingSnapshot.installment_count > 0)
+    )
+    if our_entity_id:
+        query = query.where(ContractAgingSnapshot.our_entity_id == our_entity_id)
+    if counterparty_id:
+        query = query.where(ContractAgingSnapshot.counterparty_id == counterparty_id)
+    query = query.group_by(*dimensions).order_by(*dimensions)
+
+    names = ["direction"] + (["our_entity_id"] if by_entity else []) + (["counterparty_id"] if by_counterparty else [])
+    return [_row(names, row) for row in session.exec(query).all()]
+
+
+def run_daily_aging_snapshot():
+    """Scheduler job: take today's snapshot once"""
+    today = date.today()
+    with Session(engine) as session:
+        taken = session.exec(
+            select(ContractAgingSnapshot.id).where(ContractAgingSnapshot.snapshot_date == today).limit(1)
+        ).first()
+        if taken:
+            return
+        rows = take_snapshot(session, today)
+        session.commit()
+    print(f"📊 Aging snapshot for {today}: {rows} rows")
+
+
+def aging_totals(rows: List[dict]) -> Dict[str, dict]:
+    """Sum report rows per direction (receivable = AR, payable = AP)"""
+    totals: Dict[str, dict] = {}
+    for row in rows:
+        direction = PaymentDirection(row["direction"]).value
+        if direction not in totals:
+            totals[direction] = {name: Decimal("0") for name in AGING_BUCKETS + ("total_amount",)}
+            totals[direction]["installment_count"] = 0
+        total = totals[direction]
+        for name in AGING_BUCKETS + ("total_amount", "installment_count"):
+            total[name] += row[name]
+    return totals
@@ -0,0 +1,150 @@
+"""
+Content-addressed cache for AI responses
+
+Responses are keyed on a hash of (model_name, system_instruction, messages),
+so regenerating the same feature list from an identical conversation is
+served locally instead of calling Gemini again. Entries live in a
+size-bounded in-memory LRU tier and, when `AI_CACHE_SQLITE_PATH` is set, in
+an on-disk SQLite tier that survives restarts and is shared by workers.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+from app.core.config import settings
+from app.utils.cache import TTLCache
+
+
+def make_cache_key(model_name: str, system_instruction: Optional[str], messages: list) -> str:
+    """Stable SHA-256 over the normalized request content"""
+    raw = json.dumps(
+        [model_name, system_instruction or "", messages],
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class SQLiteCacheTier:
+    """On-disk LRU tier backed by a small standalone SQLite file"""
+
+    def __init__(self, path: str, max_entries: int, ttl: float):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS ai_response_cache ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_ai_response_cache_accessed_at"
+                " ON ai_response_cache (accessed_at)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM ai_response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at <= now:
+                conn.execute("DELETE FROM ai_response_cache WHERE key = ?", (key,))
+                return None
+            conn.execute("UPDATE ai_response_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return value
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO ai_response_cache (key, value, expires_at, accessed_at)"
+                " VALUES (?, ?, ?, ?)",
+                (key, value, now + self.ttl, now),
+            )
+            # Evict expired entries first, then the least recently used overflow
+            conn.execute("DELETE FROM ai_response_cache WHERE expires_at <= ?", (now,))
+            conn.execute(
+                "DELETE FROM ai_response_cache WHERE key IN ("
+                " SELECT key FROM ai_response_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+
+class AIResponseCache:
+    """Two-tier (memory + optional SQLite) cache for AI response text"""
+
+    def __init__(self):
+        self.memory = TTLCache(maxsize=settings.AI_CACHE_MAX_ENTRIES, ttl=settings.AI_CACHE_TTL)
+        self.disk: Optional[SQLiteCacheTier] = None
+        if settings.AI_CACHE_SQLITE_PATH:
+            self.disk = SQLiteCacheTier(
+                settings.AI_CACHE_SQLITE_PATH,
+                max_entries=settings.AI_CACHE_DISK_MAX_ENTRIES,
+                ttl=settings.AI_CACHE_TTL,
+            )
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+    @property
+    def enabled(self) -> bool:
+        return settings.AI_CACHE_ENABLED
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            value = await asyncio.to_thread(self.disk.get, key)
+            if value is not None:
+                self.disk_hits += 1
+                self.memory.set(key, value)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: str):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            await asyncio.to_thread(self.disk.set, key, value)
+
+    def record_bypass(self):
+        self.bypassed += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "memory": self.memory.stats(),
+            "disk_enabled": self.disk is not None,
+        }
+
+
+ai_response_cache = AIResponseCache()
@@ -0,0 +1,336 @@
+"""
+Bank statement import
+
+Parses a CSV/XLSX bank statement with pandas, reconciles it against the
+account's existing transactions and bulk-inserts the lines that have no
+counterpart in the ledger. Matching is done with vectorized joins over the
+whole statement instead of per-line queries:
+
+1. reference_no + direction + amount (exact)
+2. lines without reference_no identical (date, direction, amount) to an
+   already reconciled row without one: the same line imported again
+3. direction + amount with the booking date inside a tolerance window,
+   closest date first, one-to-one, against unreconciled rows only (a
+   reconciled row already stands for another bank line) and never pairing
+   two different reference numbers
+
+Matched ledger rows are marked RECONCILED. Inserted lines whose reference_no
+equals a contract number are linked to that contract, which then gets its
+pending amount and installment allocation updated in the same transaction.
+"""
+import io
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional
+from uuid import UUID, uuid4
+
+import pandas as pd
+from sqlalchemy import insert, update
+from sqlmodel import Session, select
+
+from app.core.archive import history, update_history
+from app.core.exceptions import ValidationException
+from app.models.contract import Contract
+from app.models.finance import FinanceTransaction, TransactionDirection, ReconcileStatus
+from app.services.finance_reports import record_transactions
+from app.services.settlement import pending_amount_delta, reallocate_contracts
+
+# Accepted header names per field (first match wins)
+COLUMN_ALIASES = {
+    "txn_date": ["txn_date", "date", "交易日期", "记账日期", "日期", "交易时间"],
+    "amount": ["amount", "金额", "交易金额", "发生额"],
+    "income": ["income", "credit", "收入金额", "贷方金额", "收入"],
+    "expense": ["expense", "debit", "支出金额", "借方金额", "支出"],
+    "direction": ["direction", "txn_direction", "收支方向", "借贷标志", "方向"],
+    "reference_no": ["reference_no", "reference", "流水号", "交易流水号", "参考号", "凭证号"],
+    "purpose": ["purpose", "memo", "摘要", "用途", "附言", "备注"],
+    "counterparty_name": ["counterparty", "对方户名", "对方名称", "交易对手"],
+    "currency": ["currency", "币种"],
+}
+
+DIRECTION_VALUES = {
+    "in": "in", "income": "in", "credit": "in", "收入": "in", "收": "in", "贷": "in", "入账": "in",
+    "out": "out", "expense": "out", "debit": "out", "支出": "out", "支": "out", "借": "out", "出账": "out",
+}
+
+INSERT_BATCH_SIZE = 5000
+LOOKUP_BATCH_SIZE = 500
+MAX_REPORTED_ERRORS = 20
+
+
+# ─── Parsing ─────────────────────────────────────────────────────────────────
+
+def read_statement(content: bytes, filename: str) -> pd.DataFrame:
+    """Load a CSV or XLSX statement into a DataFrame of strings"""
+    name = (filename or "").lower()
+    buffer = io.BytesIO(content)
+    try:
+        if name.endswith((".xlsx", ".xlsm")):
+            return pd.read_excel(buffer, dtype=str, engine="openpyxl")
+        if name.endswith(".csv") or not name:
+            try:
+                return pd.read_csv(buffer, dtype=str, encoding="utf-8-sig", skipinitialspace=True, index_col=False)
+            except UnicodeDecodeError:
+                # Chinese bank exports are frequently GBK encoded
+                buffer.seek(0)
+                return pd.read_csv(buffer, dtype=str, encoding="gbk", skipinitialspace=True, index_col=False)
+    except (ValueError, pd.errors.ParserError) as e:
+        raise ValidationException(f"无法解析对账单文件: {str(e)}")
+    raise ValidationException("仅支持 CSV / XLSX 格式的对账单")
+
+
+def _find_column(df: pd.DataFrame, field: str) -> Optional[str]:
+    columns = {str(c).strip().lower(): c for c in df.columns}
+    for alias in COLUMN_ALIASES[field]:
+        if alias.lower() in columns:
+            return columns[alias.lower()]
+    return None
+
+
+def _to_cents(series: pd.Series) -> pd.Series:
+    cleaned = series.astype(str).str.replace(r"[,\s¥￥]", "", regex=True)
+    return (pd.to_numeric(cleaned, errors="coerce") * 100).round()
+
+
+def normalize_statement(raw: pd.DataFrame, default_currency: str) -> pd.DataFrame:
+    """
+    Map bank specific headers onto the transaction fields.
+
+    The result has one row per statement line with `line` (1-based data row
+    number), `txn_date`, `direction`, `cents` (positive integer amount),
+    `reference_no`, `purpose`, `currency` and an `error` column (None when valid).
+    """
+    raw = raw.dropna(how="all")
+    df = pd.DataFrame({"line": raw.index + 2})  # +1 header row, +1 for 1-based numbering
+    df.index = raw.index
+
+    date_col = _find_column(raw, "txn_date")
+    if date_col is None:
+        raise ValidationException("对账单缺少交易日期列")
+    df["txn_date"] = pd.to_datetime(raw[date_col], errors="coerce").dt.normalize()
+
+    amount_col = _find_column(raw, "amount")
+    income_col = _find_column(raw, "income")
+    expense_col = _find_column(raw, "expense")
+    direction_col = _find_column(raw, "direction")
+
+    if income_col is not None or expense_col is not None:
+        # Separate credit / debit columns
+        income = _to_cents(raw[income_col]).fillna(0) if income_col is not None else 0
+        expense = _to_cents(raw[expense_col]).fillna(0) if expense_col is not None else 0
+        signed = income - expense
+    elif amount_col is not None:
+        signed = _to_cents(raw[amount_col])
+        if direction_col is not None:
+            # Unsigned amount plus a direction column
+            flags = raw[direction_col].astype(str).str.strip().str.lower().map(DIRECTION_VALUES)
+            signed = signed.abs().where(flags != "out", -signed.abs())
+            signed = signed.where(flags.notna())
+    else:
+        raise ValidationException("对账单缺少金额列")
+
+    df["direction"] = pd.Series("in", index=raw.index).where(signed > 0, "out")
+    df["cents"] = signed.abs()
+
+    ref_col = _find_column(raw, "reference_no")
+    df["reference_no"] = raw[ref_col].astype(str).str.strip() if ref_col is not None else None
+    df.loc[df["reference_no"].isin(["", "nan", "None"]), "reference_no"] = None
+
+    purpose_col = _find_column(raw, "purpose")
+    counterparty_col = _find_column(raw, "counterparty_name")
+    purpose = raw[purpose_col].fillna("").astype(str).str.strip() if purpose_col is not None else pd.Series("", index=raw.index)
+    if counterparty_col is not None:
+        counterparty = raw[counterparty_col].fillna("").astype(str).str.strip()
+        purpose = (counterparty + " " + purpose).str.strip()
+    df["purpose"] = purpose.where(purpose != "", None)
+
+    currency_col = _find_column(raw, "currency")
+    df["currency"] = raw[currency_col].fillna(default_currency).astype(str).str.strip() if currency_col is not None else default_currency
+
+    df["error"] = None
+    df.loc[df["cents"].isna() | (df["cents"] == 0), "error"] = "金额无效"
+    df.loc[df["txn_date"].isna(), "error"] = "日期无效"
+    return df
+
+
+# ─── Matching ────────────────────────────────────────────────────────────────
+
+def _load_ledger(session: Session, account_id: UUID, date_from, date_to) -> pd.DataFrame:
+    # Archived rows too: a statement dated before the hot window must still match them
+    Txn = history(session, FinanceTransaction, since=date_from)
+    rows = session.exec(
+        select(Txn.id, Txn.txn_date, Txn.txn_direction, Txn.amount, Txn.reference_no, Txn.reconcile_status)
+        .where(Txn.account_id == account_id)
+        .where(Txn.txn_date >= date_from)
+        .where(Txn.txn_date <= date_to)
+    ).all()
+    ledger = pd.DataFrame(rows, columns=["txn_id", "ledger_date", "direction", "amount", "reference_no", "reconcile_status"])
+    ledger["ledger_date"] = pd.to_datetime(ledger["ledger_date"])
+    ledger["direction"] = ledger["direction"].map(lambda d: TransactionDirection(d).value)
+    ledger["cents"] = ledger["amount"].map(lambda a: float(round(Decimal(a) * 100))).astype(float)
+    ledger["reconciled"] = ledger["reconcile_status"].map(lambda s: ReconcileStatus(s) == ReconcileStatus.RECONCILED).astype(bool)
+    return ledger.drop(columns=["amount", "reconcile_status"])
+
+
+def _one_to_one(pairs: pd.DataFrame) -> pd.DataFrame:
+    """Greedy one-to-one assignment of candidate pairs, best (smallest gap) first"""
+    matched = []
+    while not pairs.empty:
+        best = pairs.drop_duplicates("line_idx").drop_duplicates("txn_id")
+        matched.append(best)
+        pairs = pairs[~pairs["line_idx"].isin(best["line_idx"]) & ~pairs["txn_id"].isin(best["txn_id"])]
+    if not matched:
+        return pd.DataFrame(columns=["line_idx", "txn_id"])
+    return pd.concat(matched)
+
+
+def match_statement(lines: pd.DataFrame, ledger: pd.DataFrame, window_days: int) -> pd.DataFrame:
+    """Return (line_idx, txn_id) pairs pairing statement lines with ledger rows"""
+    lines = lines.reset_index().rename(columns={"index": "line_idx"})
+    keys = ["direction", "cents"]
+
+    # Pass 1: same reference number, direction and amount
+    with_ref = lines[lines["reference_no"].notna()]
+    ledger_ref = ledger[ledger["reference_no"].notna()]
+    by_ref = with_ref.merge(ledger_ref, on=["reference_no"] + keys)
+    by_ref["gap"] = (by_ref["txn_date"] - by_ref["ledger_date"]).abs()
+    first = _one_to_one(by_ref.sort_values("gap")[["line_idx", "txn_id"]])
+
+    # Pass 2: re-imported lines without reference, same day, direction and amount
+    rest = lines[~lines["line_idx"].isin(first["line_idx"])]
+    rest_ledger = ledger[~ledger["txn_id"].isin(first["txn_id"])]
+    imported = rest_ledger[rest_ledger["reconciled"] & rest_ledger["reference_no"].isna()]
+    same_day = rest[rest["reference_no"].isna()].merge(
+        imported, left_on=["txn_date"] + keys, right_on=["ledger_date"] + keys, suffixes=("", "_ledger")
+    )
+    second = _one_to_one(same_day.sort_values("line_idx")[["line_idx", "txn_id"]])
+
+    # Pass 3: same direction and amount within the date window, closest date first
+    rest = rest[~rest["line_idx"].isin(second["line_idx"])]
+    rest_ledger = rest_ledger[~rest_ledger["reconciled"]]
+    by_amount = rest.merge(rest_ledger, on=keys, suffixes=("", "_ledger"))
+    by_amount = by_amount[
+        by_amount["reference_no"].isna() | by_amount["reference_no_ledger"].isna()
+        | (by_amount["reference_no"] == by_amount["reference_no_ledger"])
+    ]
+    by_amount["gap"] = (by_amount["txn_date"] - by_amount["ledger_date"]).abs()
+    by_amount = by_amount[by_amount["gap"] <= pd.Timedelta(days=window_days)]
+    third = _one_to_one(by_amount.sort_values(["gap", "line_idx"])[["line_idx", "txn_id"]])
+
+    return pd.concat([first, second, third], ignore_index=True)
+
+
+def _contracts_by_number(session: Session, numbers: List[str]) -> Dict[str, tuple]:
+    found = {}
+    for i in range(0, len(numbers), LOOKUP_BATCH_SIZE):
+        batch = numbers[i:i + LOOKUP_BATCH_SIZE]
+        for contract_no, contract_id, contract_type in session.exec(
+            select(Contract.contract_no, Contract.id, Contract.contract_type).where(Contract.contract_no.in_(batch))
+        ).all():
+            found[contract_no] = (contract_id, contract_type)
+    return found
+
+
+# ─── Import ──────────────────────────────────────────────────────────────────
+
+def import_bank_statement(
+    session: Session,
+    df: pd.DataFrame,
+    account_id: UUID,
+    our_entity_id: UUID,
+    user_id: UUID,
+    default_currency: str = "CNY",
+    window_days: int = 3
+) -> dict:
+    """Reconcile and import a parsed statement, without committing"""
+    lines = normalize_statement(df, default_currency)
+    invalid = lines[lines["error"].notna()]
+    lines = lines[lines["error"].isna()]
+
+    result = {
+        "total": len(lines) + len(invalid),
+        "invalid": len(invalid),
+        "matched": 0,
+        "already_reconciled": 0,
+        "inserted": 0,
+        "linked_contracts": 0,
+        "errors": [
+            {"line": int(row.line), "error": row.error}
+            for row in invalid.head(MAX_REPORTED_ERRORS).itertuples()
+        ],
+    }
+    if lines.empty:
+        return result
+
+    # Existing ledger rows of this account that could pair with any line
+    window = timedelta(days=window_days)
+    ledger = _load_ledger(
+        session, account_id,
+        (lines["txn_date"].min() - window).date(),
+        (lines["txn_date"].max() + window).date(),
+    )
+    pairs = match_statement(lines, ledger, window_days)
+    pairs = pairs.merge(ledger[["txn_id", "reconciled"]], on="txn_id")
+    pairs["reconciled"] = pairs["reconciled"].astype(bool)
+
+    now = datetime.utcnow()
+    to_reconcile = pairs.loc[~pairs["reconciled"], "txn_id"].tolist()
+    if to_reconcile:
+        update_history(
+            session, FinanceTransaction, to_reconcile, reconcile_status=ReconcileStatus.RECONCILED, updated_at=now
+        )
+    result["matched"] = len(to_reconcile)
+    result["already_reconciled"] = int(pairs["reconciled"].sum())
+
+    # Lines without a ledger counterpart become new transactions
+    new_lines = lines[~lines.index.isin(pairs["line_idx"])]
+    refs = new_lines["reference_no"].dropna().unique().tolist()
+    contracts = _contracts_by_number(session, refs) if refs else {}
+
+    rows = []
+    pending_deltas: Dict[UUID, Decimal] = defaultdict(Decimal)
+    for line in new_lines.itertuples():
+        amount = Decimal(int(line.cents)) / 100
+        contract = contracts.get(line.reference_no) if line.reference_no else None
+        contract_id = contract[0] if contract else None
+        if contract:
+            pending_deltas[contract_id] += pending_amount_delta(contract[1], line.direction, amount)
+        rows.append({
+            "id": uuid4(),
+            "created_at": now,
+            "updated_at": now,
+            "our_entity_id": our_entity_id,
+            "account_id": account_id,
+            "txn_direction": TransactionDirection(line.direction),
+            "amount": amount,
+            "currency": line.currency,
+            "txn_date": line.txn_date.date(),
+            "contract_id": contract_id,
+            "purpose": line.purpose,
+            "channel": "bank_import",
+            "reference_no": line.reference_no,
+            "attachments": [],
+            # The statement itself is the bank side of the match
+            "reconcile_status": ReconcileStatus.RECONCILED,
+            "created_by_user_id": user_id,
+        })
+
+    for i in range(0, len(rows), INSERT_BATCH_SIZE):
+        session.execute(insert(FinanceTransaction), rows[i:i + INSERT_BATCH_SIZE])
+    record_transactions(session, rows)
+    result["inserted"] = len(rows)
+
+    # One relative update per contract, then rebuild installments from the ledger
+    for contract_id, delta in pending_deltas.items():
+        if delta:
+            session.execute(
+                update(Contract)
+                .where(Contract.id == contract_id)
+                .values(pending_amount=Contract.pending_amount + delta)
+            )
+    linked = list({contract_id for contract_id, _ in contracts.values()} & set(pending_deltas))
+    if linked:
+        reallocate_contracts(session, linked)
+    result["linked_contracts"] = len(linked)
+    return result
@@ -0,0 +1,210 @@
+"""
+Workbench dashboard summary
+
+All widgets of the dashboard page are computed in one request. Each widget
+runs in the threadpool with its own session (its own pooled connection), and
+the widgets run concurrently, so the request takes as long as the slowest
+widget instead of the sum.
+
+Summaries are cached per user for DASHBOARD_CACHE_TTL seconds. Concurrent
+requests of one user share a single computation (single-flight), and at most
+DASHBOARD_MAX_CONCURRENCY computations run at once, which bounds database
+load when everybody opens the workbench at 9:00.
+
+Invalidation uses a write clock: post-commit hooks bump the topics a write
+touches (the assignee's todos, the project owner's projects, finance, users).
+A cached summary records the topics it read and the clock when it started, and
+is discarded as soon as one of those topics changed after that point.
+"""
+import asyncio
+import threading
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Hashable, List, Set
+from uuid import UUID
+
+from fastapi.concurrency import run_in_threadpool
+from sqlmodel import Session, select, func, col, or_
+
+from app.core.config import settings
+from app.core.database import engine
+from app.core.events import on_commit
+from app.models.finance import FinanceAccount, FinanceTransaction, AccountStatus
+from app.models.iam import User
+from app.models.project import Project, ProjectStatus
+from app.models.todo import TodoItem, TodoStatus
+from app.services.facets import facet_counts
+from app.services.finance_reports import account_balances
+from app.utils.cache import SingleFlight, TTLCache
+
+RECENT_LIMIT = 5
+
+OPEN_TODO_STATUSES = (TodoStatus.OPEN, TodoStatus.IN_PROGRESS, TodoStatus.BLOCKED)
+
+
+# ─── Widgets ─────────────────────────────────────────────────────────────────
+# Each widget returns (data, topics it depends on).
+
+def _todo_summary(session: Session, assignee_ids: List[UUID], now: datetime) -> dict:
+    condition = col(TodoItem.assignee_user_id).in_(assignee_ids)
+    counts = facet_counts(session, TodoItem, {"status": TodoStatus}, [condition])
+    overdue = session.exec(
+        select(func.count()).select_from(TodoItem)
+        .where(condition)
+        .where(col(TodoItem.status).in_(OPEN_TODO_STATUSES))
+        .where(TodoItem.due_at < now)
+    ).one()
+    return {"status": counts["status"], "total": counts["total"], "overdue": overdue}
+
+
+def _my_todos(session: Session, user_id: UUID, now: datetime):
+    summary = _todo_summary(session, [user_id], now)
+    recent = session.exec(
+        select(TodoItem.id, TodoItem.title, TodoItem.status, TodoItem.priority, TodoItem.due_at, TodoItem.updated_at)
+        .where(TodoItem.assignee_user_id == user_id)
+        .order_by(TodoItem.updated_at.desc())
+        .limit(RECENT_LIMIT)
+    ).all()
+    summary["recent"] = [dict(row._mapping) for row in recent]
+    return summary, [("todos", user_id)]
+
+
+def _team_todos(session: Session, user_id: UUID, now: datetime):
+    subordinate_ids = list(session.exec(select(User.id).where(User.manager_user_id == user_id)).all())
+    if not subordinate_ids:
+        return {"status": {status.value: 0 for status in TodoStatus}, "total": 0, "overdue": 0, "subordinates": 0}, []
+    summary = _todo_summary(session, subordinate_ids, now)
+    summary["subordinates"] = len(subordinate_ids)
+    return summary, [("todos", subordinate_id) for subordinate_id in subordinate_ids]
+
+
+def _projects(session: Session, user_id: UUID, now: datetime):
+    mine = or_(Project.owner_user_id == user_id, Project.pm_user_id == user_id)
+    counts = facet_counts(session, Project, {"status": ProjectStatus}, [mine])
+    recent = session.exec(
+        select(Project.id, Project.name, Project.project_no, Project.status, Project.progress, Project.due_at)
+        .where(mine)
+        .order_by(Project.updated_at.desc())
+        .limit(RECENT_LIMIT)
+    ).all()
+    data = {"status": counts["status"], "total": counts["total"], "recent": [dict(row._mapping) for row in recent]}
+    return data, [("projects", user_id)]
+
+
+def _finance_accounts(session: Session, user_id: UUID, now: datetime):
+    accounts = session.exec(select(FinanceAccount).where(FinanceAccount.status == AccountStatus.ACTIVE)).all()
+    balances = account_balances(session, accounts)
+    items = []
+    for account in accounts:
+        balance = balances[account.id]
+        items.append({
+            "id": account.id,
+            "account_name": account.account_name,
+            "bank_name": account.bank_name,
+            "account_no_masked": account.account_no_masked,
+            "currency": account.currency,
+            "balance": balance.quantize(Decimal("0.01")),
+        })
+    return items, [("finance",)]
+
+
+WIDGETS = {
+    "my_todos": _my_todos,
+    "team_todos": _team_todos,
+    "projects": _projects,
+    "finance_accounts": _finance_accounts,
+}
+
+
+def _run_widget(widget, user_id: UUID, now: datetime):
+    with Session(engine) as session:
+        return widget(session, user_id, now)
+
+
+# ─── Cache ───────────────────────────────────────────────────────────────────
+
+class DashboardCache:
+    """Per-user summaries invalidated through topic write clocks"""
+
+    def __init__(self):
+        self._entries = TTLCache(maxsize=settings.DASHBOARD_CACHE_MAX_ENTRIES, ttl=settings.DASHBOARD_CACHE_TTL)
+        self._clock = 0
+        self._changed_at: Dict[Hashable, int] = {}
+        self._lock = threading.Lock()
+        self._flight = SingleFlight()
+        self._semaphore = None
+
+    def touch(self, topics: Set[Hashable]):
+        """Record a committed write to `topics`"""
+        with self._lock:
+            self._clock += 1
+            for topic in topics:
+                self._changed_at[topic] = self._clock
+
+    def _fresh(self, started_at: int, topics: List[Hashable]) -> bool:
+        with self._lock:
+            return all(self._changed_at.get(topic, 0) <= started_at for topic in topics)
+
+    async def _compute(self, user_id: UUID) -> dict:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(settings.DASHBOARD_MAX_CONCURRENCY)
+        async with self._semaphore:
+            with self._lock:
+                started_at = self._clock
+            now = datetime.utcnow()
+            results = await asyncio.gather(*(
+                run_in_threadpool(_run_widget, widget, user_id, now) for widget in WIDGETS.values()
+            ))
+        summary = {"generated_at": now}
+        topics: List[Hashable] = [("users",)]
+        for name, (data, widget_topics) in zip(WIDGETS, results):
+            summary[name] = data
+            topics.extend(widget_topics)
+        self._entries.set(user_id, (started_at, topics, summary))
+        return summary
+
+    async def get(self, user_id: UUID) -> dict:
+        cached = self._entries.get(user_id)
+        if cached is not None:
+            started_at, topics, summary = cached
+            if self._fresh(started_at, topics):
+                return summary
+        return await self._flight.do(user_id, lambda: self._compute(user_id))
+
+
+dashboard_cache = DashboardCache()
+
+
+# ─── Invalidation hooks ──────────────────────────────────────────────────────
+
+def _touch_todos(changes):
+    # A reassigned todo also leaves the previous assignee's summary
+    dashboard_cache.touch({
+        ("todos", user_id)
+        for _, values, previous in changes
+        for user_id in (values["assignee_user_id"], *previous.values())
+    })
+
+
+def _touch_projects(changes):
+    dashboard_cache.touch({
+        ("projects", user_id)
+        for _, values, previous in changes
+        for user_id in (values["owner_user_id"], values["pm_user_id"], *previous.values())
+    })
+
+
+def _touch_finance(changes):
+    dashboard_cache.touch({("finance",)})
+
+
+def _touch_users(changes):
+    # Manager changes reshape team widgets; user writes are rare enough to drop everything
+    dashboard_cache.touch({("users",)})
+
+
+on_commit(TodoItem, _touch_todos, previous=("assignee_user_id",))
+on_commit(Project, _touch_projects, previous=("owner_user_id", "pm_user_id"))
+on_commit(FinanceAccount, _touch_finance)
+on_commit(FinanceTransaction, _touch_finance)
+on_commit(User, _touch_users)
@@ -0,0 +1,356 @@
+"""
+Bulk export pipeline
+
+Any registered list query (transactions, invoices, contracts, todos) can be
+written out as CSV, NDJSON or XLSX. Rows are read through a server-side cursor
+(`yield_per`) on a dedicated session and encoded batch by batch, so memory use
+stays constant regardless of the number of rows. Small exports are streamed
+directly; large ones run as background jobs that leave a downloadable file in
+`EXPORT_DIR`.
+"""
+import csv
+import io
+import json
+import os
+import threading
+import time
+from datetime import date, datetime
+from decimal import Decimal
+from enum import Enum
+from typing import Any, Callable, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+from openpyxl import Workbook
+from sqlmodel import Session, select, or_
+
+from app.core.archive import with_history
+from app.core.config import settings
+from app.core.database import engine
+from app.core.exceptions import NotFoundException, ValidationException
+from app.core.sharding import SHARDED_MODELS, shards
+from app.models.contract import Contract
+from app.models.finance import FinanceTransaction, FinanceInvoice
+from app.models.todo import TodoItem, TodoStatus
+from app.utils.files import XLSX_MEDIA_TYPE
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "xlsx": (XLSX_MEDIA_TYPE, "xlsx"),
+}
+
+
+# ─── Datasets ────────────────────────────────────────────────────────────────
+
+class ExportDataset:
+    """A list query that can be exported: selected columns plus filter handling"""
+
+    def __init__(self, name: str, model, columns: List[str], order_by,
+                 apply_filters: Callable[[Any, Dict[str, Any], UUID], Any], filter_names: Tuple[str, ...]):
+        self.name = name
+        self.model = model
+        self.columns = columns
+        self.order_by = order_by
+        self.apply_filters = apply_filters
+        self.filter_names = filter_names
+
+    def build_query(self, filters: Dict[str, Any], user_id: UUID):
+        query = select(*[getattr(self.model, c) for c in self.columns])
+        query = self.apply_filters(query, filters, user_id)
+        return query.order_by(self.order_by)
+
+
+def _transaction_filters(query, filters: Dict[str, Any], user_id: UUID):
+    if filters.get("our_entity_id"):
+        query = query.where(FinanceTransaction.our_entity_id == filters["our_entity_id"])
+    if filters.get("account_id"):
+        query = query.where(FinanceTransaction.account_id == filters["account_id"])
+    if filters.get("contract_id"):
+        query = query.where(FinanceTransaction.contract_id == filters["contract_id"])
+    if filters.get("txn_direction"):
+        query = query.where(FinanceTransaction.txn_direction == filters["txn_direction"])
+    if filters.get("date_from"):
+        query = query.where(FinanceTransaction.txn_date >= filters["date_from"])
+    if filters.get("date_to"):
+        query = query.where(FinanceTransaction.txn_date <= filters["date_to"])
+    return query
+
+
+def _invoice_filters(query, filters: Dict[str, Any], user_id: UUID):
+    if filters.get("our_entity_id"):
+        query = query.where(FinanceInvoice.our_entity_id == filters["our_entity_id"])
+    if filters.get("invoice_kind"):
+        query = query.where(FinanceInvoice.invoice_kind == filters["invoice_kind"])
+    if filters.get("date_from"):
+        query = query.where(FinanceInvoice.issue_date >= filters["date_from"])
+    if filters.get("date_to"):
+        query = query.where(FinanceInvoice.issue_date <= filters["date_to"])
+    return query
+
+
+def _contract_filters(query, filters: Dict[str, Any], user_id: UUID):
+    if filters.get("status"):
+        query = query.where(Contract.status == filters["status"])
+    if filters.get("contract_type"):
+        query = query.where(Contract.contract_type == filters["contract_type"])
+    return query
+
+
+def _todo_filters(query, filters: Dict[str, Any], user_id: UUID):
+    # Same visibility as /todo/my: only todos assigned to the requesting user
+    query = query.where(TodoItem.assignee_user_id == user_id)
+    status = filters.get("status")
+    if status == "open":
+        query = query.where(or_(
+            TodoItem.status == TodoStatus.OPEN,
+            TodoItem.status == TodoStatus.IN_PROGRESS,
+            TodoItem.status == TodoStatus.BLOCKED,
+        ))
+    elif status:
+        query = query.where(TodoItem.status == status)
+    if filters.get("source_type"):
+        query = query.where(TodoItem.source_type == filters["source_type"])
+    return query
+
+
+DATASETS: Dict[str, ExportDataset] = {
+    "transactions": ExportDataset(
+        "transactions", FinanceTransaction,
+        ["id", "txn_date", "our_entity_id", "account_id", "txn_direction", "amount", "currency",
+         "counterparty_id", "contract_id", "purpose", "channel", "reference_no",
+         "reconcile_status", "created_by_user_id", "created_at"],
+        FinanceTransaction.txn_date.desc(),
+        _transaction_filters,
+        ("our_entity_id", "account_id", "contract_id", "txn_direction", "date_from", "date_to"),
+    ),
+    "invoices": ExportDataset(
+        "invoices", FinanceInvoice,
+        ["id", "our_entity_id", "invoice_kind", "invoice_medium", "invoice_no", "issue_date",
+         "amount_with_tax", "ocr_status", "related_contract_id", "related_payment_plan_id", "created_at"],
+        FinanceInvoice.created_at.desc(),
+        _invoice_filters,
+        ("our_entity_id", "invoice_kind", "date_from", "date_to"),
+    ),
+    "contracts": ExportDataset(
+        "contracts", Contract,
+        ["id", "contract_no", "name", "contract_type", "status", "party_a_id", "party_b_id", "party_c_id",
+         "owner_user_id", "pm_user_id", "amount_total", "pending_amount", "currency",
+         "sign_date", "effective_date", "expire_date", "summary", "created_at"],
+        Contract.created_at.desc(),
+        _contract_filters,
+        ("status", "contract_type"),
+    ),
+    "todos": ExportDataset(
+        "todos", TodoItem,
+        ["id", "title", "status", "priority", "source_type", "source_id", "action_type",
+         "assignee_user_id", "creator_user_id", "due_at", "start_at", "done_at", "created_at"],
+        TodoItem.due_at,
+        _todo_filters,
+        ("status", "source_type"),
+    ),
+}
+
+
+def get_dataset(name: str) -> ExportDataset:
+    dataset = DATASETS.get(name)
+    if not dataset:
+        raise NotFoundException(f"不支持导出的数据集: {name}")
+    return dataset
+
+
+def check_format(fmt: str) -> str:
+    if fmt not in EXPORT_FORMATS:
+        raise ValidationException(f"不支持的导出格式: {fmt}")
+    return fmt
+
+
+def iter_rows(dataset: ExportDataset, filters: Dict[str, Any], user_id: UUID) -> Iterator[tuple]:
+    """Stream result rows through a server-side cursor on a dedicated session (per shard for sharded models)"""
+    query = dataset.build_query(filters, user_id).execution_options(yield_per=settings.EXPORT_BATCH_SIZE)
+    if dataset.model in SHARDED_MODELS:
+        created_at = dataset.columns.index("created_at")
+        for row in shards.iter_rows(query, filters.get("our_entity_id"), key=lambda row: row[created_at]):
+            yield tuple(row)
+        return
+    with Session(engine) as session:
+        query = with_history(session, query, dataset.model, since=filters.get("date_from"))
+        for row in session.exec(query):
+            yield tuple(row)
+
+
+# ─── Encoders ────────────────────────────────────────────────────────────────
+
+def _plain(value: Any) -> Any:
+    """Convert a column value to a JSON/CSV friendly scalar"""
+    if value is None:
+        return None
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, UUID):
+        return str(value)
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def csv_chunks(columns: List[str], rows: Iterable[tuple]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # BOM so Excel opens UTF-8 (Chinese) content correctly
+    buffer.write("\ufeff")
+    writer.writerow(columns)
+    pending = 0
+    for row in rows:
+        writer.writerow(["" if v is None else _plain(v) for v in row])
+        pending += 1
+        if pending >= settings.EXPORT_BATCH_SIZE:
+            yield buffer.getvalue().encode("utf-8")
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+    yield buffer.getvalue().encode("utf-8")
+
+
+def ndjson_chunks(columns: List[str], rows: Iterable[tuple]) -> Iterator[bytes]:
+    lines = []
+    for row in rows:
+        lines.append(json.dumps({c: _plain(v) for c, v in zip(columns, row)}, ensure_ascii=False))
+        if len(lines) >= settings.EXPORT_BATCH_SIZE:
+            yield ("\n".join(lines) + "\n").encode("utf-8")
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def _xlsx_value(value: Any) -> Any:
+    # Excel has no timezone support, so aware datetimes are written as naive
+    if isinstance(value, datetime):
+        return value.replace(tzinfo=None)
+    if isinstance(value, (int, float, Decimal, date)):
+        return value
+    return _plain(value)
+
+
+def write_xlsx(columns: List[str], rows: Iterable[tuple], fp: IO[bytes], title: str = "export") -> int:
+    """Write rows into a write-only workbook; returns the number of data rows"""
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=title)
+    ws.append(columns)
+    count = 0
+    for row in rows:
+        ws.append([_xlsx_value(v) for v in row])
+        count += 1
+    wb.save(fp)
+    return count
+
+
+def write_export(dataset: ExportDataset, fmt: str, filters: Dict[str, Any], user_id: UUID, fp: IO[bytes]) -> int:
+    """Write a complete export to a binary file object; returns the row count"""
+    counter = {"rows": 0}
+
+    def counted(rows: Iterable[tuple]) -> Iterator[tuple]:
+        for row in rows:
+            counter["rows"] += 1
+            yield row
+
+    rows = counted(iter_rows(dataset, filters, user_id))
+    if fmt == "xlsx":
+        write_xlsx(dataset.columns, rows, fp, title=dataset.name)
+    else:
+        encoder = csv_chunks if fmt == "csv" else ndjson_chunks
+        for chunk in encoder(dataset.columns, rows):
+            fp.write(chunk)
+    return counter["rows"]
+
+
+# ─── Background jobs ─────────────────────────────────────────────────────────
+
+class ExportJob:
+    """In-process record of a background export"""
+
+    def __init__(self, dataset: str, fmt: str, filters: Dict[str, Any], user_id: UUID):
+        self.id = uuid4()
+        self.dataset = dataset
+        self.format = fmt
+        self.filters = filters
+        self.user_id = user_id
+        self.status = "pending"  # pending, running, done, failed
+        self.row_count = 0
+        self.file_path: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = datetime.utcnow()
+        self.finished_at: Optional[datetime] = None
+        self._created_monotonic = time.monotonic()
+
+    @property
+    def filename(self) -> str:
+        return f"{self.dataset}_{self.created_at:%Y%m%d%H%M%S}.{EXPORT_FORMATS[self.format][1]}"
+
+    def to_dict(self) -> dict:
+        return {
+            "id": str(self.id),
+            "dataset": self.dataset,
+            "format": self.format,
+            "status": self.status,
+            "row_count": self.row_count,
+            "filename": self.filename,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class ExportJobRegistry:
+    """Tracks background export jobs and removes their files once expired"""
+
+    def __init__(self):
+        self._jobs: Dict[UUID, ExportJob] = {}
+        self._lock = threading.Lock()
+
+    def create(self, dataset: str, fmt: str, filters: Dict[str, Any], user_id: UUID) -> ExportJob:
+        self.purge_expired()
+        job = ExportJob(dataset, fmt, filters, user_id)
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: UUID, user_id: UUID) -> ExportJob:
+        job = self._jobs.get(job_id)
+        if not job or job.user_id != user_id:
+            raise NotFoundException("未找到导出任务")
+        return job
+
+    def purge_expired(self):
+        cutoff = time.monotonic() - settings.EXPORT_JOB_TTL
+        with self._lock:
+            expired = [job for job in self._jobs.values() if job._created_monotonic < cutoff]
+            for job in expired:
+                del self._jobs[job.id]
+        for job in expired:
+            if job.file_path and os.path.exists(job.file_path):
+                os.remove(job.file_path)
+
+    def run(self, job: ExportJob):
+        """Execute a job (called from a worker thread via BackgroundTasks)"""
+        job.status = "running"
+        os.makedirs(settings.EXPORT_DIR, exist_ok=True)
+        path = os.path.join(settings.EXPORT_DIR, f"{job.id}.{EXPORT_FORMATS[job.format][1]}")
+        try:
+            with open(path, "wb") as fp:
+                job.row_count = write_export(get_dataset(job.dataset), job.format, job.filters, job.user_id, fp)
+            job.file_path = path
+            job.status = "done"
+        except Exception as e:
+            import traceback
+            traceback.print_exc()
+            job.status = "failed"
+            job.error = f"{type(e).__name__}: {str(e)}"
+            if os.path.exists(path):
+                os.remove(path)
+        finally:
+            job.finished_at = datetime.utcnow()
+
+
+export_jobs = ExportJobRegistry()
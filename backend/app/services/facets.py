@@ -0,0 +1,76 @@
+"""
+Faceted counts for the todo board and the contract list
+
+Each facet dimension is one `SELECT dim, COUNT(*) ... GROUP BY dim` over the
+filtered rows, so the database counts instead of the API loading every row.
+Every member of the dimension's enum is present (zero when unused) so the UI
+can render its tabs directly. Results are cached for FACET_CACHE_TTL seconds
+per scope: per user for todos, shared for contracts since every user sees the
+same contract list.
+"""
+from enum import Enum
+from typing import Dict, List, Optional
+from uuid import UUID
+
+from sqlmodel import Session, select, func, col
+
+from app.core.config import settings
+from app.models.contract import Contract, ContractStatus, ContractType
+from app.models.iam import User
+from app.models.todo import TodoItem, TodoPriority, TodoSourceType, TodoStatus
+from app.utils.cache import TTLCache
+
+# dimension -> enum of its values
+TODO_FACETS = {"status": TodoStatus, "priority": TodoPriority, "source_type": TodoSourceType}
+CONTRACT_FACETS = {"status": ContractStatus, "contract_type": ContractType}
+
+facet_cache = TTLCache(maxsize=settings.FACET_CACHE_MAX_ENTRIES, ttl=settings.FACET_CACHE_TTL)
+
+
+def facet_counts(session: Session, model, dimensions: Dict[str, type], filters: Optional[list] = None) -> dict:
+    """{dimension: {value: count}} with one GROUP BY per dimension, plus the overall total"""
+    result = {}
+    total = 0
+    for name, values in dimensions.items():
+        column = getattr(model, name)
+        query = select(column, func.count()).select_from(model)
+        for condition in filters or []:
+            query = query.where(condition)
+        counts = {member.value: 0 for member in values}
+        total = 0
+        for value, count in session.exec(query.group_by(column)).all():
+            key = value.value if isinstance(value, Enum) else value
+            counts[key] = counts.get(key, 0) + count
+            total += count
+        result[name] = counts
+    result["total"] = total
+    return result
+
+
+def todo_facets(session: Session, user_id: UUID, scope: str = "my") -> dict:
+    """Counts over my todos, or my direct subordinates' todos (scope="team")"""
+    cache_key = ("todo", user_id, scope)
+    cached = facet_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    if scope == "team":
+        assignee_ids: List[UUID] = list(session.exec(select(User.id).where(User.manager_user_id == user_id)).all())
+    else:
+        assignee_ids = [user_id]
+    if assignee_ids:
+        result = facet_counts(session, TodoItem, TODO_FACETS, [col(TodoItem.assignee_user_id).in_(assignee_ids)])
+    else:
+        result = {name: {member.value: 0 for member in values} for name, values in TODO_FACETS.items()}
+        result["total"] = 0
+    facet_cache.set(cache_key, result)
+    return result
+
+
+def contract_facets(session: Session) -> dict:
+    cached = facet_cache.get(("contract",))
+    if cached is not None:
+        return cached
+    result = facet_counts(session, Contract, CONTRACT_FACETS)
+    facet_cache.set(("contract",), result)
+    return result
@@ -0,0 +1,276 @@
+"""
+Finance reporting cube
+
+Cash-flow reports are served from `finance_monthly_rollup`, which holds one
+row per (month, entity, account, counterparty, contract, currency) bucket with
+its in/out totals. Every transaction insert folds itself into its bucket with a
+single atomic upsert, so reports only aggregate the (small) rollup table with a
+SQL GROUP BY instead of scanning the transaction ledger.
+"""
+import re
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Sequence
+from uuid import UUID, uuid4
+
+from sqlalchemy import delete, insert, update
+from sqlmodel import Session, select, func
+
+from app.core.archive import with_history
+from app.core.database import engine
+from app.core.exceptions import ValidationException
+from app.models.finance import FinanceAccount, FinanceMonthlyRollup, FinanceTransaction, TransactionDirection
+
+# Dimensions a report can be grouped / filtered by
+REPORT_DIMENSIONS = ("month", "our_entity_id", "account_id", "counterparty_id", "contract_id", "currency")
+
+MONTH_PATTERN = re.compile(r"^\d{4}-(0[1-9]|1[0-2])$")
+
+ROLLUP_BATCH_SIZE = 1000
+
+
+def month_key(value) -> str:
+    return f"{value.year:04d}-{value.month:02d}"
+
+
+def _bucket_key(month: str, our_entity_id, account_id, counterparty_id, contract_id, currency: str) -> str:
+    return "|".join(str(part) if part else "" for part in (
+        month, our_entity_id, account_id, counterparty_id, contract_id, currency
+    ))
+
+
+class _Bucket:
+    __slots__ = ("month", "our_entity_id", "account_id", "counterparty_id", "contract_id", "currency",
+                 "in_amount", "out_amount", "txn_count")
+
+    def __init__(self, month, our_entity_id, account_id, counterparty_id, contract_id, currency):
+        self.month = month
+        self.our_entity_id = our_entity_id
+        self.account_id = account_id
+        self.counterparty_id = counterparty_id
+        self.contract_id = contract_id
+        self.currency = currency
+        self.in_amount = Decimal("0")
+        self.out_amount = Decimal("0")
+        self.txn_count = 0
+
+    def add(self, direction, amount: Decimal, count: int = 1):
+        if TransactionDirection(direction) == TransactionDirection.IN:
+            self.in_amount += Decimal(amount)
+        else:
+            self.out_amount += Decimal(amount)
+        self.txn_count += count
+
+    def to_row(self, now: datetime) -> dict:
+        return {
+            "id": uuid4(),
+            "created_at": now,
+            "updated_at": now,
+            "bucket_key": _bucket_key(self.month, self.our_entity_id, self.account_id,
+                                      self.counterparty_id, self.contract_id, self.currency),
+            "month": self.month,
+            "our_entity_id": self.our_entity_id,
+            "account_id": self.account_id,
+            "counterparty_id": self.counterparty_id,
+            "contract_id": self.contract_id,
+            "currency": self.currency,
+            "in_amount": self.in_amount,
+            "out_amount": self.out_amount,
+            "txn_count": self.txn_count,
+        }
+
+
+def _upsert_statement(dialect: str, rows: List[dict]):
+    table = FinanceMonthlyRollup.__table__
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(table).values(rows)
+        incoming = stmt.excluded
+        return stmt.on_conflict_do_update(index_elements=["bucket_key"], set_={
+            "in_amount": table.c.in_amount + incoming.in_amount,
+            "out_amount": table.c.out_amount + incoming.out_amount,
+            "txn_count": table.c.txn_count + incoming.txn_count,
+            "updated_at": incoming.updated_at,
+        })
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        stmt = dialect_insert(table).values(rows)
+        incoming = stmt.inserted
+        return stmt.on_duplicate_key_update(
+            in_amount=table.c.in_amount + incoming.in_amount,
+            out_amount=table.c.out_amount + incoming.out_amount,
+            txn_count=table.c.txn_count + incoming.txn_count,
+            updated_at=incoming.updated_at,
+        )
+    return None
+
+
+def record_transactions(session: Session, transactions: Iterable) -> int:
+    """
+    Fold newly inserted transactions into the monthly rollup, without committing.
+
+    Accepts FinanceTransaction objects or dicts with the same fields. Returns
+    the number of buckets touched.
+    """
+    buckets: Dict[str, _Bucket] = {}
+    for txn in transactions:
+        get = txn.get if isinstance(txn, dict) else lambda name: getattr(txn, name)
+        month = month_key(get("txn_date"))
+        key = _bucket_key(month, get("our_entity_id"), get("account_id"),
+                          get("counterparty_id"), get("contract_id"), get("currency"))
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = _Bucket(month, get("our_entity_id"), get("account_id"),
+                                            get("counterparty_id"), get("contract_id"), get("currency"))
+        bucket.add(get("txn_direction"), get("amount"))
+
+    now = datetime.utcnow()
+    rows = [bucket.to_row(now) for bucket in buckets.values()]
+    dialect = session.get_bind().dialect.name
+    for i in range(0, len(rows), ROLLUP_BATCH_SIZE):
+        batch = rows[i:i + ROLLUP_BATCH_SIZE]
+        stmt = _upsert_statement(dialect, batch)
+        if stmt is not None:
+            session.execute(stmt)
+            continue
+        # Generic fallback: relative UPDATE, INSERT when the bucket does not exist yet
+        for row in batch:
+            result = session.execute(
+                update(FinanceMonthlyRollup)
+                .where(FinanceMonthlyRollup.bucket_key == row["bucket_key"])
+                .values(
+                    in_amount=FinanceMonthlyRollup.in_amount + row["in_amount"],
+                    out_amount=FinanceMonthlyRollup.out_amount + row["out_amount"],
+                    txn_count=FinanceMonthlyRollup.txn_count + row["txn_count"],
+                    updated_at=now,
+                )
+            )
+            if result.rowcount == 0:
+                session.execute(insert(FinanceMonthlyRollup), [row])
+    return len(rows)
+
+
+def _month_expression(dialect: str):
+    if dialect == "mysql":
+        return func.date_format(FinanceTransaction.txn_date, "%Y-%m")
+    if dialect == "sqlite":
+        return func.strftime("%Y-%m", FinanceTransaction.txn_date)
+    return func.to_char(FinanceTransaction.txn_date, "YYYY-MM")
+
+
+def rebuild_rollup(session: Session) -> int:
+    """Recompute the whole rollup from the ledger with one GROUP BY, without committing"""
+    month = _month_expression(session.get_bind().dialect.name)
+    dimensions = (
+        FinanceTransaction.our_entity_id, FinanceTransaction.account_id, FinanceTransaction.counterparty_id,
+        FinanceTransaction.contract_id, FinanceTransaction.currency,
+    )
+    grouped = session.exec(with_history(
+        session,
+        select(month, *dimensions, FinanceTransaction.txn_direction,
+               func.sum(FinanceTransaction.amount), func.count())
+        .group_by(month, *dimensions, FinanceTransaction.txn_direction),
+        FinanceTransaction,
+    )).all()
+
+    buckets: Dict[str, _Bucket] = {}
+    for month_value, our_entity_id, account_id, counterparty_id, contract_id, currency, direction, total, count in grouped:
+        key = _bucket_key(month_value, our_entity_id, account_id, counterparty_id, contract_id, currency)
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = _Bucket(month_value, our_entity_id, account_id,
+                                            counterparty_id, contract_id, currency)
+        bucket.add(direction, total, count)
+
+    session.execute(delete(FinanceMonthlyRollup))
+    now = datetime.utcnow()
+    rows = [bucket.to_row(now) for bucket in buckets.values()]
+    for i in range(0, len(rows), ROLLUP_BATCH_SIZE):
+        session.execute(insert(FinanceMonthlyRollup), rows[i:i + ROLLUP_BATCH_SIZE])
+    return len(rows)
+
+
+def account_balances(session: Session, accounts: Sequence[FinanceAccount]) -> Dict[UUID, Decimal]:
+    """initial_balance + in - out per account, from one GROUP BY over the ledger (archived rows included)"""
+    if not accounts:
+        return {}
+    balances = {account.id: Decimal(account.initial_balance) for account in accounts}
+    for account_id, direction, total in session.exec(with_history(
+        session,
+        select(FinanceTransaction.account_id, FinanceTransaction.txn_direction, func.sum(FinanceTransaction.amount))
+        .where(FinanceTransaction.account_id.in_(list(balances)))
+        .group_by(FinanceTransaction.account_id, FinanceTransaction.txn_direction),
+        FinanceTransaction,
+    )).all():
+        amount = Decimal(total or 0)
+        balances[account_id] += amount if TransactionDirection(direction) == TransactionDirection.IN else -amount
+    return balances
+
+
+def backfill_rollup():
+    """Build the rollup once for databases that already held transactions before it existed"""
+    with Session(engine) as session:
+        if session.exec(select(FinanceMonthlyRollup.id).limit(1)).first():
+            return
+        if not session.exec(select(FinanceTransaction.id).limit(1)).first():
+            return
+        buckets = rebuild_rollup(session)
+        session.commit()
+    print(f"📊 Cash flow rollup built: {buckets} buckets")
+
+
+# ─── Reports ─────────────────────────────────────────────────────────────────
+
+def parse_group_by(group_by: str) -> List[str]:
+    dimensions = [d.strip() for d in (group_by or "").split(",") if d.strip()]
+    invalid = [d for d in dimensions if d not in REPORT_DIMENSIONS]
+    if invalid:
+        raise ValidationException(f"不支持的分组维度: {', '.join(invalid)}")
+    return list(dict.fromkeys(dimensions))
+
+
+def check_month(value: Optional[str]) -> Optional[str]:
+    if value and not MONTH_PATTERN.match(value):
+        raise ValidationException(f"月份格式应为 YYYY-MM: {value}")
+    return value
+
+
+def cash_flow_report(
+    session: Session,
+    group_by: List[str],
+    month_from: Optional[str] = None,
+    month_to: Optional[str] = None,
+    filters: Optional[Dict[str, object]] = None
+) -> List[dict]:
+    """In/out/net totals per requested dimensions, aggregated from the rollup"""
+    columns = [getattr(FinanceMonthlyRollup, d) for d in group_by]
+    query = select(
+        *columns,
+        func.sum(FinanceMonthlyRollup.in_amount),
+        func.sum(FinanceMonthlyRollup.out_amount),
+        func.sum(FinanceMonthlyRollup.txn_count),
+    )
+    if month_from:
+        query = query.where(FinanceMonthlyRollup.month >= month_from)
+    if month_to:
+        query = query.where(FinanceMonthlyRollup.month <= month_to)
+    for name, value in (filters or {}).items():
+        if value is not None:
+            query = query.where(getattr(FinanceMonthlyRollup, name) == value)
+    if columns:
+        query = query.group_by(*columns).order_by(*columns)
+
+    rows = []
+    for row in session.exec(query).all():
+        *keys, in_amount, out_amount, txn_count = row
+        in_amount = Decimal(in_amount) if in_amount is not None else Decimal("0")
+        out_amount = Decimal(out_amount) if out_amount is not None else Decimal("0")
+        item = dict(zip(group_by, keys))
+        item.update({
+            "in_amount": in_amount,
+            "out_amount": out_amount,
+            "net_amount": in_amount - out_amount,
+            "txn_count": int(txn_count or 0),
+        })
+        rows.append(item)
+    return rows
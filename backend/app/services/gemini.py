@@ -0,0 +1,117 @@
+"""
+Gemini API client
+
+A single application-lifetime httpx client is shared by every AI request so
+connections (and their TLS sessions) are pooled and kept alive instead of being
+re-established per call. A semaphore caps the number of in-flight upstream
+requests so a burst of chat calls cannot exhaust sockets.
+"""
+import asyncio
+import json
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from app.core.config import settings
+
+
+class GeminiClient:
+    """Pooled async client for the Gemini generative language API"""
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None):
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _build_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(
+            max_connections=settings.AI_HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.AI_HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=settings.AI_HTTP_KEEPALIVE_EXPIRY,
+        )
+        timeout = httpx.Timeout(
+            settings.AI_HTTP_TIMEOUT,
+            connect=settings.AI_HTTP_CONNECT_TIMEOUT,
+            pool=settings.AI_HTTP_POOL_TIMEOUT,
+        )
+        http2 = settings.AI_HTTP2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                print("⚠️  AI_HTTP2 is enabled but the 'h2' package is missing, falling back to HTTP/1.1")
+                http2 = False
+
+        # SSL verification stays disabled to avoid common local proxy cert issues
+        return httpx.AsyncClient(
+            base_url=settings.GEMINI_API_BASE,
+            http2=http2,
+            verify=False,
+            limits=limits,
+            timeout=timeout,
+            transport=self._transport,
+        )
+
+    async def start(self):
+        """Open the shared client (called from the application lifespan)"""
+        if self._client is None:
+            self._client = self._build_client()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(settings.AI_MAX_CONCURRENCY)
+
+    async def close(self):
+        """Close the shared client and release pooled connections"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._semaphore = None
+
+    async def _ensure_started(self) -> httpx.AsyncClient:
+        # Lazily start when used outside the lifespan (scripts, direct calls)
+        if self._client is None or self._semaphore is None:
+            await self.start()
+        return self._client
+
+    @staticmethod
+    def _model_path(model: str, method: str) -> str:
+        return f"/models/{model}:{method}"
+
+    async def generate_content(self, model: str, payload: dict, api_key: str) -> dict:
+        """Call `generateContent` and return the decoded JSON body"""
+        client = await self._ensure_started()
+        async with self._semaphore:
+            response = await client.post(
+                self._model_path(model, "generateContent"),
+                json=payload,
+                headers={"x-goog-api-key": api_key},
+            )
+            response.raise_for_status()
+            return response.json()
+
+    async def stream_generate_content(self, model: str, payload: dict, api_key: str) -> AsyncIterator[str]:
+        """Call `streamGenerateContent` (SSE mode) and yield text parts as they arrive"""
+        client = await self._ensure_started()
+        async with self._semaphore:
+            async with client.stream(
+                "POST",
+                self._model_path(model, "streamGenerateContent"),
+                params={"alt": "sse"},
+                json=payload,
+                headers={"x-goog-api-key": api_key},
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if not data:
+                        continue
+                    chunk = json.loads(data)
+                    for candidate in chunk.get("candidates", [])[:1]:
+                        for part in candidate.get("content", {}).get("parts", []):
+                            text = part.get("text")
+                            if text:
+                                yield text
+
+
+gemini_client = GeminiClient()
@@ -0,0 +1,199 @@
+"""
+Payment plan due/overdue sweep
+
+Moves open installments to DUE once they enter the reminder window and to
+OVERDUE once their due date has passed, and keeps one CONTRACT_REMINDER todo
+per installment (source_id = plan id) for the contract owner.
+
+The sweep is set based: the candidate rows are exactly the open installments
+whose `due_at` crossed a boundary, found by a range scan on the
+(status, due_at) index, so each run costs time proportional to the rows that
+change rather than to the size of the table.
+"""
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+from uuid import UUID
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models.contract import Contract, ContractPaymentPlan, PaymentDirection, PaymentPlanStatus
+from app.models.iam import OurEntity
+from app.models.project import Project
+from app.models.todo import TodoItem, TodoSourceType, TodoActionType, TodoPriority, TodoStatus
+
+# Chunk size for IN (...) lists
+SWEEP_BATCH_SIZE = 500
+
+OPEN_TODO_STATUSES = (TodoStatus.OPEN, TodoStatus.IN_PROGRESS, TodoStatus.BLOCKED)
+
+
+def _chunks(items: List, size: int = SWEEP_BATCH_SIZE) -> Iterable[List]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _transition(session: Session, ids: List[UUID], from_statuses, to_status: PaymentPlanStatus, now: datetime) -> int:
+    changed = 0
+    for batch in _chunks(ids):
+        result = session.execute(
+            update(ContractPaymentPlan)
+            .where(ContractPaymentPlan.id.in_(batch))
+            .where(ContractPaymentPlan.status.in_(from_statuses))
+            .values(status=to_status, updated_at=now)
+        )
+        changed += result.rowcount
+    return changed
+
+
+# ─── Reminder todos ──────────────────────────────────────────────────────────
+
+def _reminder_title(contract_name: str, plan_name: str, direction: PaymentDirection,
+                    is_final: bool, due_at: Optional[datetime]) -> str:
+    if is_final:
+        label = "尾款提醒"
+    elif direction == PaymentDirection.RECEIVABLE:
+        label = "收款提醒"
+    else:
+        label = "付款提醒"
+    due_text = due_at.strftime("%Y-%m-%d") if due_at else "-"
+    return f"【{label}】{contract_name} {plan_name} 将于 {due_text} 到期"
+
+
+def upsert_plan_reminders(session: Session, plan_ids: List[UUID], now: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Create or refresh CONTRACT_REMINDER todos for the given installments, without committing.
+
+    Keyed on (source_type, source_id=plan id): existing open reminders are
+    updated in place, closed ones are left alone, missing ones are inserted.
+    """
+    now = now or datetime.utcnow()
+    created = updated = 0
+    default_entity_id = None
+
+    for batch in _chunks(plan_ids):
+        plans = session.exec(
+            select(
+                ContractPaymentPlan.id, ContractPaymentPlan.name, ContractPaymentPlan.direction,
+                ContractPaymentPlan.is_final, ContractPaymentPlan.due_at, ContractPaymentPlan.status,
+                Contract.id, Contract.name, Contract.owner_user_id, Project.our_entity_id
+            )
+            .join(Contract, Contract.id == ContractPaymentPlan.contract_id)
+            .outerjoin(Project, Project.contract_id == Contract.id)
+            .where(ContractPaymentPlan.id.in_(batch))
+        ).all()
+
+        existing = {
+            source_id: (todo_id, status)
+            for todo_id, source_id, status in session.exec(
+                select(TodoItem.id, TodoItem.source_id, TodoItem.status)
+                .where(TodoItem.source_type == TodoSourceType.CONTRACT_REMINDER)
+                .where(TodoItem.source_id.in_([str(plan_id) for plan_id in batch]))
+            ).all()
+        }
+
+        refreshed = []
+        seen = set()
+        for (plan_id, plan_name, direction, is_final, due_at, plan_status,
+             contract_id, contract_name, owner_user_id, our_entity_id) in plans:
+            source_id = str(plan_id)
+            if source_id in seen:
+                continue  # Several projects on one contract
+            seen.add(source_id)
+
+            title = _reminder_title(contract_name, plan_name, direction, is_final, due_at)
+            priority = TodoPriority.P1 if plan_status == PaymentPlanStatus.OVERDUE else TodoPriority.P2
+
+            if source_id in existing:
+                todo_id, todo_status = existing[source_id]
+                if todo_status in OPEN_TODO_STATUSES:
+                    refreshed.append({"id": todo_id, "title": title, "priority": priority,
+                                      "due_at": due_at, "updated_at": now})
+                continue
+
+            if our_entity_id is None:
+                if default_entity_id is None:
+                    default_entity_id = session.exec(select(OurEntity.id)).first()
+                our_entity_id = default_entity_id
+            if our_entity_id is None:
+                print(f"⚠️  No entity available for payment reminder of plan {plan_id}, skipped")
+                continue
+
+            session.add(TodoItem(
+                our_entity_id=our_entity_id,
+                assignee_user_id=owner_user_id,
+                creator_user_id=owner_user_id,
+                title=title,
+                source_type=TodoSourceType.CONTRACT_REMINDER,
+                source_id=source_id,
+                action_type=TodoActionType.DO,
+                priority=priority,
+                status=TodoStatus.OPEN,
+                due_at=due_at,
+                link={"type": "contract", "contract_id": str(contract_id), "payment_plan_id": source_id},
+            ))
+            created += 1
+
+        if refreshed:
+            session.execute(update(TodoItem), refreshed)
+            updated += len(refreshed)
+
+    return {"created": created, "updated": updated}
+
+
+def close_plan_reminders(session: Session, plan_ids: List[UUID], now: Optional[datetime] = None) -> int:
+    """Mark open reminder todos of completed installments as done, without committing"""
+    now = now or datetime.utcnow()
+    closed = 0
+    for batch in _chunks(plan_ids):
+        result = session.execute(
+            update(TodoItem)
+            .where(TodoItem.source_type == TodoSourceType.CONTRACT_REMINDER)
+            .where(TodoItem.source_id.in_([str(plan_id) for plan_id in batch]))
+            .where(TodoItem.status.in_(OPEN_TODO_STATUSES))
+            .values(status=TodoStatus.DONE, done_at=now, updated_at=now)
+        )
+        closed += result.rowcount
+    return closed
+
+
+# ─── Sweep ───────────────────────────────────────────────────────────────────
+
+def sweep_payment_plans(session: Session, now: Optional[datetime] = None) -> Dict[str, int]:
+    """Apply due/overdue transitions and upsert their reminders, without committing"""
+    now = now or datetime.utcnow()
+    window_end = now + timedelta(days=settings.PAYMENT_DUE_WINDOW_DAYS)
+
+    # PENDING/DUE -> OVERDUE: due date already passed
+    overdue_ids = list(session.exec(
+        select(ContractPaymentPlan.id)
+        .where(ContractPaymentPlan.status.in_((PaymentPlanStatus.PENDING, PaymentPlanStatus.DUE)))
+        .where(ContractPaymentPlan.due_at < now)
+    ).all())
+
+    # PENDING -> DUE: due date inside the reminder window
+    due_ids = list(session.exec(
+        select(ContractPaymentPlan.id)
+        .where(ContractPaymentPlan.status == PaymentPlanStatus.PENDING)
+        .where(ContractPaymentPlan.due_at >= now)
+        .where(ContractPaymentPlan.due_at < window_end)
+    ).all())
+
+    overdue = _transition(session, overdue_ids, (PaymentPlanStatus.PENDING, PaymentPlanStatus.DUE),
+                          PaymentPlanStatus.OVERDUE, now)
+    due = _transition(session, due_ids, (PaymentPlanStatus.PENDING,), PaymentPlanStatus.DUE, now)
+
+    reminders = upsert_plan_reminders(session, overdue_ids + due_ids, now)
+    return {"overdue": overdue, "due": due, **reminders}
+
+
+def run_payment_plan_sweep():
+    """Scheduler job: sweep in its own session and commit"""
+    with Session(engine) as session:
+        result = sweep_payment_plans(session)
+        session.commit()
+    if any(result.values()):
+        print(f"⏰ Payment plan sweep: {result}")
+    return result
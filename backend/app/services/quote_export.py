@@ -0,0 +1,293 @@
+"""
+Quote (报价单) Excel export
+
+The workbook is built with openpyxl's write-only mode: every row is serialized
+as soon as it is appended, so memory stays flat no matter how long the feature
+list is. Cell styles are attached per cell through `WriteOnlyCell` and merged
+ranges are registered up front, because write-only sheets cannot be revisited.
+"""
+import math
+from typing import IO, Any, Dict, List, Optional, Sequence
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+from openpyxl.utils import get_column_letter
+
+# ─── Shared Styles ────────────────────────────────────────────────────────────
+header_fill = PatternFill(start_color="1F497D", end_color="1F497D", fill_type="solid")
+subtotal_fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
+total_fill = PatternFill(start_color="FFF2CC", end_color="FFF2CC", fill_type="solid")
+hours_fill = PatternFill(start_color="E2EFDA", end_color="E2EFDA", fill_type="solid")
+note_fill = PatternFill(start_color="F2F2F2", end_color="F2F2F2", fill_type="solid")
+white_font = Font(color="FFFFFF", bold=True)
+red_font = Font(color="C00000", bold=True)
+bold_font = Font(bold=True)
+bold_italic = Font(bold=True, italic=True)
+center_align = Alignment(horizontal="center", vertical="center", wrap_text=True)
+left_align = Alignment(horizontal="left", vertical="center", wrap_text=True)
+right_align = Alignment(horizontal="right", vertical="center")
+top_left_align = Alignment(horizontal="left", vertical="top", wrap_text=True)
+
+thin_border = Border(
+    left=Side(style='thin'),
+    right=Side(style='thin'),
+    top=Side(style='thin'),
+    bottom=Side(style='thin')
+)
+
+CHINESE_NUMS = ["一", "二", "三", "四", "五", "六", "七", "八", "九", "十",
+                "十一", "十二", "十三", "十四", "十五", "十六", "十七", "十八", "十九", "二十"]
+
+COL_COUNT = 8  # 序号,服务内容,规格,单位,产品总价,折扣率,折后价,备注
+FEATURE_COL_COUNT = 10
+
+
+class _SheetWriter:
+    """Row-at-a-time writer over a write-only worksheet"""
+
+    def __init__(self, ws, widths: Sequence[float]):
+        self.ws = ws
+        self.row = 0
+        # Column widths must be set before the first row is written
+        for ci, width in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(ci)].width = width
+
+    def cell(self, value: Any = None, font=None, fill=None, alignment=None, border=None) -> WriteOnlyCell:
+        c = WriteOnlyCell(self.ws, value=value)
+        if font is not None:
+            c.font = font
+        if fill is not None:
+            c.fill = fill
+        if alignment is not None:
+            c.alignment = alignment
+        if border is not None:
+            c.border = border
+        return c
+
+    def merge(self, start_col: int, end_col: int, row_span: int = 1):
+        first = self.row + 1
+        self.ws.merged_cells.add(
+            f"{get_column_letter(start_col)}{first}:{get_column_letter(end_col)}{first + row_span - 1}"
+        )
+
+    def append(self, cells: List[Any], height: Optional[float] = None):
+        self.row += 1
+        if height is not None:
+            self.ws.row_dimensions[self.row].height = height
+        self.ws.append(cells)
+
+
+def _float_or_none(value) -> Optional[float]:
+    return float(value) if value else None
+
+
+def _write_quote_sheet(w: _SheetWriter, project_name: str, rows: list, notes: list,
+                       total_price, total_final, final_confirmed, feature_list: list):
+    # Row 1: Title (styled same as feature list)
+    w.merge(1, COL_COUNT)
+    w.append([w.cell(f"{project_name}项目报价", font=white_font, fill=header_fill, alignment=center_align)])
+
+    # Row 2: Unit note (right-aligned, plain)
+    w.merge(1, 7)
+    w.append([None] * 7 + [w.cell("单位：人民币（元）", font=Font(size=9, color="666666"), alignment=right_align)])
+
+    # Row 3: Headers (dark blue)
+    headers = ["序号", "服务内容", "规格", "单位", "产品总价", "折扣率(%)", "折后价", "备注"]
+    w.append([w.cell(h, font=white_font, fill=header_fill, alignment=center_align, border=thin_border)
+              for h in headers])
+
+    chinese_counter = 0
+    for row in rows:
+        if row.get("is_subtotal"):
+            w.merge(1, 4)
+            cells = [w.cell(row.get("subtotal_label", "小计"), font=bold_italic, fill=subtotal_fill,
+                            alignment=center_align, border=thin_border)]
+            cells += [w.cell(fill=subtotal_fill, border=thin_border) for _ in range(3)]
+            for ci, val in enumerate([row.get("total_price", ""), "", row.get("final_price", ""), ""], 5):
+                cells.append(w.cell(val if val != "" else None, font=bold_italic, fill=subtotal_fill,
+                                    alignment=right_align if ci in (5, 7) else center_align,
+                                    border=thin_border))
+            w.append(cells)
+        else:
+            chinese_counter += 1
+            label = CHINESE_NUMS[chinese_counter - 1] if chinese_counter <= len(CHINESE_NUMS) else str(chinese_counter)
+            values = [
+                label,
+                row.get("name", ""),
+                row.get("spec", ""),
+                row.get("unit", ""),
+                _float_or_none(row.get("total_price", "")),
+                row.get("discount", ""),
+                _float_or_none(row.get("final_price", "")),
+                row.get("remark", "")
+            ]
+            cells = []
+            for ci, val in enumerate(values, 1):
+                if ci in (5, 7):
+                    alignment = right_align
+                elif ci == 2:
+                    alignment = left_align
+                else:
+                    alignment = center_align
+                cells.append(w.cell(val, alignment=alignment, border=thin_border))
+            w.append(cells)
+
+    def total_row(label: str, price_cells: Dict[int, Any]):
+        w.merge(1, 4)
+        cells = [w.cell(label, font=red_font, fill=total_fill, alignment=center_align, border=thin_border)]
+        for ci in range(2, COL_COUNT + 1):
+            if ci in price_cells:
+                cells.append(w.cell(price_cells[ci], font=red_font, fill=total_fill,
+                                    alignment=right_align, border=thin_border))
+            else:
+                cells.append(w.cell(fill=total_fill, border=thin_border))
+        w.append(cells)
+
+    # 总计 row
+    total_row("总计", {5: _float_or_none(total_price), 7: _float_or_none(total_final)})
+
+    # 最终确认 row
+    try:
+        confirmed_val = float(final_confirmed) if final_confirmed != "" else None
+    except (ValueError, TypeError):
+        confirmed_val = None
+    total_row("最终确认", {7: confirmed_val})
+
+    # ─── Work Hours Section (computed from feature_list) ──────────────────────
+    totals = {"dev_backend": 0.0, "dev_frontend": 0.0, "dev_ui": 0.0, "dev_product": 0.0}
+    for f in feature_list:
+        for key in totals:
+            try:
+                totals[key] += float(f.get(key, 0) or 0)
+            except (ValueError, TypeError):
+                pass
+
+    total_dev = sum(totals.values())
+    test_hrs = math.ceil(total_dev * 0.1)
+    mgmt_hrs = math.ceil(total_dev * 0.1)
+
+    # Header for work hours section
+    w.merge(1, COL_COUNT)
+    w.append([w.cell("工时明细", font=white_font, fill=header_fill, alignment=center_align, border=thin_border)])
+
+    # Sub-header row
+    w.merge(1, 4)
+    w.append(
+        [w.cell("工时类别", font=white_font, fill=header_fill, alignment=center_align, border=thin_border),
+         None, None, None]
+        + [w.cell(h, font=white_font, fill=header_fill, alignment=center_align, border=thin_border)
+           for h in ["后端开发(天)", "前端开发(天)", "UI设计(天)", "产品规划(天)"]]
+    )
+
+    # 开发工时
+    w.merge(1, 4)
+    w.append(
+        [w.cell("开发工时", fill=hours_fill, alignment=center_align, border=thin_border)]
+        + [w.cell(fill=hours_fill, border=thin_border) for _ in range(3)]
+        + [w.cell(totals[key] or None, fill=hours_fill, alignment=center_align, border=thin_border)
+           for key in ("dev_backend", "dev_frontend", "dev_ui", "dev_product")]
+    )
+
+    def merged_hours_row(label: str, value, fill, font=None):
+        w.merge(1, 4)
+        w.merge(5, COL_COUNT)
+        cells = [w.cell(label, font=font, fill=fill, alignment=center_align, border=thin_border)]
+        cells += [w.cell(fill=fill, border=thin_border) for _ in range(3)]
+        cells.append(w.cell(value if value else None, font=font, fill=fill,
+                            alignment=center_align, border=thin_border))
+        cells += [w.cell(fill=fill, border=thin_border) for _ in range(COL_COUNT - 5)]
+        w.append(cells)
+
+    # 测试工时 / 管理工时 rows (merged cols 5-8)
+    merged_hours_row("测试工时 (开发合计×10%，向上取整)", test_hrs, hours_fill)
+    merged_hours_row("管理工时 (开发合计×10%，向上取整)", mgmt_hrs, hours_fill)
+
+    # 合计工时 row
+    merged_hours_row("合计工时", total_dev + test_hrs + mgmt_hrs, total_fill, font=bold_font)
+    w.append([])
+
+    # 备注 section
+    if notes:
+        w.merge(1, COL_COUNT)
+        w.append([w.cell("备注", font=bold_font, fill=note_fill, alignment=left_align, border=thin_border)])
+
+        notes_text = "\n".join(f"{i+1}、{n}" for i, n in enumerate(notes))
+        w.merge(1, COL_COUNT, row_span=max(len(notes), 3))
+        w.append([w.cell(notes_text, alignment=top_left_align, border=thin_border)],
+                 height=max(15 * len(notes), 60))
+
+
+def _write_feature_sheet(w: _SheetWriter, project_name: str, feature_list: list):
+    w.merge(1, FEATURE_COL_COUNT)
+    w.append([w.cell(f"{project_name}功能清单", font=white_font, fill=header_fill, alignment=center_align)])
+
+    headers2 = ["序号", "产品", "板块", "一级功能", "二级功能", "新增功能说明", "后端开发", "前端开发", "UI设计", "产品规划"]
+    w.append([w.cell(h, font=white_font, fill=header_fill, alignment=center_align, border=thin_border)
+              for h in headers2])
+
+    for f in feature_list:
+        cells = [w.cell(f.get(key, ""), alignment=center_align, border=thin_border)
+                 for key in ["index", "product", "module", "l1_feature", "l2_feature", "description"]]
+        for key in ["dev_backend", "dev_frontend", "dev_ui", "dev_product"]:
+            val = f.get(key, "")
+            try:
+                val = float(val) if val else None
+            except (ValueError, TypeError):
+                pass
+            cells.append(w.cell(val, alignment=center_align, border=thin_border))
+        w.append(cells)
+    feat_data_end = w.row
+
+    # Footer rows matching feature list export
+    def feat_footer(label: str, fg, fh=None, fi=None, fj=None, merge_hours: bool = False):
+        w.merge(1, 6)
+        if merge_hours:
+            w.merge(7, FEATURE_COL_COUNT)
+        cells = [w.cell(label, alignment=center_align, border=thin_border)]
+        cells += [w.cell(border=thin_border) for _ in range(5)]
+        for val in (fg, fh, fi, fj):
+            cells.append(w.cell(val, alignment=center_align if val else None, border=thin_border))
+        w.append(cells)
+
+    dev_row = feat_data_end + 1
+    feat_footer("系统开发工时",
+                f"=SUM(G3:G{feat_data_end})",
+                f"=SUM(H3:H{feat_data_end})",
+                f"=SUM(I3:I{feat_data_end})",
+                f"=SUM(J3:J{feat_data_end})")
+    test_row = dev_row + 1
+    feat_footer("系统测试工时", f"=ROUNDUP(SUM(G{dev_row}:J{dev_row})*0.1,0)", merge_hours=True)
+    mgmt_row = dev_row + 2
+    feat_footer("项目管理工时", f"=ROUNDUP(SUM(G{dev_row}:J{dev_row})*0.1,0)", merge_hours=True)
+    feat_footer("总计工时", f"=SUM(G{dev_row}:J{dev_row})+G{test_row}+G{mgmt_row}", merge_hours=True)
+
+
+def write_quote_workbook(payload: Dict[str, Any], fp: IO[bytes]):
+    """
+    Write a 2-sheet styled Excel to `fp`: Sheet1=报价单, Sheet2=功能清单
+    Payload: { project_name, rows, notes, total_price, total_final, final_confirmed, feature_list }
+    """
+    project_name = payload.get("project_name", "项目")
+    feature_list = payload.get("feature_list", [])
+
+    wb = Workbook(write_only=True)
+
+    ws1 = wb.create_sheet(title="报价单")
+    _write_quote_sheet(
+        _SheetWriter(ws1, [8, 30, 8, 8, 14, 12, 14, 30]),
+        project_name,
+        payload.get("rows", []),
+        payload.get("notes", []),
+        payload.get("total_price", 0),
+        payload.get("total_final", 0),
+        payload.get("final_confirmed", ""),
+        feature_list,
+    )
+
+    if feature_list:
+        ws2 = wb.create_sheet(title="功能清单")
+        _write_feature_sheet(_SheetWriter(ws2, [8, 15, 15, 20, 20, 50, 12, 12, 12, 12]),
+                             project_name, feature_list)
+
+    wb.save(fp)
@@ -0,0 +1,58 @@
+"""
+Push events for todos and notifications
+
+Events go to the per-user channel "user:<id>" and are only published once the
+change has committed:
+
+- todo.created / todo.updated / todo.deleted carry the changed todo fields to
+  its assignee and creator, for every code path that writes todos (post-commit
+  hooks), so open boards apply deltas instead of polling /todo/my.
+- notification is queued by the todo handlers for the recipient of each
+  in-app NotificationLog (the assignee's manager, the creator asked to review).
+"""
+from datetime import datetime
+from typing import Optional
+from uuid import UUID
+
+from fastapi.encoders import jsonable_encoder
+from sqlmodel import Session
+
+from app.core.events import call_after_commit, on_commit
+from app.core.pubsub import broker
+from app.models.todo import TodoItem
+
+TODO_EVENT_FIELDS = (
+    "id", "title", "status", "priority", "source_type", "due_at",
+    "assignee_user_id", "creator_user_id", "tags", "updated_at",
+)
+
+TODO_EVENT_TYPES = {"insert": "todo.created", "update": "todo.updated", "delete": "todo.deleted"}
+
+
+def user_channel(user_id: UUID) -> str:
+    return f"user:{user_id}"
+
+
+def push_to_user(user_id: UUID, event_type: str, data: Optional[dict] = None):
+    """Publish an event to every open connection of a user (any worker with the redis backend)"""
+    broker.publish(user_channel(user_id), jsonable_encoder({
+        "type": event_type,
+        "data": data or {},
+        "at": datetime.utcnow(),
+    }))
+
+
+def push_after_commit(session: Session, user_id: UUID, event_type: str, data: Optional[dict] = None):
+    """Publish once the session's transaction commits, nothing if it rolls back"""
+    call_after_commit(session, lambda: push_to_user(user_id, event_type, data))
+
+
+def _push_todo_changes(changes):
+    for action, values in changes:
+        data = {name: values.get(name) for name in TODO_EVENT_FIELDS}
+        for user_id in {values.get("assignee_user_id"), values.get("creator_user_id")}:
+            if user_id:
+                push_to_user(user_id, TODO_EVENT_TYPES[action], data)
+
+
+on_commit(TodoItem, _push_todo_changes)
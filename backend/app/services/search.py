@@ -0,0 +1,377 @@
+"""
+Full-text search over contracts, projects, counterparties and todos
+
+Every searchable record is mirrored into `search_document` (title + body text,
+one row per record). The text index sits next to it:
+
+- SQLite: an FTS5 table `search_fts` whose rowid is the document id. The
+  unicode61 tokenizer does not segment Chinese, so CJK runs are indexed as
+  overlapping bigrams ("小程序" -> "小程 程序") and queries are rewritten to
+  the same bigram phrases. Ranked with bm25, title weighted above body.
+- MySQL: a FULLTEXT index WITH PARSER ngram on (title, body), which performs
+  the same bigram segmentation server side. Ranked by MATCH ... AGAINST.
+- Other databases fall back to LIKE matching without ranking.
+
+Documents are kept in sync by mapper write hooks (after insert / update /
+delete). They run on the flush connection, so the index commits or rolls back
+together with the change itself. Core bulk writes bypass the hooks; use
+`rebuild_search_index` after those.
+"""
+import re
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import column, delete, event, insert, inspect, literal_column, or_, table, text, update
+from sqlalchemy import select as sa_select
+from sqlalchemy.dialects.mysql import match as mysql_match
+from sqlmodel import Session, select, func
+
+from app.core.database import engine
+from app.core.exceptions import ValidationException
+from app.models.contract import Contract, Counterparty
+from app.models.project import Project
+from app.models.shared import SearchDocument
+from app.models.todo import TodoItem
+
+SEARCH_BATCH_SIZE = 500
+
+# bm25 column weights (title, body)
+TITLE_WEIGHT = 10.0
+BODY_WEIGHT = 1.0
+
+SNIPPET_WIDTH = 80
+
+CJK_CHARS = r"\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+CJK_PATTERN = re.compile(f"[{CJK_CHARS}]+")
+QUERY_TOKEN_PATTERN = re.compile(f"[{CJK_CHARS}]+|[^\\W{CJK_CHARS}]+")
+
+FTS_TABLE = "search_fts"
+MYSQL_FULLTEXT_INDEX = "ft_search_document"
+
+
+class SearchSource:
+    """How a model maps onto a search document"""
+    __slots__ = ("kind", "model", "title_field", "body_fields", "entity_field", "user_fields")
+
+    def __init__(self, kind: str, model, title_field: str, body_fields: Tuple[str, ...],
+                 entity_field: Optional[str] = None, user_fields: Tuple[str, ...] = ()):
+        self.kind = kind
+        self.model = model
+        self.title_field = title_field
+        self.body_fields = body_fields
+        self.entity_field = entity_field
+        self.user_fields = user_fields  # (assignee, creator) for visibility checks
+
+    @property
+    def fields(self) -> List[str]:
+        names = [self.title_field, *self.body_fields, self.entity_field, *self.user_fields]
+        return [name for name in names if name]
+
+
+SEARCH_SOURCES: Dict[str, SearchSource] = {
+    "contract": SearchSource("contract", Contract, "name", ("summary", "content_doc")),
+    "project": SearchSource("project", Project, "name", ("description",), entity_field="our_entity_id"),
+    "counterparty": SearchSource("counterparty", Counterparty, "name", ("identifier",)),
+    "todo": SearchSource("todo", TodoItem, "title", ("description",), entity_field="our_entity_id",
+                         user_fields=("assignee_user_id", "creator_user_id")),
+}
+
+_SOURCE_BY_MODEL = {source.model: source for source in SEARCH_SOURCES.values()}
+
+# Write hooks stay idle until init_search_index has created the text index
+_hooks_enabled = False
+
+
+# ─── Tokenization ────────────────────────────────────────────────────────────
+
+def _bigrams(run: str) -> List[str]:
+    if len(run) == 1:
+        return [run]
+    return [run[i:i + 2] for i in range(len(run) - 1)]
+
+
+def index_text(value: Optional[str]) -> str:
+    """Text as stored in the FTS5 index: CJK runs replaced by their bigrams"""
+    if not value:
+        return ""
+    return CJK_PATTERN.sub(lambda m: " " + " ".join(_bigrams(m.group())) + " ", value)
+
+
+def query_tokens(q: str) -> List[str]:
+    """CJK runs and words of a user query, lowercased; punctuation and operators dropped"""
+    return QUERY_TOKEN_PATTERN.findall((q or "").lower())
+
+
+def fts_query(tokens: List[str]) -> str:
+    """FTS5 MATCH expression: every token required, CJK as bigram phrases, words as prefixes"""
+    terms = []
+    for token in tokens:
+        if CJK_PATTERN.fullmatch(token) and len(token) > 1:
+            terms.append('"' + " ".join(_bigrams(token)) + '"')
+        else:
+            # Single CJK characters only exist as the first half of bigrams
+            terms.append(f'"{token}"*')
+    return " ".join(terms)
+
+
+def mysql_boolean_query(tokens: List[str]) -> str:
+    return " ".join(f'+"{token}"' if CJK_PATTERN.fullmatch(token) else f"+{token}*" for token in tokens)
+
+
+# ─── Documents ───────────────────────────────────────────────────────────────
+
+def _document(source: SearchSource, record) -> dict:
+    """search_document row for a model instance or a row mapping"""
+    get = record.get if isinstance(record, dict) else lambda name: getattr(record, name)
+    body = "\n".join(str(value) for value in (get(name) for name in source.body_fields) if value)
+    assignee_id, creator_id = (get(name) for name in source.user_fields) if source.user_fields else (None, None)
+    return {
+        "kind": source.kind,
+        "ref_id": get("id"),
+        "our_entity_id": get(source.entity_field) if source.entity_field else None,
+        "assignee_user_id": assignee_id,
+        "creator_user_id": creator_id,
+        "title": get(source.title_field) or "",
+        "body": body or None,
+    }
+
+
+def _uses_fts(connection) -> bool:
+    return connection.dialect.name == "sqlite"
+
+
+def _document_id(connection, kind: str, ref_id: UUID) -> Optional[int]:
+    documents = SearchDocument.__table__
+    return connection.execute(
+        sa_select(documents.c.id).where(documents.c.kind == kind).where(documents.c.ref_id == ref_id)
+    ).scalar()
+
+
+def _fts_rows(documents: List[dict]) -> List[dict]:
+    return [
+        {"rowid": doc["id"], "title": index_text(doc["title"]), "body": index_text(doc["body"])}
+        for doc in documents
+    ]
+
+
+def _write_fts(connection, documents: List[dict]):
+    connection.execute(
+        text(f"INSERT INTO {FTS_TABLE} (rowid, title, body) VALUES (:rowid, :title, :body)"),
+        _fts_rows(documents)
+    )
+
+
+def upsert_document(connection, doc: dict, now: Optional[datetime] = None):
+    """Insert or replace one document and its text index entry"""
+    now = now or datetime.utcnow()
+    documents = SearchDocument.__table__
+    doc_id = _document_id(connection, doc["kind"], doc["ref_id"])
+    if doc_id is None:
+        result = connection.execute(insert(documents).values(created_at=now, updated_at=now, **doc))
+        doc_id = result.inserted_primary_key[0]
+    else:
+        connection.execute(update(documents).where(documents.c.id == doc_id).values(updated_at=now, **doc))
+        if _uses_fts(connection):
+            connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :rowid"), {"rowid": doc_id})
+    if _uses_fts(connection):
+        _write_fts(connection, [{**doc, "id": doc_id}])
+
+
+def delete_document(connection, kind: str, ref_id: UUID):
+    doc_id = _document_id(connection, kind, ref_id)
+    if doc_id is None:
+        return
+    if _uses_fts(connection):
+        connection.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid = :rowid"), {"rowid": doc_id})
+    connection.execute(delete(SearchDocument.__table__).where(SearchDocument.__table__.c.id == doc_id))
+
+
+# ─── Write hooks ─────────────────────────────────────────────────────────────
+
+def _after_insert(mapper, connection, target):
+    if _hooks_enabled:
+        upsert_document(connection, _document(_SOURCE_BY_MODEL[mapper.class_], target))
+
+
+def _after_update(mapper, connection, target):
+    if not _hooks_enabled:
+        return
+    source = _SOURCE_BY_MODEL[mapper.class_]
+    state = inspect(target)
+    # Status / amount updates do not touch the index
+    if any(state.attrs[name].history.has_changes() for name in source.fields):
+        upsert_document(connection, _document(source, target))
+
+
+def _after_delete(mapper, connection, target):
+    if _hooks_enabled:
+        delete_document(connection, _SOURCE_BY_MODEL[mapper.class_].kind, target.id)
+
+
+for _source in SEARCH_SOURCES.values():
+    event.listen(_source.model, "after_insert", _after_insert)
+    event.listen(_source.model, "after_update", _after_update)
+    event.listen(_source.model, "after_delete", _after_delete)
+
+
+# ─── Index maintenance ───────────────────────────────────────────────────────
+
+def _insert_documents(session: Session, documents: List[dict]):
+    session.execute(insert(SearchDocument), documents)
+    connection = session.connection()
+    if _uses_fts(connection):
+        _write_fts(connection, documents)
+
+
+def rebuild_search_index(session: Session) -> int:
+    """Re-index every source record in keyset-paginated batches, without committing"""
+    connection = session.connection()
+    if _uses_fts(connection):
+        connection.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    session.execute(delete(SearchDocument))
+
+    now = datetime.utcnow()
+    next_id = 1
+    for source in SEARCH_SOURCES.values():
+        model_id = source.model.id
+        columns = [model_id] + [getattr(source.model, name) for name in source.fields]
+        last_id = None
+        while True:
+            query = select(*columns).order_by(model_id).limit(SEARCH_BATCH_SIZE)
+            if last_id is not None:
+                query = query.where(model_id > last_id)
+            rows = session.exec(query).all()
+            if not rows:
+                break
+            documents = []
+            for row in rows:
+                doc = _document(source, dict(row._mapping))
+                doc.update(id=next_id, created_at=now, updated_at=now)
+                documents.append(doc)
+                next_id += 1
+            _insert_documents(session, documents)
+            last_id = rows[-1][0]
+    return next_id - 1
+
+
+def _create_text_index(session: Session):
+    connection = session.connection()
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        connection.execute(text(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} "
+            "USING fts5(title, body, tokenize='unicode61 remove_diacritics 2')"
+        ))
+    elif dialect == "mysql":
+        exists = connection.execute(text(
+            "SELECT COUNT(*) FROM information_schema.statistics "
+            "WHERE table_schema = DATABASE() AND table_name = 'search_document' AND index_name = :name"
+        ), {"name": MYSQL_FULLTEXT_INDEX}).scalar()
+        if not exists:
+            connection.execute(text(
+                f"ALTER TABLE search_document ADD FULLTEXT INDEX {MYSQL_FULLTEXT_INDEX} (title, body) WITH PARSER ngram"
+            ))
+
+
+def init_search_index():
+    """Create the text index, build it once for existing data, then enable the write hooks"""
+    global _hooks_enabled
+    with Session(engine) as session:
+        _create_text_index(session)
+        built = None
+        if not session.exec(select(SearchDocument.id).limit(1)).first():
+            if any(session.exec(select(source.model.id).limit(1)).first() for source in SEARCH_SOURCES.values()):
+                built = rebuild_search_index(session)
+        session.commit()
+    _hooks_enabled = True
+    if built:
+        print(f"🔎 Search index built: {built} documents")
+
+
+# ─── Queries ─────────────────────────────────────────────────────────────────
+
+def parse_kinds(kinds: Optional[str]) -> List[str]:
+    names = [k.strip() for k in (kinds or "").split(",") if k.strip()]
+    invalid = [k for k in names if k not in SEARCH_SOURCES]
+    if invalid:
+        raise ValidationException(f"不支持的搜索类型: {', '.join(invalid)}")
+    return list(dict.fromkeys(names))
+
+
+def _snippet(body: Optional[str], tokens: List[str]) -> Optional[str]:
+    """Window of the body around the first query term"""
+    if not body:
+        return None
+    lower = body.lower()
+    positions = [p for p in (lower.find(token) for token in tokens) if p >= 0]
+    start = max(min(positions) - SNIPPET_WIDTH // 4, 0) if positions else 0
+    end = start + SNIPPET_WIDTH
+    snippet = " ".join(body[start:end].split())
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(body) else "")
+
+
+def search_documents(
+    session: Session,
+    q: str,
+    kinds: Optional[List[str]] = None,
+    user_id: Optional[UUID] = None,
+    visible_assignee_ids: Optional[List[UUID]] = None,
+    page: int = 1,
+    page_size: int = 20
+) -> Tuple[List[dict], int]:
+    """
+    Ranked, paginated search. Returns (items, total).
+
+    Todos are only returned when `user_id` created them or they are assigned
+    to one of `visible_assignee_ids` (the user and their direct reports).
+    """
+    tokens = query_tokens(q)
+    if not tokens:
+        raise ValidationException("搜索关键词不能为空")
+
+    dialect = session.get_bind().dialect.name
+    query = select(SearchDocument.kind, SearchDocument.ref_id, SearchDocument.title, SearchDocument.body)
+    if dialect == "sqlite":
+        fts = table(FTS_TABLE, column("rowid"))
+        fts_ref = literal_column(FTS_TABLE)
+        score = func.bm25(fts_ref, TITLE_WEIGHT, BODY_WEIGHT)
+        query = (
+            query.add_columns(score.label("score"))
+            .join(fts, fts.c.rowid == SearchDocument.id)
+            .where(fts_ref.op("MATCH")(fts_query(tokens)))
+        )
+        order_by = [score, SearchDocument.id]  # bm25: lower is better
+    elif dialect == "mysql":
+        score = mysql_match(SearchDocument.title, SearchDocument.body, against=mysql_boolean_query(tokens)).in_boolean_mode()
+        query = query.add_columns(score.label("score")).where(score > 0)
+        order_by = [score.desc(), SearchDocument.id]
+    else:
+        for token in tokens:
+            pattern = f"%{token}%"
+            query = query.where(or_(SearchDocument.title.ilike(pattern), SearchDocument.body.ilike(pattern)))
+        query = query.add_columns(literal_column("0").label("score"))
+        order_by = [SearchDocument.updated_at.desc(), SearchDocument.id]
+
+    if kinds:
+        query = query.where(SearchDocument.kind.in_(kinds))
+    if user_id is not None:
+        query = query.where(or_(
+            SearchDocument.kind != "todo",
+            SearchDocument.creator_user_id == user_id,
+            SearchDocument.assignee_user_id.in_(visible_assignee_ids or [user_id]),
+        ))
+
+    total = session.exec(select(func.count()).select_from(query.subquery())).one()
+    rows = session.exec(query.order_by(*order_by).offset((page - 1) * page_size).limit(page_size)).all()
+    items = [
+        {
+            "kind": kind,
+            "id": ref_id,
+            "title": title,
+            "snippet": _snippet(body, tokens),
+            "score": abs(float(score or 0)),
+        }
+        for kind, ref_id, title, body, score in rows
+    ]
+    return items, total
@@ -0,0 +1,299 @@
+"""
+Contract settlement
+
+Keeps contracts and their installments in step with the finance transactions
+linked to them:
+
+- `Contract.pending_amount` is adjusted with a relative SQL UPDATE
+  (`pending_amount = pending_amount - :x`) inside the caller's transaction, so it
+  commits atomically with the transaction insert and concurrent payments on the
+  same contract cannot overwrite each other's changes.
+- Each transaction is allocated to open `ContractPaymentPlan` installments in
+  `sequence_no` order (FIFO); refunds release allocations from the latest
+  installment backwards (LIFO), after any unallocated overpayment, by
+  re-allocating the contract from the ledger. All touched installments are
+  written with one batched UPDATE by primary key.
+- `reallocate_contracts` rebuilds installment allocations from a ledger
+  aggregate, for bulk imports or repairs.
+"""
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import update
+from sqlmodel import Session, select, func
+
+from app.core.archive import with_history
+from app.core.config import settings
+from app.models.contract import (
+    Contract, ContractType, ContractPaymentPlan, PaymentDirection, PaymentPlanStatus
+)
+from app.models.finance import FinanceTransaction, TransactionDirection
+from app.services.payment_reminders import close_plan_reminders
+
+ZERO = Decimal("0")
+
+# Chunk size for IN (...) lists during bulk re-allocation
+REALLOCATE_BATCH_SIZE = 500
+
+
+def pending_amount_delta(contract_type: ContractType, txn_direction: TransactionDirection, amount: Decimal) -> Decimal:
+    """Change to a contract's pending amount caused by one transaction"""
+    direction = TransactionDirection(txn_direction)
+    # Sales contract: income decreases pending (customer payment), expense increases pending (refund)
+    if contract_type == ContractType.SALES:
+        return -amount if direction == TransactionDirection.IN else amount
+    # Purchase contract: expense decreases pending (our payment), income increases pending (supplier refund)
+    if contract_type == ContractType.PURCHASE:
+        return -amount if direction == TransactionDirection.OUT else amount
+    # For THIRD_PARTY contracts, we don't update pending_amount for now
+    return ZERO
+
+
+def plan_allocation_target(
+    contract_type: ContractType,
+    txn_direction: TransactionDirection
+) -> Tuple[PaymentDirection, bool]:
+    """
+    Installment direction a transaction settles, and whether it is a refund.
+
+    Refunds release previously allocated money instead of paying installments.
+    """
+    direction = TransactionDirection(txn_direction)
+    if contract_type == ContractType.SALES:
+        return PaymentDirection.RECEIVABLE, direction == TransactionDirection.OUT
+    if contract_type == ContractType.PURCHASE:
+        return PaymentDirection.PAYABLE, direction == TransactionDirection.IN
+    # Third party contracts carry both directions: income settles receivables, expense settles payables
+    if direction == TransactionDirection.IN:
+        return PaymentDirection.RECEIVABLE, False
+    return PaymentDirection.PAYABLE, False
+
+
+def plan_status(
+    amount: Decimal,
+    paid_amount: Decimal,
+    due_at: Optional[datetime],
+    current: PaymentPlanStatus,
+    now: Optional[datetime] = None
+) -> PaymentPlanStatus:
+    """Installment status after its paid amount changed"""
+    if paid_amount >= amount:
+        return PaymentPlanStatus.COMPLETED
+    if current != PaymentPlanStatus.COMPLETED:
+        # DUE / OVERDUE transitions of open installments are time driven, not payment driven
+        return current
+    now = now or datetime.utcnow()
+    if due_at and due_at < now:
+        return PaymentPlanStatus.OVERDUE
+    if due_at and due_at < now + timedelta(days=settings.PAYMENT_DUE_WINDOW_DAYS):
+        return PaymentPlanStatus.DUE
+    return PaymentPlanStatus.PENDING
+
+
+def _paid_at(txn_date) -> datetime:
+    if isinstance(txn_date, datetime):
+        return txn_date
+    if isinstance(txn_date, date):
+        return datetime.combine(txn_date, time.min)
+    return datetime.utcnow()
+
+
+def _write_plans(session: Session, rows: List[dict]):
+    """Persist installment changes with one batched UPDATE by primary key"""
+    if not rows:
+        return
+    now = datetime.utcnow()
+    for row in rows:
+        row["updated_at"] = now
+    session.execute(update(ContractPaymentPlan), rows)
+
+    # Completed installments no longer need their payment reminder
+    completed = [row["id"] for row in rows if row["status"] == PaymentPlanStatus.COMPLETED]
+    if completed:
+        close_plan_reminders(session, completed, now)
+
+
+# ─── Per-transaction allocation ──────────────────────────────────────────────
+
+def allocate_to_plans(
+    session: Session,
+    contract_id: UUID,
+    plan_direction: PaymentDirection,
+    amount: Decimal,
+    paid_at: datetime,
+    refund: bool = False
+) -> Decimal:
+    """
+    Apply an amount to a contract's installments, without committing.
+
+    Payments fill open installments in sequence order; refunds release paid
+    amounts starting from the last installment. Returns the part of the amount
+    that could not be allocated (overpayment or over-refund).
+    """
+    query = (
+        select(
+            ContractPaymentPlan.id, ContractPaymentPlan.amount, ContractPaymentPlan.paid_amount,
+            ContractPaymentPlan.paid_at, ContractPaymentPlan.due_at, ContractPaymentPlan.status
+        )
+        .where(ContractPaymentPlan.contract_id == contract_id)
+        .where(ContractPaymentPlan.direction == plan_direction)
+    )
+    if refund:
+        query = query.where(ContractPaymentPlan.paid_amount > 0).order_by(ContractPaymentPlan.sequence_no.desc())
+    else:
+        query = query.where(ContractPaymentPlan.paid_amount < ContractPaymentPlan.amount).order_by(ContractPaymentPlan.sequence_no)
+
+    remaining = amount
+    rows = []
+    for plan_id, plan_amount, paid_amount, plan_paid_at, due_at, status in session.exec(query.with_for_update()):
+        if remaining <= 0:
+            break
+        paid_amount = paid_amount or ZERO
+        if refund:
+            portion = min(remaining, paid_amount)
+            new_paid = paid_amount - portion
+        else:
+            portion = min(remaining, plan_amount - paid_amount)
+            new_paid = paid_amount + portion
+        remaining -= portion
+
+        new_status = plan_status(plan_amount, new_paid, due_at, status)
+        rows.append({
+            "id": plan_id,
+            "paid_amount": new_paid,
+            "status": new_status,
+            "paid_at": (plan_paid_at or paid_at) if new_status == PaymentPlanStatus.COMPLETED else None,
+        })
+
+    _write_plans(session, rows)
+    return remaining
+
+
+def settle_transaction(
+    session: Session,
+    contract_id: UUID,
+    txn_direction: TransactionDirection,
+    amount: Decimal,
+    txn_date=None
+) -> Optional[Decimal]:
+    """
+    Apply a transaction to its contract and installments, without committing.
+
+    The transaction must already be added to the session: refunds rebuild the
+    contract's installments from the ledger instead of releasing them LIFO,
+    which would ignore an earlier overpayment. Returns the applied pending-amount delta, or None if the contract does not exist.
+    """
+    # contract_type is immutable once a contract carries transactions, so reading it separately is safe
+    contract_type = session.exec(select(Contract.contract_type).where(Contract.id == contract_id)).first()
+    if contract_type is None:
+        return None
+
+    delta = pending_amount_delta(contract_type, txn_direction, amount)
+    if delta:
+        # Also serializes concurrent settlements of this contract on row-locking databases
+        session.execute(
+            update(Contract)
+            .where(Contract.id == contract_id)
+            .values(pending_amount=Contract.pending_amount + delta)
+        )
+
+    plan_direction, refund = plan_allocation_target(contract_type, txn_direction)
+    if refund:
+        # A refund first returns overpaid money no installment holds; the ledger
+        # (which already contains this transaction) knows how much that is
+        reallocate_contracts(session, [contract_id])
+    else:
+        allocate_to_plans(session, contract_id, plan_direction, amount, _paid_at(txn_date))
+    return delta
+
+
+# ─── Bulk re-allocation ──────────────────────────────────────────────────────
+
+def _chunks(items: List[UUID], size: int) -> Iterable[List[UUID]]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _settled_totals(session: Session, contract_ids: List[UUID]) -> Tuple[Dict[tuple, Decimal], Dict[tuple, datetime]]:
+    """Net settled amount and last payment date per (contract, installment direction)"""
+    contract_types = dict(session.exec(
+        select(Contract.id, Contract.contract_type).where(Contract.id.in_(contract_ids))
+    ).all())
+    ledger = session.exec(with_history(
+        session,
+        select(
+            FinanceTransaction.contract_id,
+            FinanceTransaction.txn_direction,
+            func.sum(FinanceTransaction.amount),
+            func.max(FinanceTransaction.txn_date),
+        )
+        .where(FinanceTransaction.contract_id.in_(contract_ids))
+        .group_by(FinanceTransaction.contract_id, FinanceTransaction.txn_direction),
+        FinanceTransaction,
+    )).all()
+
+    totals: Dict[tuple, Decimal] = defaultdict(lambda: ZERO)
+    last_paid: Dict[tuple, datetime] = {}
+    for contract_id, txn_direction, total, last_date in ledger:
+        contract_type = contract_types.get(contract_id)
+        if contract_type is None:
+            continue
+        plan_direction, refund = plan_allocation_target(contract_type, txn_direction)
+        key = (contract_id, plan_direction)
+        totals[key] += -Decimal(total) if refund else Decimal(total)
+        if not refund:
+            paid_at = _paid_at(last_date)
+            last_paid[key] = max(last_paid.get(key, paid_at), paid_at)
+    return totals, last_paid
+
+
+def reallocate_contracts(session: Session, contract_ids: Optional[List[UUID]] = None) -> int:
+    """
+    Rebuild installment allocations from the transaction ledger, without committing.
+
+    Each contract's net settled amount (from one GROUP BY over its transactions)
+    is spread FIFO over its installments. Intended for bulk imports, where
+    allocating transaction by transaction would be wasteful. Covers every
+    contract with installments when `contract_ids` is omitted. Returns the
+    number of installments rewritten.
+    """
+    if contract_ids is None:
+        contract_ids = list(session.exec(select(ContractPaymentPlan.contract_id).distinct()).all())
+
+    now = datetime.utcnow()
+    updated = 0
+    for batch in _chunks(list(contract_ids), REALLOCATE_BATCH_SIZE):
+        totals, last_paid = _settled_totals(session, batch)
+        plans = session.exec(
+            select(
+                ContractPaymentPlan.id, ContractPaymentPlan.contract_id, ContractPaymentPlan.direction,
+                ContractPaymentPlan.amount, ContractPaymentPlan.paid_at, ContractPaymentPlan.due_at,
+                ContractPaymentPlan.status
+            )
+            .where(ContractPaymentPlan.contract_id.in_(batch))
+            .order_by(ContractPaymentPlan.contract_id, ContractPaymentPlan.direction, ContractPaymentPlan.sequence_no)
+            .with_for_update()
+        ).all()
+
+        remaining: Dict[tuple, Decimal] = {}
+        rows = []
+        for plan_id, contract_id, direction, amount, paid_at, due_at, status in plans:
+            key = (contract_id, direction)
+            if key not in remaining:
+                remaining[key] = max(totals.get(key, ZERO), ZERO)
+            portion = min(remaining[key], amount)
+            remaining[key] -= portion
+
+            new_status = plan_status(amount, portion, due_at, status, now)
+            if new_status == PaymentPlanStatus.COMPLETED:
+                paid_at = paid_at or last_paid.get(key, now)
+            else:
+                paid_at = None
+            rows.append({"id": plan_id, "paid_amount": portion, "status": new_status, "paid_at": paid_at})
+
+        _write_plans(session, rows)
+        updated += len(rows)
+    return updated
@@ -0,0 +1,132 @@
+"""
+Typeahead suggestions for the user / counterparty / project pickers
+
+Each picker is served from an in-memory `PrefixIndex` over display names,
+usernames, codes and identifiers, plus full pinyin and pinyin initials of
+Chinese names when `pypinyin` is installed ("杭州云栖" -> "hangzhouyunqi",
+"hzyq"). Indexes are loaded from the database once and then kept current by
+post-commit hooks, so lookups never touch the database.
+
+Prefix lookups cover the start of a name and of each space separated word;
+substring matches inside Chinese names are the job of the full-text search.
+"""
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlmodel import Session, select
+
+from app.core.database import engine
+from app.core.events import on_commit
+from app.core.exceptions import ValidationException
+from app.models.contract import Counterparty
+from app.models.iam import User, UserStatus
+from app.models.project import Project
+from app.utils.prefix_index import PrefixIndex
+
+try:
+    from pypinyin import Style, lazy_pinyin
+except ImportError:  # Pinyin keys are skipped
+    lazy_pinyin = None
+
+SUGGEST_LIMIT = 10
+SUGGEST_MAX_LIMIT = 50
+
+
+def _name_keys(name: Optional[str]) -> List[str]:
+    """The name itself, each later word, and its pinyin spellings"""
+    if not name:
+        return []
+    words = name.split()
+    keys = [" ".join(words[i:]) for i in range(len(words))]
+    if lazy_pinyin is not None:
+        keys.append("".join(lazy_pinyin(name)))
+        keys.append("".join(lazy_pinyin(name, style=Style.FIRST_LETTER)))
+    return keys
+
+
+# ─── Sources ─────────────────────────────────────────────────────────────────
+# Each entry function turns a row (column name -> value) into (keys, payload),
+# or None when the row should not be offered in the picker.
+
+def _user_entry(row: dict) -> Optional[Tuple[List[str], dict]]:
+    if row.get("status") is not None and UserStatus(row["status"]) != UserStatus.ACTIVE:
+        return None
+    email = row.get("email")
+    keys = [*_name_keys(row["display_name"]), row.get("username"), email, email.split("@")[0] if email else None]
+    return [k for k in keys if k], {
+        "id": row["id"], "display_name": row["display_name"], "username": row.get("username"), "email": email,
+    }
+
+
+def _counterparty_entry(row: dict) -> Optional[Tuple[List[str], dict]]:
+    keys = [*_name_keys(row["name"]), row.get("identifier")]
+    return [k for k in keys if k], {
+        "id": row["id"], "name": row["name"], "type": row.get("type"), "identifier": row.get("identifier"),
+    }
+
+
+def _project_entry(row: dict) -> Optional[Tuple[List[str], dict]]:
+    keys = [*_name_keys(row["name"]), row.get("project_no")]
+    return [k for k in keys if k], {
+        "id": row["id"], "name": row["name"], "project_no": row.get("project_no"), "status": row.get("status"),
+    }
+
+
+SUGGEST_SOURCES: Dict[str, Tuple[type, Tuple[str, ...], Callable[[dict], Optional[tuple]]]] = {
+    "users": (User, ("id", "display_name", "username", "email", "status"), _user_entry),
+    "counterparties": (Counterparty, ("id", "name", "type", "identifier"), _counterparty_entry),
+    "projects": (Project, ("id", "name", "project_no", "status"), _project_entry),
+}
+
+
+# ─── Indexes ─────────────────────────────────────────────────────────────────
+
+class SuggestIndexes:
+    """One lazily loaded PrefixIndex per picker"""
+
+    def __init__(self):
+        self._indexes: Dict[str, PrefixIndex] = {kind: PrefixIndex() for kind in SUGGEST_SOURCES}
+        self._loaded: Dict[str, bool] = {kind: False for kind in SUGGEST_SOURCES}
+        self._load_lock = threading.Lock()
+
+    def _rows(self, session: Session, kind: str) -> Iterable[tuple]:
+        model, columns, entry = SUGGEST_SOURCES[kind]
+        for row in session.exec(select(*[getattr(model, name) for name in columns])):
+            result = entry(dict(row._mapping))
+            if result is not None:
+                keys, payload = result
+                yield payload["id"], keys, payload
+
+    def load(self, kinds: Optional[Iterable[str]] = None):
+        """(Re)build indexes from the database"""
+        with self._load_lock, Session(engine) as session:
+            for kind in kinds or SUGGEST_SOURCES:
+                self._indexes[kind].load(self._rows(session, kind))
+                self._loaded[kind] = True
+
+    def apply(self, kind: str, changes: List[Tuple[str, dict]]):
+        """Commit hook: fold inserted / updated / deleted rows into a loaded index"""
+        if not self._loaded[kind]:
+            return  # Picked up by the first load
+        index = self._indexes[kind]
+        entry = SUGGEST_SOURCES[kind][2]
+        for action, values in changes:
+            result = None if action == "delete" else entry(values)
+            if result is None:
+                index.remove(values["id"])
+            else:
+                keys, payload = result
+                index.put(payload["id"], keys, payload)
+
+    def suggest(self, kind: str, prefix: str, limit: int = SUGGEST_LIMIT) -> List[dict]:
+        if kind not in self._indexes:
+            raise ValidationException(f"不支持的联想类型: {kind}")
+        if not self._loaded[kind]:
+            self.load([kind])
+        return self._indexes[kind].search(prefix, limit)
+
+
+suggest_indexes = SuggestIndexes()
+
+for _kind, (_model, _columns, _entry) in SUGGEST_SOURCES.items():
+    on_commit(_model, lambda changes, kind=_kind: suggest_indexes.apply(kind, changes))
@@ -0,0 +1,112 @@
+"""
+Todo tag index
+
+`TodoItem.tags` is a JSON list, which no database can index portably. Every
+todo's tags are mirrored into `todo_tag` (one row per todo and tag) by mapper
+write hooks on the flush connection, so the copy commits atomically with the
+todo no matter which code path wrote it. Tag filters become semi-joins on the
+(tag, todo_id) index and tag counts a GROUP BY over the side table.
+"""
+from datetime import datetime
+from typing import Iterable, List, Optional
+from uuid import UUID, uuid4
+
+from sqlalchemy import String, cast, delete, event, func, inspect, insert
+from sqlmodel import Session, select
+
+from app.core.database import engine
+from app.models.todo import TodoItem, TodoTag
+
+TAG_BATCH_SIZE = 1000
+
+
+def normalize_tags(tags: Optional[Iterable]) -> List[str]:
+    """Stripped, non-empty, de-duplicated tags in their original order"""
+    if not tags:
+        return []
+    return list(dict.fromkeys(str(tag).strip() for tag in tags if tag is not None and str(tag).strip()))
+
+
+def parse_tags(value: Optional[str]) -> List[str]:
+    """Comma separated tag filter from a query parameter"""
+    return normalize_tags((value or "").split(","))
+
+
+def tag_filter(query, tags: List[str]):
+    """Restrict a TodoItem query to todos carrying every one of `tags`"""
+    for tag in tags:
+        query = query.where(TodoItem.id.in_(select(TodoTag.todo_id).where(TodoTag.tag == tag)))
+    return query
+
+
+def _tag_rows(todo_id: UUID, tags, now: datetime) -> List[dict]:
+    return [
+        {"id": uuid4(), "created_at": now, "updated_at": now, "todo_id": todo_id, "tag": tag}
+        for tag in normalize_tags(tags)
+    ]
+
+
+# ─── Write hooks ─────────────────────────────────────────────────────────────
+
+def _sync_tags(connection, todo_id: UUID, tags, replace: bool):
+    table = TodoTag.__table__
+    if replace:
+        connection.execute(delete(table).where(table.c.todo_id == todo_id))
+    rows = _tag_rows(todo_id, tags, datetime.utcnow())
+    if rows:
+        connection.execute(insert(table), rows)
+
+
+@event.listens_for(TodoItem, "after_insert")
+def _after_todo_insert(mapper, connection, target):
+    if target.tags:
+        _sync_tags(connection, target.id, target.tags, replace=False)
+
+
+@event.listens_for(TodoItem, "after_update")
+def _after_todo_update(mapper, connection, target):
+    if inspect(target).attrs.tags.history.has_changes():
+        _sync_tags(connection, target.id, target.tags, replace=True)
+
+
+@event.listens_for(TodoItem, "before_delete")
+def _before_todo_delete(mapper, connection, target):
+    connection.execute(delete(TodoTag.__table__).where(TodoTag.__table__.c.todo_id == target.id))
+
+
+# ─── Backfill ────────────────────────────────────────────────────────────────
+
+def rebuild_todo_tags(session: Session) -> int:
+    """Recreate todo_tag from TodoItem.tags in keyset batches, without committing"""
+    session.execute(delete(TodoTag))
+    now = datetime.utcnow()
+    created = 0
+    last_id = None
+    while True:
+        query = select(TodoItem.id, TodoItem.tags).order_by(TodoItem.id).limit(TAG_BATCH_SIZE)
+        if last_id is not None:
+            query = query.where(TodoItem.id > last_id)
+        todos = session.exec(query).all()
+        if not todos:
+            break
+        rows = [row for todo_id, tags in todos for row in _tag_rows(todo_id, tags, now)]
+        if rows:
+            session.execute(insert(TodoTag), rows)
+            created += len(rows)
+        last_id = todos[-1][0]
+    return created
+
+
+def backfill_todo_tags():
+    """Build todo_tag once for databases whose todos were tagged before it existed"""
+    with Session(engine) as session:
+        if session.exec(select(TodoTag.id).limit(1)).first():
+            return
+        tagged = session.exec(
+            select(TodoItem.id).where(func.coalesce(cast(TodoItem.tags, String), "[]").not_in(("[]", "null"))).limit(1)
+        ).first()
+        if not tagged:
+            return
+        created = rebuild_todo_tags(session)
+        session.commit()
+    print(f"🏷️  Todo tag index built: {created} tags")
@@ -0,0 +1,27 @@
+"""
+File download helpers
+"""
+import urllib.parse
+from typing import IO, Iterator
+
+XLSX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def attachment_headers(filename: str) -> dict:
+    """Content-Disposition header for a (possibly non-ASCII) download filename"""
+    encoded_filename = urllib.parse.quote(filename)
+    return {"Content-Disposition": f"attachment; filename*=UTF-8''{encoded_filename}"}
+
+
+def iter_file(fp: IO[bytes], chunk_size: int = 64 * 1024, close: bool = True) -> Iterator[bytes]:
+    """Yield a file's content in chunks, closing it once fully sent"""
+    try:
+        fp.seek(0)
+        while True:
+            chunk = fp.read(chunk_size)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        if close:
+            fp.close()
@@ -0,0 +1,75 @@
+"""
+Incremental JSON array parsing
+"""
+import json
+from typing import Any, List
+
+
+class JSONArrayStreamParser:
+    """
+    Emit the elements of a top-level JSON array as soon as each one is complete.
+
+    Text is fed in arbitrary chunks (e.g. streamed model output). Anything
+    before the opening `[` (such as a ```json fence) is ignored. Only object
+    and array elements are emitted; they are decoded with `json.loads` once
+    their closing bracket arrives.
+    """
+
+    def __init__(self):
+        self._buffer: List[str] = []
+        self._started = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._element: List[str] = []
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Any]:
+        """Consume a chunk of text and return the elements it completed"""
+        completed = []
+        for ch in chunk:
+            if self._finished:
+                break
+            if not self._started:
+                if ch == "[":
+                    self._started = True
+                continue
+
+            if self._depth == 0:
+                # Between elements of the top-level array
+                if ch in "{[":
+                    self._depth = 1
+                    self._element = [ch]
+                elif ch == "]":
+                    self._finished = True
+                continue
+
+            self._element.append(ch)
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                continue
+
+            if ch == '"':
+                self._in_string = True
+            elif ch in "{[":
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    raw = "".join(self._element)
+                    self._element = []
+                    try:
+                        completed.append(json.loads(raw))
+                    except ValueError:
+                        # Malformed element: skip it, the full text is still returned at the end
+                        pass
+        return completed
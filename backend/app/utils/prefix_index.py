@@ -0,0 +1,89 @@
+"""
+Sorted-array prefix index for typeahead lookups
+"""
+import bisect
+import threading
+from typing import Dict, Hashable, Iterable, List, Set, Tuple
+
+
+def normalize_key(value) -> str:
+    """Lowercase with whitespace removed, so "Acme Corp" matches "acmec" """
+    return "".join(str(value).lower().split()) if value else ""
+
+
+class PrefixIndex:
+    """
+    Maps normalized keys to items for prefix search.
+
+    All (key, item_id) pairs are kept in one sorted list: a lookup bisects to
+    the first key >= prefix and walks forward while keys still start with it,
+    so it costs O(log n + results) regardless of table size. Single-item
+    updates are a bisect plus a list insert / delete.
+    """
+
+    def __init__(self):
+        self._entries: List[Tuple[str, Hashable]] = []
+        self._keys: Dict[Hashable, Set[str]] = {}
+        self._items: Dict[Hashable, dict] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @staticmethod
+    def _normalize(keys: Iterable[str]) -> Set[str]:
+        return {key for key in (normalize_key(k) for k in keys) if key}
+
+    def load(self, items: Iterable[Tuple[Hashable, Iterable[str], dict]]):
+        """Replace the whole index with (item_id, keys, payload) triples, sorting once"""
+        entries = []
+        keys_by_id = {}
+        payloads = {}
+        for item_id, keys, payload in items:
+            normalized = self._normalize(keys)
+            keys_by_id[item_id] = normalized
+            payloads[item_id] = payload
+            entries.extend((key, item_id) for key in normalized)
+        entries.sort()
+        with self._lock:
+            self._entries, self._keys, self._items = entries, keys_by_id, payloads
+
+    def _remove_locked(self, item_id: Hashable):
+        for key in self._keys.pop(item_id, ()):
+            i = bisect.bisect_left(self._entries, (key, item_id))
+            if i < len(self._entries) and self._entries[i] == (key, item_id):
+                del self._entries[i]
+        self._items.pop(item_id, None)
+
+    def put(self, item_id: Hashable, keys: Iterable[str], payload: dict):
+        """Add or replace one item"""
+        normalized = self._normalize(keys)
+        with self._lock:
+            self._remove_locked(item_id)
+            for key in normalized:
+                bisect.insort(self._entries, (key, item_id))
+            self._keys[item_id] = normalized
+            self._items[item_id] = payload
+
+    def remove(self, item_id: Hashable):
+        with self._lock:
+            self._remove_locked(item_id)
+
+    def search(self, prefix: str, limit: int = 10) -> List[dict]:
+        """Payloads of up to `limit` items having a key that starts with `prefix`, in key order"""
+        prefix = normalize_key(prefix)
+        if not prefix:
+            return []
+        results = []
+        seen = set()
+        with self._lock:
+            i = bisect.bisect_left(self._entries, (prefix,))
+            while i < len(self._entries) and len(results) < limit:
+                key, item_id = self._entries[i]
+                if not key.startswith(prefix):
+                    break
+                if item_id not in seen:
+                    seen.add(item_id)
+                    results.append(self._items[item_id])
+                i += 1
+        return results
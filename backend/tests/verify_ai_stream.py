@@ -0,0 +1,95 @@
+import sys
+import os
+import json
+from uuid import uuid4
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import httpx
+from fastapi.testclient import TestClient
+from app.core.config import settings
+from app.core.auth import get_current_user
+from app.models.iam import User, UserStatus
+from app.services.gemini import gemini_client
+from app.services.ai_cache import ai_response_cache
+from app.utils.json_stream import JSONArrayStreamParser
+from app.main import app
+
+FEATURES = [
+    {"index": "1", "module": "登录", "l1_feature": "账号", "description": "手机号登录, 支持 \"验证码\""},
+    {"index": "2", "module": "订单", "l1_feature": "列表", "description": "分页 [含筛选]"},
+    {"index": "3", "module": "支付", "l1_feature": "微信支付", "description": "{回调} 处理"},
+]
+
+
+def fake_gemini(request: httpx.Request) -> httpx.Response:
+    """Local stand-in for streamGenerateContent: split the JSON array into small SSE chunks"""
+    text = "```json\n" + json.dumps(FEATURES, ensure_ascii=False) + "\n```"
+    lines = []
+    for i in range(0, len(text), 7):
+        chunk = {"candidates": [{"content": {"parts": [{"text": text[i:i + 7]}]}}]}
+        lines.append(f"data: {json.dumps(chunk, ensure_ascii=False)}\r\n\r\n")
+    return httpx.Response(200, content="".join(lines).encode("utf-8"),
+                          headers={"Content-Type": "text/event-stream"})
+
+
+def parse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        event, data = None, None
+        for line in block.split("\n"):
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+        events.append((event, data))
+    return events
+
+
+def run_test():
+    print("--- Test 1: Incremental parser ---")
+    parser = JSONArrayStreamParser()
+    text = json.dumps(FEATURES, ensure_ascii=False)
+    rows = []
+    for ch in text:
+        rows.extend(parser.feed(ch))
+    if rows == FEATURES and parser.finished:
+        print("SUCCESS: Parser emitted every row.")
+    else:
+        print(f"FAILURE: Parser emitted {rows}")
+
+    print("\n--- Test 2: SSE endpoint against fake upstream ---")
+    settings.GEMINI_API_KEY = "test-key"
+    gemini_client._transport = httpx.MockTransport(fake_gemini)
+    ai_response_cache.memory.clear()
+    app.dependency_overrides[get_current_user] = lambda: User(
+        id=uuid4(), display_name="Tester", username="tester", status=UserStatus.ACTIVE
+    )
+
+    body = {"messages": [{"role": "user", "parts": [f"stream test {uuid4()}"]}]}
+    with TestClient(app) as client:
+        response = client.post("/api/v1/ai/chat/stream", json=body)
+        events = parse_events(response.text)
+        streamed = [data for event, data in events if event == "row"]
+        done = [data for event, data in events if event == "done"]
+        if streamed == FEATURES and done and done[0]["cached"] is False:
+            print("SUCCESS: Rows streamed one by one.")
+        else:
+            print(f"FAILURE: Unexpected events {events}")
+
+        print("\n--- Test 3: Repeat prompt served from cache ---")
+        response = client.post("/api/v1/ai/chat/stream", json=body)
+        events = parse_events(response.text)
+        streamed = [data for event, data in events if event == "row"]
+        done = [data for event, data in events if event == "done"]
+        if streamed == FEATURES and done and done[0]["cached"] is True:
+            print("SUCCESS: Cached response replayed.")
+        else:
+            print(f"FAILURE: Unexpected events {events}")
+
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,105 @@
+import sys
+import os
+import tempfile
+from decimal import Decimal
+from uuid import uuid4
+from datetime import date
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlmodel import Session, SQLModel, create_engine, select
+from app.models.finance import FinanceTransaction, TransactionDirection, ReconcileStatus
+from app.services.bank_import import read_statement, import_bank_statement
+
+HEADER = "date,direction,amount,reference\n"
+
+
+def run_test():
+    db_dir = tempfile.mkdtemp()
+    engine = create_engine(f"sqlite:///{os.path.join(db_dir, 'bank_import.db')}")
+    SQLModel.metadata.create_all(engine)
+
+    entity_id = uuid4()
+    account_id = uuid4()
+    user_id = uuid4()
+
+    def import_lines(*lines):
+        content = (HEADER + "".join(f"{line}\n" for line in lines)).encode()
+        with Session(engine) as session:
+            result = import_bank_statement(
+                session, read_statement(content, "statement.csv"), account_id, entity_id, user_id
+            )
+            session.commit()
+        return result
+
+    def ledger():
+        with Session(engine) as session:
+            return session.exec(
+                select(FinanceTransaction.txn_date, FinanceTransaction.amount, FinanceTransaction.reference_no)
+                .where(FinanceTransaction.account_id == account_id)
+                .order_by(FinanceTransaction.txn_date)
+            ).all()
+
+    def check(label, result, inserted, already, matched=0):
+        got = (result["inserted"], result["already_reconciled"], result["matched"])
+        if got == (inserted, already, matched):
+            print(f"SUCCESS: {label}")
+        else:
+            print(f"FAILURE: {label}: inserted/already_reconciled/matched = {got}, "
+                  f"expected {(inserted, already, matched)}")
+
+    print("--- Test 1: A second payment of the same amount in a later statement ---")
+    check("First statement imported", import_lines("2024-03-01,in,1000.00,R1"), 1, 0)
+    check("Second payment kept", import_lines("2024-03-02,in,1000.00,R2"), 1, 0)
+    refs = sorted(ref for _, _, ref in ledger())
+    if refs == ["R1", "R2"]:
+        print("SUCCESS: Both payments are in the ledger.")
+    else:
+        print(f"FAILURE: Ledger references {refs}")
+
+    print("\n--- Test 2: Re-importing a statement ---")
+    check("Re-import adds nothing", import_lines("2024-03-01,in,1000.00,R1"), 0, 1)
+
+    print("\n--- Test 3: Overlapping statements ---")
+    check(
+        "Overlap recognized, new line inserted",
+        import_lines("2024-03-02,in,1000.00,R2", "2024-03-05,out,500.00,R3"),
+        1, 1,
+    )
+
+    print("\n--- Test 4: Repeated same-amount payments without reference ---")
+    check("Two identical lines both inserted", import_lines("2024-04-01,in,200.00,", "2024-04-01,in,200.00,"), 2, 0)
+    check("Re-import of both adds nothing", import_lines("2024-04-01,in,200.00,", "2024-04-01,in,200.00,"), 0, 2)
+    check(
+        "A third identical payment is inserted",
+        import_lines("2024-04-01,in,200.00,", "2024-04-01,in,200.00,", "2024-04-01,in,200.00,"),
+        1, 2,
+    )
+
+    print("\n--- Test 5: Manually entered transactions are reconciled ---")
+    with Session(engine) as session:
+        session.add(FinanceTransaction(
+            our_entity_id=entity_id, account_id=account_id, txn_direction=TransactionDirection.IN,
+            amount=Decimal("300.00"), txn_date=date(2024, 5, 1), created_by_user_id=user_id,
+        ))
+        session.add(FinanceTransaction(
+            our_entity_id=entity_id, account_id=account_id, txn_direction=TransactionDirection.IN,
+            amount=Decimal("400.00"), txn_date=date(2024, 5, 1), reference_no="M1", created_by_user_id=user_id,
+        ))
+        session.commit()
+    check("Booking date inside the window matches", import_lines("2024-05-02,in,300.00,R5"), 0, 0, 1)
+    check("Different reference numbers never pair", import_lines("2024-05-01,in,400.00,R6"), 1, 0)
+    with Session(engine) as session:
+        open_rows = session.exec(
+            select(FinanceTransaction.amount)
+            .where(FinanceTransaction.reconcile_status == ReconcileStatus.UNRECONCILED)
+        ).all()
+    if open_rows == [Decimal("400.00")]:
+        print("SUCCESS: Only the unmatched manual entry stays unreconciled.")
+    else:
+        print(f"FAILURE: Unreconciled amounts {open_rows}")
+
+
+if __name__ == "__main__":
+    run_test()
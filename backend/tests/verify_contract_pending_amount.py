@@ -0,0 +1,118 @@
+
+import sys
+import os
+import asyncio
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from uuid import uuid4
+from datetime import date
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlmodel import Session, SQLModel, create_engine, select, func
+from app.models.iam import User, UserStatus
+from app.models.contract import Contract, ContractType
+from app.models.finance import FinanceTransaction
+from app.schemas.finance import TransactionCreate
+from app.api.finance import create_transaction
+
+PAYMENTS = 300
+REFUNDS = 60
+WORKERS = 32
+
+
+def run_test():
+    # Dedicated SQLite file so parallel writers hit a real database lock
+    db_dir = tempfile.mkdtemp()
+    engine = create_engine(
+        f"sqlite:///{os.path.join(db_dir, 'pending_amount.db')}",
+        connect_args={"check_same_thread": False, "timeout": 30},
+    )
+    SQLModel.metadata.create_all(engine)
+
+    with Session(engine) as session:
+        print("--- Setting up test data ---")
+        user = User(id=uuid4(), display_name="Finance", username=f"finance_{uuid4().hex[:8]}", status=UserStatus.ACTIVE)
+        contract = Contract(
+            contract_no=f"HT-{uuid4().hex[:8]}",
+            name="Concurrency Test Contract",
+            contract_type=ContractType.SALES,
+            party_a_id=uuid4(),
+            party_b_id=uuid4(),
+            owner_user_id=user.id,
+            amount_total=Decimal("10000.00"),
+            pending_amount=Decimal("10000.00"),
+        )
+        session.add(user)
+        session.add(contract)
+        session.commit()
+        session.refresh(user)
+        session.expunge(user)
+        contract_id = contract.id
+
+    entity_id = uuid4()
+    account_id = uuid4()
+
+    def pay(direction: str, amount: str):
+        data = TransactionCreate(
+            our_entity_id=entity_id,
+            account_id=account_id,
+            txn_direction=direction,
+            amount=Decimal(amount),
+            txn_date=date.today(),
+            contract_id=contract_id,
+        )
+        with Session(engine) as session:
+            asyncio.run(create_transaction(data, session=session, current_user=user))
+
+    print(f"\n--- Test 1: {PAYMENTS} payments and {REFUNDS} refunds in parallel ---")
+    jobs = [("in", "12.34")] * PAYMENTS + [("out", "5.00")] * REFUNDS
+    errors = []
+    with ThreadPoolExecutor(max_workers=WORKERS) as pool:
+        for future in [pool.submit(pay, d, a) for d, a in jobs]:
+            try:
+                future.result()
+            except Exception as e:
+                errors.append(e)
+
+    if errors:
+        print(f"FAILURE: {len(errors)} payments failed, first error: {errors[0]}")
+        return
+
+    expected = Decimal("10000.00") - Decimal("12.34") * PAYMENTS + Decimal("5.00") * REFUNDS
+    with Session(engine) as session:
+        contract = session.get(Contract, contract_id)
+        txn_count = session.exec(
+            select(func.count()).select_from(FinanceTransaction).where(FinanceTransaction.contract_id == contract_id)
+        ).one()
+
+    print(f"Transactions: {txn_count}")
+    print(f"Pending Amount: {contract.pending_amount} (expected {expected})")
+    if txn_count == PAYMENTS + REFUNDS and contract.pending_amount == expected:
+        print("SUCCESS: No lost updates under concurrent payments")
+    else:
+        print("FAILURE: Pending amount does not match the recorded transactions")
+
+    print("\n--- Test 2: Payment on a missing contract ---")
+    data = TransactionCreate(
+        our_entity_id=entity_id,
+        account_id=account_id,
+        txn_direction="in",
+        amount=Decimal("1.00"),
+        txn_date=date.today(),
+        contract_id=uuid4(),
+    )
+    with Session(engine) as session:
+        asyncio.run(create_transaction(data, session=session, current_user=user))
+    with Session(engine) as session:
+        contract = session.get(Contract, contract_id)
+    if contract.pending_amount == expected:
+        print("SUCCESS: Unrelated contract left unchanged")
+    else:
+        print("FAILURE: Unrelated contract was modified")
+
+
+if __name__ == "__main__":
+    run_test()
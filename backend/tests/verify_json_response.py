@@ -0,0 +1,63 @@
+import sys
+import os
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import uuid4
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.core.response import FastJSONResponse
+from app.models.contract import PaymentDirection
+from app.schemas.finance import TransactionResponse
+
+
+def envelope(data):
+    return {"code": 0, "message": "success", "data": data}
+
+
+def run_test():
+    transaction = TransactionResponse(
+        id=uuid4(), our_entity_id=uuid4(), account_id=uuid4(), txn_direction="in",
+        amount=Decimal("12.50"), currency="CNY", txn_date=date(2024, 3, 1), purpose="货款",
+        reconcile_status="unreconciled", created_by_user_id=uuid4(), created_at=datetime(2024, 3, 1, 9, 30, 15, 250),
+    )
+    payloads = {
+        "Cash flow rows": envelope({"rows": [
+            {"period": "2024-03", "direction": "in", "amount": Decimal("12.50"), "count": 3},
+            {"period": "2024-04", "direction": "out", "amount": Decimal("100"), "count": 1},
+        ]}),
+        "Aging rows and totals": envelope({
+            "as_of": date(2024, 3, 31),
+            "source": "snapshot",
+            "rows": [{"direction": PaymentDirection.RECEIVABLE, "counterparty_id": uuid4(),
+                      "days_0_30": Decimal("0.00"), "total_amount": Decimal("1234.56"), "installment_count": 2}],
+            "totals": {"receivable": {"total_amount": Decimal("1234.56"), "installment_count": 2}},
+        }),
+        "Dashboard balance": envelope({"accounts": [{"name": "基本户", "balance": Decimal("-7.10")}]}),
+        "Models in a page": envelope({"items": [transaction], "total": 1, "page": 1, "page_size": 20, "pages": 1}),
+    }
+
+    print("--- Test 1: Same JSON as jsonable_encoder ---")
+    for label, payload in payloads.items():
+        old = json.loads(JSONResponse(jsonable_encoder(payload)).body)
+        new = json.loads(FastJSONResponse(payload).body)
+        if old == new:
+            print(f"SUCCESS: {label}")
+        else:
+            print(f"FAILURE: {label}:\n  old {old}\n  new {new}")
+
+    print("\n--- Test 2: Bare Decimals are numbers, model Decimals strings ---")
+    body = json.loads(FastJSONResponse(payloads["Aging rows and totals"]).body)
+    item = json.loads(FastJSONResponse(payloads["Models in a page"]).body)["data"]["items"][0]
+    if body["data"]["totals"]["receivable"]["total_amount"] == 1234.56 and item["amount"] == "12.50":
+        print("SUCCESS: Wire types unchanged")
+    else:
+        print(f"FAILURE: total {body['data']['totals']['receivable']['total_amount']!r}, amount {item['amount']!r}")
+
+
+if __name__ == "__main__":
+    run_test()
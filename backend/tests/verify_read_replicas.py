@@ -0,0 +1,83 @@
+import sys
+import os
+import json
+import tempfile
+from uuid import uuid4
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Two SQLite files stand in for the primary and a replica; a third URL points
+# into a missing directory and plays a replica that is down.
+WORK_DIR = tempfile.mkdtemp(prefix="atlas_replicas_")
+PRIMARY_PATH = os.path.join(WORK_DIR, "primary.db")
+REPLICA_URL = f"sqlite:///{os.path.join(WORK_DIR, 'replica.db')}"
+DEAD_REPLICA_URL = f"sqlite:///{os.path.join(WORK_DIR, 'missing', 'replica.db')}"
+os.environ.update({
+    "DB_TYPE": "sqlite",
+    "SQLITE_DB_PATH": PRIMARY_PATH,
+    "DB_REPLICA_URLS": json.dumps([REPLICA_URL, DEAD_REPLICA_URL]),
+    "DEBUG": "False",
+    "SCHEDULER_ENABLED": "False",
+})
+
+from fastapi.testclient import TestClient
+from sqlmodel import Session, SQLModel
+from app.core.auth import get_current_user
+from app.core.database import PRIMARY_COOKIE, create_db_engine, replicas
+from app.models.iam import User, UserStatus, JobTitle
+from app.main import app
+
+
+def job_title_names(client):
+    response = client.get("/api/v1/iam/job-titles")
+    return sorted(item["name"] for item in response.json()["data"])
+
+
+def run_test():
+    print("--- Setting up primary and replica ---")
+    replica_engine = create_db_engine(REPLICA_URL)
+    SQLModel.metadata.create_all(replica_engine)
+    with Session(replica_engine) as session:
+        session.add(JobTitle(name="replica-only"))
+        session.commit()
+
+    user = User(id=uuid4(), display_name="Tester", username="tester", status=UserStatus.ACTIVE)
+    app.dependency_overrides[get_current_user] = lambda: user
+
+    with TestClient(app) as client:
+        print("\n--- Test 1: GET requests read from the replica ---")
+        names = [job_title_names(client) for _ in range(4)]
+        if all(n == ["replica-only"] for n in names):
+            print("SUCCESS: Every GET was served by the healthy replica.")
+        else:
+            print(f"FAILURE: GET results {names}")
+
+        print("\n--- Test 2: The unreachable replica is ejected ---")
+        if replicas._ejected_until[1] > 0 and replicas._ejected_until[0] == 0:
+            print("SUCCESS: Dead replica ejected, healthy one kept.")
+        else:
+            print(f"FAILURE: Ejection state {replicas._ejected_until}")
+
+        print("\n--- Test 3: Writes go to the primary and pin reads to it ---")
+        response = client.post("/api/v1/iam/job-titles", json={"name": "written-on-primary"})
+        pinned = PRIMARY_COOKIE in response.cookies
+        names = job_title_names(client)
+        if response.status_code == 200 and pinned and names == ["written-on-primary"]:
+            print("SUCCESS: Read after write saw the primary.")
+        else:
+            print(f"FAILURE: status={response.status_code} pinned={pinned} names={names}")
+
+        print("\n--- Test 4: Without the cookie reads return to the replica ---")
+        client.cookies.clear()
+        names = job_title_names(client)
+        if names == ["replica-only"]:
+            print("SUCCESS: Unpinned GET served by the replica.")
+        else:
+            print(f"FAILURE: GET results {names}")
+
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,151 @@
+import sys
+import os
+import asyncio
+import tempfile
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import uuid4
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+os.environ.update({
+    "DB_TYPE": "sqlite",
+    "SQLITE_DB_PATH": os.path.join(tempfile.mkdtemp(), "settlement.db"),
+    "DEBUG": "False",
+    "SCHEDULER_ENABLED": "False",
+})
+
+from sqlalchemy import update
+from sqlmodel import Session, SQLModel, select
+from app.core.database import engine
+from app.models.iam import User, UserStatus
+from app.models.contract import Contract, ContractType, ContractPaymentPlan, PaymentDirection, PaymentPlanStatus
+from app.schemas.finance import TransactionCreate
+from app.api.finance import create_transaction
+from app.services.settlement import allocate_to_plans, reallocate_contracts
+
+INSTALLMENTS = ("300.00", "300.00", "400.00")
+PAID = PaymentPlanStatus.COMPLETED
+OPEN = PaymentPlanStatus.PENDING
+
+
+def run_test():
+    SQLModel.metadata.create_all(engine)
+    user = User(id=uuid4(), display_name="Finance", username=f"finance_{uuid4().hex[:8]}", status=UserStatus.ACTIVE)
+    entity_id = uuid4()
+    account_id = uuid4()
+
+    def new_contract():
+        with Session(engine) as session:
+            contract = Contract(
+                contract_no=f"HT-{uuid4().hex[:8]}",
+                name="Settlement Test Contract",
+                contract_type=ContractType.SALES,
+                party_a_id=uuid4(),
+                party_b_id=uuid4(),
+                owner_user_id=user.id,
+                amount_total=Decimal("1000.00"),
+                pending_amount=Decimal("1000.00"),
+            )
+            session.add(contract)
+            session.flush()
+            for i, amount in enumerate(INSTALLMENTS, start=1):
+                session.add(ContractPaymentPlan(
+                    contract_id=contract.id, sequence_no=i, direction=PaymentDirection.RECEIVABLE,
+                    name=f"第{i}期", amount=Decimal(amount),
+                ))
+            session.commit()
+            return contract.id
+
+    def pay(contract_id, direction: str, amount: str):
+        data = TransactionCreate(
+            our_entity_id=entity_id,
+            account_id=account_id,
+            txn_direction=direction,
+            amount=Decimal(amount),
+            txn_date=date.today(),
+            contract_id=contract_id,
+        )
+        with Session(engine) as session:
+            asyncio.run(create_transaction(data, session=session, current_user=user))
+
+    def plans(contract_id):
+        with Session(engine) as session:
+            return [tuple(row) for row in session.exec(
+                select(ContractPaymentPlan.paid_amount, ContractPaymentPlan.status)
+                .where(ContractPaymentPlan.contract_id == contract_id)
+                .order_by(ContractPaymentPlan.sequence_no)
+            ).all()]
+
+    def check(label, contract_id, expected):
+        expected = [(Decimal(paid), status) for paid, status in expected]
+        got = plans(contract_id)
+        if got == expected:
+            print(f"SUCCESS: {label}")
+        else:
+            print(f"FAILURE: {label}: installments {got}, expected {expected}")
+
+    print("--- Test 1: Partial payments fill installments in order ---")
+    partial = new_contract()
+    pay(partial, "in", "200.00")
+    pay(partial, "in", "250.00")
+    check("First installment completed, second partly paid", partial,
+          [("300.00", PAID), ("150.00", OPEN), ("0.00", OPEN)])
+
+    print("\n--- Test 2: Overpayment ---")
+    overpaid = new_contract()
+    with Session(engine) as session:
+        left = allocate_to_plans(session, overpaid, PaymentDirection.RECEIVABLE, Decimal("1150.00"), datetime.utcnow())
+        session.commit()
+    if left == Decimal("150.00"):
+        print("SUCCESS: The unallocated part is returned")
+    else:
+        print(f"FAILURE: allocate_to_plans returned {left}, expected 150.00")
+    check("Every installment completed", overpaid, [("300.00", PAID), ("300.00", PAID), ("400.00", PAID)])
+
+    print("\n--- Test 3: Refunds release installments from the last one ---")
+    lifo = new_contract()
+    with Session(engine) as session:
+        allocate_to_plans(session, lifo, PaymentDirection.RECEIVABLE, Decimal("900.00"), datetime.utcnow())
+        left = allocate_to_plans(session, lifo, PaymentDirection.RECEIVABLE, Decimal("500.00"), datetime.utcnow(), refund=True)
+        session.commit()
+    check("Refund spans the third and second installments", lifo,
+          [("300.00", PAID), ("100.00", OPEN), ("0.00", OPEN)])
+    if left == 0:
+        print("SUCCESS: The whole refund was released")
+    else:
+        print(f"FAILURE: {left} of the refund was not released")
+
+    refunded = new_contract()
+    pay(refunded, "in", "900.00")
+    pay(refunded, "out", "500.00")
+    check("Refund transaction reopens installments LIFO", refunded,
+          [("300.00", PAID), ("100.00", OPEN), ("0.00", OPEN)])
+
+    overpaid_refund = new_contract()
+    pay(overpaid_refund, "in", "1200.00")
+    pay(overpaid_refund, "out", "100.00")
+    check("Refund of an overpayment leaves installments completed", overpaid_refund,
+          [("300.00", PAID), ("300.00", PAID), ("400.00", PAID)])
+
+    print("\n--- Test 4: Re-allocation matches incremental allocation ---")
+    contracts = [partial, refunded, overpaid_refund]
+    incremental = {contract_id: plans(contract_id) for contract_id in contracts}
+    with Session(engine) as session:
+        session.execute(
+            update(ContractPaymentPlan)
+            .where(ContractPaymentPlan.contract_id.in_(contracts))
+            .values(paid_amount=0, status=OPEN, paid_at=None)
+        )
+        updated = reallocate_contracts(session, contracts)
+        session.commit()
+    rebuilt = {contract_id: plans(contract_id) for contract_id in contracts}
+    if rebuilt == incremental and updated == len(contracts) * len(INSTALLMENTS):
+        print("SUCCESS: Rebuilding from the ledger gives the same installments")
+    else:
+        print(f"FAILURE: rebuilt {rebuilt}, incremental {incremental}, {updated} installments rewritten")
+
+
+if __name__ == "__main__":
+    run_test()
@@ -0,0 +1,126 @@
+import sys
+import os
+import json
+import sqlite3
+import tempfile
+from uuid import uuid4
+
+# Add project root to path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+# Two SQLite files: the main database and an "east" shard holding one entity
+WORK_DIR = tempfile.mkdtemp(prefix="atlas_shards_")
+MAIN_PATH = os.path.join(WORK_DIR, "main.db")
+EAST_PATH = os.path.join(WORK_DIR, "east.db")
+EAST_ENTITY = uuid4()
+MAIN_ENTITY = uuid4()
+os.environ.update({
+    "DB_TYPE": "sqlite",
+    "SQLITE_DB_PATH": MAIN_PATH,
+    "DB_SHARDS": json.dumps({"east": f"sqlite:///{EAST_PATH}"}),
+    "DB_ENTITY_SHARDS": json.dumps({str(EAST_ENTITY): "east"}),
+    "DEBUG": "False",
+    "SCHEDULER_ENABLED": "False",
+})
+
+from fastapi.testclient import TestClient
+from app.core.auth import get_current_user
+from app.models.iam import User, UserStatus
+from app.main import app
+
+INVOICES_PER_ENTITY = 5
+PAGE_SIZE = 3
+
+
+def invoice_count(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*) FROM finance_invoice").fetchone()[0]
+
+
+def export_numbers(client, **params):
+    response = client.get("/api/v1/export/invoices", params={"format": "ndjson", **params})
+    return [json.loads(line)["invoice_no"] for line in response.text.splitlines() if line]
+
+
+def run_test():
+    user = User(id=uuid4(), display_name="Tester", username="tester", status=UserStatus.ACTIVE)
+    app.dependency_overrides[get_current_user] = lambda: user
+
+    with TestClient(app) as client:
+        print("--- Test 1: Invoices are written to their entity's database ---")
+        created = []
+        for i in range(INVOICES_PER_ENTITY):
+            for entity_id, prefix in ((EAST_ENTITY, "E"), (MAIN_ENTITY, "M")):
+                response = client.post("/api/v1/finance/invoices", json={
+                    "our_entity_id": str(entity_id),
+                    "invoice_kind": "output",
+                    "invoice_medium": "electronic",
+                    "invoice_no": f"{prefix}{i}",
+                    "issue_date": "2024-01-01",
+                    "amount_with_tax": "100.00",
+                })
+                created.append(response.json()["data"]["invoice_no"])
+        counts = (invoice_count(EAST_PATH), invoice_count(MAIN_PATH))
+        if counts == (INVOICES_PER_ENTITY, INVOICES_PER_ENTITY):
+            print("SUCCESS: Mapped entity on the shard, the other on the main database.")
+        else:
+            print(f"FAILURE: east/main invoice counts {counts}")
+
+        print("\n--- Test 2: Cross-shard pages are merged newest first ---")
+        newest_first = list(reversed(created))
+        seen, totals, page = [], set(), 1
+        while len(seen) < len(created):
+            data = client.get("/api/v1/finance/invoices", params={"page": page, "page_size": PAGE_SIZE}).json()["data"]
+            if not data["items"]:
+                break
+            seen += [item["invoice_no"] for item in data["items"]]
+            totals.add(data["total"])
+            page += 1
+        if seen == newest_first and totals == {len(created)}:
+            print("SUCCESS: Pages follow the global order and report the combined total.")
+        else:
+            print(f"FAILURE: pages {seen} totals {totals}, expected {newest_first}")
+
+        print("\n--- Test 3: Filtering by entity reads its shard ---")
+        data = client.get("/api/v1/finance/invoices", params={"our_entity_id": str(EAST_ENTITY)}).json()["data"]
+        numbers = [item["invoice_no"] for item in data["items"]]
+        expected = [n for n in newest_first if n.startswith("E")]
+        if numbers == expected and data["total"] == INVOICES_PER_ENTITY:
+            print("SUCCESS: Only the shard's invoices were listed.")
+        else:
+            print(f"FAILURE: {numbers} total {data['total']}")
+
+        print("\n--- Test 4: Exports include every shard ---")
+        everything = export_numbers(client)
+        east_only = export_numbers(client, our_entity_id=str(EAST_ENTITY))
+        if everything == newest_first and east_only == expected:
+            print("SUCCESS: Export merged all shards and routed the entity filter.")
+        else:
+            print(f"FAILURE: export {everything} / entity export {east_only}")
+
+        print("\n--- Test 5: Background export jobs take JSON filters ---")
+        job = client.post("/api/v1/export/jobs", json={
+            "dataset": "invoices",
+            "format": "ndjson",
+            "filters": {"our_entity_id": str(EAST_ENTITY), "date_from": "2024-01-01", "date_to": "2024-01-31"},
+        }).json()["data"]
+        job = client.get(f"/api/v1/export/jobs/{job['id']}").json()["data"]
+        numbers = []
+        if job["status"] == "done":
+            download = client.get(f"/api/v1/export/jobs/{job['id']}/download")
+            numbers = [json.loads(line)["invoice_no"] for line in download.text.splitlines() if line]
+        if numbers == expected:
+            print("SUCCESS: Entity and date filters applied to the job.")
+        else:
+            print(f"FAILURE: job {job['status']} ({job['error']}), rows {numbers}")
+        rejected = client.post("/api/v1/export/jobs", json={"dataset": "invoices", "filters": {"account_id": str(MAIN_ENTITY)}})
+        if rejected.status_code == 400:
+            print("SUCCESS: Filters the dataset does not support are rejected.")
+        else:
+            print(f"FAILURE: unsupported filter answered {rejected.status_code}")
+
+    app.dependency_overrides.clear()
+
+
+if __name__ == "__main__":
+    run_test()